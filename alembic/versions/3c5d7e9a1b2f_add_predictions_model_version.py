@@ -0,0 +1,34 @@
+"""add predictions model_version
+
+Revision ID: 3c5d7e9a1b2f
+Revises: 850a2710ccac
+Create Date: 2026-10-18 14:20:41.207315
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c5d7e9a1b2f"
+down_revision: str | Sequence[str] | None = "850a2710ccac"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable без default: в PostgreSQL это изменение только каталога,
+    # таблица не переписывается; старые записи остаются с NULL
+    op.add_column(
+        "predictions",
+        sa.Column("model_version", sa.String(length=64), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("predictions", "model_version")
@@ -0,0 +1,46 @@
+"""create prediction_stats table
+
+Revision ID: 6d2f4b8a0c3e
+Revises: 3c5d7e9a1b2f
+Create Date: 2026-10-18 16:42:09.531877
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6d2f4b8a0c3e"
+down_revision: str | Sequence[str] | None = "3c5d7e9a1b2f"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблица создается пустой: существующие записи переносит
+    # python -m app.core.prediction_stats
+    op.create_table(
+        "prediction_stats",
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("prediction", sa.String(length=50), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("confidence_sum", sa.Float(), nullable=False),
+        sa.Column("confidence_min", sa.Float(), nullable=False),
+        sa.Column("confidence_max", sa.Float(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_prediction_stats")),
+        sa.UniqueConstraint(
+            "bucket",
+            "prediction",
+            name=op.f("uq_prediction_stats_bucket_prediction"),
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("prediction_stats")
@@ -0,0 +1,57 @@
+"""add predictions history indexes
+
+Revision ID: 850a2710ccac
+Revises: 1f008e33fe8d
+Create Date: 2026-10-18 10:05:12.418305
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "850a2710ccac"
+down_revision: str | Sequence[str] | None = "1f008e33fe8d"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в таблицу, но не может
+    # выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_predictions_created_at_id",
+            "predictions",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_predictions_prediction_created_at_id",
+            "predictions",
+            ["prediction", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_predictions_prediction_created_at_id",
+            table_name="predictions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_predictions_created_at_id",
+            table_name="predictions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,148 @@
+"""partition predictions by month
+
+Revision ID: 9e1b7c3d5f2a
+Revises: 6d2f4b8a0c3e
+Create Date: 2026-10-18 19:03:52.664120
+
+"""
+
+from collections.abc import Sequence
+from datetime import datetime
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9e1b7c3d5f2a"
+down_revision: str | Sequence[str] | None = "6d2f4b8a0c3e"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Секции на месяцы вперед создаются сразу; дальше их заранее создает
+# python -m app.core.partitions
+PREMAKE_MONTHS = 3
+
+
+def add_month(month: datetime) -> datetime:
+    """First day of the month after ``month``."""
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Старая таблица становится первой секцией (MINVALUE .. начало следующего
+    # месяца) без переписывания данных. Все, что требует сканирования, делается
+    # заранее и не блокирует запись; под эксклюзивной блокировкой остаются
+    # только изменения каталога
+    boundary = add_month(datetime.now().replace(day=1))
+    with op.get_context().autocommit_block():
+        # NOT VALID + VALIDATE: проверка идет под SHARE UPDATE EXCLUSIVE, и
+        # ATTACH PARTITION по этому CHECK пропускает сканирование таблицы.
+        # Повторный запуск (в том числе в другом месяце) пересоздает границу
+        op.execute(
+            "ALTER TABLE predictions "
+            "DROP CONSTRAINT IF EXISTS ck_predictions_legacy_bound"
+        )
+        op.execute(
+            "ALTER TABLE predictions ADD CONSTRAINT ck_predictions_legacy_bound "
+            f"CHECK (created_at < '{boundary.isoformat()}') NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE predictions VALIDATE CONSTRAINT ck_predictions_legacy_bound"
+        )
+        # Первичный ключ секционированной таблицы обязан включать created_at.
+        # ATTACH подключает к нему только индекс, за которым стоит ограничение,
+        # иначе строит новый под эксклюзивной блокировкой. USING INDEX
+        # переименовывает индекс в имя ограничения - имена совпадают, чтобы
+        # повторный запуск не строил индекс заново
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "
+            "uq_predictions_legacy_id_created_at ON predictions (id, created_at)"
+        )
+        op.execute("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT FROM pg_constraint
+                    WHERE conname = 'uq_predictions_legacy_id_created_at'
+                ) THEN
+                    ALTER TABLE predictions
+                        ADD CONSTRAINT uq_predictions_legacy_id_created_at
+                        UNIQUE USING INDEX uq_predictions_legacy_id_created_at;
+                END IF;
+            END $$
+            """)
+
+    # Не ждем в очереди за долгими запросами, удерживая блокировку от всех
+    # остальных: при таймауте миграцию можно просто повторить
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute("LOCK TABLE predictions IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE predictions RENAME TO predictions_legacy")
+    op.execute(
+        "ALTER TABLE predictions_legacy "
+        "RENAME CONSTRAINT pk_predictions TO pk_predictions_legacy"
+    )
+    op.execute(
+        "ALTER INDEX ix_predictions_created_at_id "
+        "RENAME TO ix_predictions_legacy_created_at_id"
+    )
+    op.execute(
+        "ALTER INDEX ix_predictions_prediction_created_at_id "
+        "RENAME TO ix_predictions_legacy_prediction_created_at_id"
+    )
+
+    op.execute("""
+        CREATE TABLE predictions (
+            filename VARCHAR(255) NOT NULL,
+            prediction VARCHAR(50) NOT NULL,
+            confidence FLOAT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            id INTEGER NOT NULL DEFAULT nextval('predictions_id_seq'::regclass),
+            model_version VARCHAR(64),
+            CONSTRAINT pk_predictions PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """)
+    op.execute(
+        "CREATE INDEX ix_predictions_created_at_id ON predictions (created_at, id)"
+    )
+    op.execute(
+        "CREATE INDEX ix_predictions_prediction_created_at_id "
+        "ON predictions (prediction, created_at, id)"
+    )
+    op.execute("ALTER SEQUENCE predictions_id_seq OWNED BY predictions.id")
+
+    # Индексы секции с теми же колонками (и ограничение под первичный ключ)
+    # подключаются к индексам родителя, новые не строятся
+    op.execute(
+        "ALTER TABLE predictions ATTACH PARTITION predictions_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')"
+    )
+
+    month = boundary
+    for _ in range(PREMAKE_MONTHS):
+        upper = add_month(month)
+        op.execute(
+            f"CREATE TABLE predictions_y{month:%Ym%m} PARTITION OF predictions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Переписывает все строки под эксклюзивной блокировкой. Секции, уже
+    # выгруженные в архив, не восстанавливаются
+    op.execute("CREATE TABLE predictions_plain (LIKE predictions INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO predictions_plain SELECT * FROM predictions")
+    # Иначе последовательность удалится вместе с таблицей
+    op.execute("ALTER SEQUENCE predictions_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE predictions")
+    op.execute("ALTER TABLE predictions_plain RENAME TO predictions")
+    op.execute("ALTER SEQUENCE predictions_id_seq OWNED BY predictions.id")
+    op.execute("ALTER TABLE predictions ADD CONSTRAINT pk_predictions PRIMARY KEY (id)")
+    op.execute(
+        "CREATE INDEX ix_predictions_created_at_id ON predictions (created_at, id)"
+    )
+    op.execute(
+        "CREATE INDEX ix_predictions_prediction_created_at_id "
+        "ON predictions (prediction, created_at, id)"
+    )
@@ -0,0 +1,39 @@
+"""add predictions default partition
+
+Revision ID: c4a8e2f6b1d3
+Revises: 9e1b7c3d5f2a
+Create Date: 2026-10-18 21:47:30.115208
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a8e2f6b1d3"
+down_revision: str | Sequence[str] | None = "9e1b7c3d5f2a"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Строки вне созданных месяцев (часы сервера ушли вперед, обслуживание
+    # секций не запускалось) попадают сюда, а не роняют вставку.
+    # python -m app.core.partitions переносит их в секцию месяца при ее создании
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS predictions_default "
+        "PARTITION OF predictions DEFAULT"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Строки возвращаются в родительскую таблицу; если для них нет секции,
+    # INSERT падает и откатывает весь downgrade
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute("ALTER TABLE predictions DETACH PARTITION predictions_default")
+    op.execute("INSERT INTO predictions SELECT * FROM predictions_default")
+    op.execute("DROP TABLE predictions_default")
@@ -0,0 +1,30 @@
+"""
+Liveness and readiness probes.
+
+``/health/live`` answers as soon as the process serves HTTP. ``/health/ready``
+answers 503 until the startup warm-up has finished and again once shutdown
+begins, so Kubernetes only routes traffic to warm pods.
+"""
+
+from fastapi import APIRouter, Request, Response, status
+
+from app.schemas import HealthResponse
+
+api_router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@api_router.get("/live", response_model=HealthResponse)
+async def live() -> HealthResponse:
+    return HealthResponse(status="alive")
+
+
+@api_router.get(
+    "/ready",
+    response_model=HealthResponse,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": HealthResponse}},
+)
+async def ready(request: Request, response: Response) -> HealthResponse:
+    if not getattr(request.app.state, "ready", False):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return HealthResponse(status="warming_up")
+    return HealthResponse(status="ready")
@@ -1,7 +1,15 @@
 from fastapi import APIRouter
 
 from app.api.v1.diagnosis import api_router as diagnosis_router
+from app.api.v1.export import api_router as export_router
+from app.api.v1.jobs import api_router as jobs_router
+from app.api.v1.models import api_router as models_router
+from app.api.v1.stats import api_router as stats_router
 from app.core import settings
 
 api_v1_router = APIRouter(prefix=settings.api.v1.prefix)
 api_v1_router.include_router(diagnosis_router)
+api_v1_router.include_router(export_router)
+api_v1_router.include_router(jobs_router)
+api_v1_router.include_router(models_router)
+api_v1_router.include_router(stats_router)
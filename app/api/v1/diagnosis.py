@@ -1,97 +1,632 @@
+import asyncio
+import itertools
 import logging
+from collections.abc import AsyncGenerator, Sequence
+from contextlib import ExitStack
 from datetime import datetime
+from typing import TYPE_CHECKING, Literal
 
-import torch
-from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
-from sqlalchemy import select
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from sqlalchemy import ColumnElement, insert, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import db_helper, settings
+from app.core.metrics import STAGE_SECONDS
+from app.core.ml.cache import CachedPrediction, PredictionCache
 from app.core.models import Prediction
-from app.schemas import PneumoniaPredictionResponse
-from app.utils import image_processor
+from app.core.prediction_stats import record_stats
+from app.core.prediction_writer import PredictionRow, PredictionWriter
+from app.schemas import CacheStatsResponse, PneumoniaPredictionResponse
+from app.utils.archive import extract_images, is_archive
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.upload import (
+    ImageHeader,
+    PayloadTooLarge,
+    UploadError,
+    inspect_image,
+    is_image_upload,
+    read_upload,
+)
+
+if TYPE_CHECKING:
+    # torch грузится вместе с моделью в lifespan, а не при импорте роутера
+    import torch
+
+    from app.core.ml.registry import ModelRegistry, ServedModel
 
 api_router = APIRouter(prefix=settings.api.v1.lungcheck.prefix)
 logger = logging.getLogger(__name__)
 
 
+def upload_rejected(error: UploadError) -> HTTPException:
+    """Map a rejected upload to 413 (over a limit) or 400 (not a valid image)."""
+    code = (
+        status.HTTP_413_CONTENT_TOO_LARGE
+        if isinstance(error, PayloadTooLarge)
+        else status.HTTP_400_BAD_REQUEST
+    )
+    return HTTPException(status_code=code, detail=str(error))
+
+
+async def read_image(
+    file: UploadFile, max_frames: int = 1
+) -> tuple[bytes, ImageHeader]:
+    """
+    Read an uploaded image within the configured limits.
+
+    The file is streamed up to ``max_file_bytes``, then its magic bytes and
+    header dimensions are checked; no pixel data is decoded here.
+
+    Args:
+        file: The uploaded file.
+        max_frames: Most frames accepted from a multi-frame DICOM.
+
+    Returns:
+        The raw bytes and what their header declares.
+
+    Raises:
+        HTTPException: 413 if a size limit is exceeded, 400 if the bytes
+            are not a supported image or have too many frames.
+    """
+    limits = settings.upload
+    try:
+        content = await read_upload(
+            file, limits.max_file_bytes, limits.read_chunk_bytes
+        )
+        header = inspect_image(
+            content, limits.max_image_pixels, file.filename or "upload"
+        )
+    except UploadError as e:
+        raise upload_rejected(e) from e
+
+    if header.frames > max_frames:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"{file.filename}: {header.frames} frames, at most {max_frames}"
+                " accepted here; send multi-frame DICOM to /predict/batch"
+            ),
+        )
+    return content, header
+
+
+async def leased_model(
+    request: Request,
+    model: str | None = Query(
+        None, description="Resident model version to use (default: the active one)"
+    ),
+) -> AsyncGenerator["ServedModel", None]:
+    """
+    Pick the resident model version a request is served by.
+
+    The version is leased until the response is sent, so a reload or
+    unload during the request does not stop its batcher underneath it.
+
+    Args:
+        request: Current request, used to reach the model registry.
+        model: Requested version name (default: the active version).
+
+    Yields:
+        ServedModel: The leased version.
+
+    Raises:
+        HTTPException: 404 if no such version is loaded.
+    """
+    registry: ModelRegistry = request.app.state.models
+    try:
+        name = registry.get(model).name
+    except KeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Model {model!r} not loaded"
+        ) from e
+    with registry.lease(name) as served:
+        yield served
+
+
+async def leased_ensemble(
+    request: Request,
+    served: "ServedModel" = Depends(leased_model),
+    ensemble: str | None = Query(
+        None,
+        description="Comma-separated resident versions averaged with the selected one",
+    ),
+) -> AsyncGenerator[list["ServedModel"], None]:
+    """
+    Lease the versions an ensemble prediction is averaged over.
+
+    Args:
+        request: Current request, used to reach the model registry.
+        served: Version selected by ``model`` (always the first member).
+        ensemble: Further version names, comma-separated.
+
+    Yields:
+        list[ServedModel]: The leased members, without duplicates.
+
+    Raises:
+        HTTPException: 404 if a version is not loaded, 400 if there are more
+            than ``max_ensemble_size`` members.
+    """
+    names = [
+        name
+        for name in dict.fromkeys((ensemble or "").split(","))
+        if name and name != served.name
+    ]
+    if len(names) + 1 > settings.ml_config.max_ensemble_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.ml_config.max_ensemble_size} models per ensemble",
+        )
+
+    registry: ModelRegistry = request.app.state.models
+    with ExitStack() as stack:
+        members = [served]
+        for name in names:
+            try:
+                members.append(stack.enter_context(registry.lease(name)))
+            except KeyError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Model {name!r} not loaded",
+                ) from e
+        yield members
+
+
+async def score_images(
+    request: Request, contents: list[bytes], served: "ServedModel"
+) -> list[list[CachedPrediction]]:
+    """
+    Turn raw uploads into predictions.
+
+    Cached results are reused; the remaining images are decoded in parallel
+    in the execution pool, stacked and submitted to the batcher of the
+    chosen version in chunks of at most ``max_batch_size`` rows. A
+    multi-frame DICOM contributes one row per frame. When the active
+    version serves the request, a shadow version also scores the rows in
+    the background.
+
+    Args:
+        request: Current request, used to reach the application state.
+        contents: Raw image bytes, one item per upload.
+        served: Model version to score with.
+
+    Returns:
+        Per input, in the same order, one prediction per frame (a single
+        prediction for ordinary images).
+    """
+    import torch
+
+    from app.core.ml.model_loader import CLASS_NAMES
+    from app.utils.image_processor import image_processor
+
+    state = request.app.state
+    cache: PredictionCache | None = state.prediction_cache
+    results: list[list[CachedPrediction] | None] = [None] * len(contents)
+    keys = [
+        PredictionCache.make_key(c, served.version, served.runtime) for c in contents
+    ]
+
+    # Повторная загрузка тех же байтов: берем результат из кэша
+    if cache is not None:
+        with STAGE_SECONDS.labels(stage="cache_lookup").time():
+            for i, key in enumerate(keys):
+                cached = await cache.get(key)
+                if cached is not None:
+                    results[i] = [cached]
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        # Превращаем байты в тензоры (в пуле, чтобы не блокировать event loop)
+        with STAGE_SECONDS.labels(stage="preprocess").time():
+            tensors = await asyncio.gather(
+                *(
+                    state.executor.run(image_processor.process_image, contents[i])
+                    for i in missing
+                )
+            )
+        logger.info("Tensors successfully created: %d", len(tensors))
+
+        # Отправляем тензоры в общий батч: forward pass выполняется
+        # один раз для всех параллельных запросов
+        # Время "inference" включает ожидание в очереди батчера
+        rows = torch.cat(tensors)
+        with STAGE_SECONDS.labels(stage="inference").time():
+            chunks = await asyncio.gather(
+                *(
+                    served.batcher.submit(chunk)
+                    for chunk in rows.split(settings.ml_config.max_batch_size)
+                )
+            )
+        flat = [r for chunk_results in chunks for r in chunk_results]
+
+        registry: ModelRegistry = state.models
+        if served.name == registry.active:
+            registry.score_shadow(rows, flat)
+
+        inferred = iter(flat)
+        for i, tensor in zip(missing, tensors, strict=True):
+            # Определяем название класса для каждого кадра
+            results[i] = [
+                CachedPrediction(
+                    prediction=CLASS_NAMES[result.class_index],
+                    confidence=result.confidence,
+                )
+                for result in itertools.islice(inferred, tensor.shape[0])
+            ]
+            # Кэшируем только одиночные снимки
+            if cache is not None and tensor.shape[0] == 1:
+                await cache.set(keys[i], results[i][0])
+
+    return [r for r in results if r is not None]
+
+
+async def score_views(
+    request: Request,
+    content: bytes,
+    views: Sequence[str],
+    members: list["ServedModel"],
+) -> "torch.Tensor":
+    """
+    Score test-time augmentation views of one image with every member.
+
+    All views come from one decode (see ``ImageProcessor.process_views``)
+    and form a single batch; each member scores that batch once, and the
+    members run concurrently. Results are not cached.
+
+    Args:
+        request: Current request, used to reach the application state.
+        content: Raw image bytes.
+        views: TTA view names; empty for the plain preprocessing only.
+        members: Model versions to score with.
+
+    Returns:
+        torch.Tensor: Class probabilities, shape [views * members, classes].
+    """
+    import torch
+
+    from app.utils.image_processor import image_processor
+
+    executor = request.app.state.executor
+    with STAGE_SECONDS.labels(stage="preprocess").time():
+        if views:
+            batch = await executor.run(image_processor.process_views, content, views)
+        else:
+            batch = await executor.run(image_processor.process_image, content)
+            # Многокадровый DICOM: как и для TTA, берем первый кадр
+            batch = batch[:1]
+
+    with STAGE_SECONDS.labels(stage="inference").time():
+        outputs = await asyncio.gather(*(m.batcher.submit(batch) for m in members))
+    return torch.stack([r.probabilities for results in outputs for r in results])
+
+
+async def save_predictions(
+    request: Request, session: AsyncSession, rows: list[PredictionRow]
+) -> None:
+    """
+    Persist prediction rows.
+
+    With the write-behind writer enabled the rows are only buffered; the
+    request does not wait for a database round trip. Otherwise they are
+    inserted in one statement and committed right away.
+    """
+    writer: PredictionWriter | None = request.app.state.prediction_writer
+    if writer is not None:
+        # Ненулевое время здесь - признак backpressure от буфера записи
+        with STAGE_SECONDS.labels(stage="persist_enqueue").time():
+            await writer.put_many(rows)
+        return
+
+    with STAGE_SECONDS.labels(stage="db_commit").time():
+        await session.execute(insert(Prediction), rows)
+        await record_stats(await session.connection(), rows)
+        await session.commit()
+
+
+def to_response(
+    row: PredictionRow, probabilities: "torch.Tensor | None" = None
+) -> PneumoniaPredictionResponse:
+    """
+    Build the API response for a freshly created prediction row.
+
+    Args:
+        row: The stored prediction.
+        probabilities: Per-view probabilities of an augmented or ensemble
+            prediction, reported as their mean and spread.
+    """
+    response = PneumoniaPredictionResponse(
+        filename=row["filename"],
+        prediction=row["prediction"],
+        confidence=round(row["confidence"] * 100, 2),
+        timestamp=row["created_at"],
+        model_version=row["model_version"],
+    )
+    if probabilities is not None:
+        from app.core.ml.model_loader import CLASS_NAMES
+
+        mean = probabilities.mean(dim=0).tolist()
+        spread = probabilities.std(dim=0, correction=0).tolist()
+        response.views = probabilities.shape[0]
+        response.probabilities = {
+            name: round(p * 100, 2) for name, p in zip(CLASS_NAMES, mean, strict=True)
+        }
+        response.spread = {
+            name: round(s * 100, 2) for name, s in zip(CLASS_NAMES, spread, strict=True)
+        }
+    return response
+
+
 @api_router.post("/predict", response_model=PneumoniaPredictionResponse)
 async def predict(
     request: Request,
     file: UploadFile = File(...),
     session: AsyncSession = Depends(db_helper.session_getter),
+    members: list["ServedModel"] = Depends(leased_ensemble),
+    tta: Literal["none", "flip", "full"] = Query(
+        "none", description="Test-time augmentation views averaged per image"
+    ),
 ) -> PneumoniaPredictionResponse | None:
-    # 1. Если не изображение - выдать исключение
-    if not file.content_type or not file.content_type.startswith("image/"):
+    # 1. Если не изображение (и не DICOM) - выдать исключение
+    if not is_image_upload(file.content_type, file.filename):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="File must be an image"
         )
 
     try:
-        # 2. Читаем изображение
-        content = await file.read()
+        # 2. Читаем изображение с ограничением размера и проверкой заголовка
+        content, _ = await read_image(file)
+    finally:
+        await file.close()
 
-        # 3. Превращаем байты в тензор
-        input_tensor = image_processor.process_image(content)
+    try:
+        # 3. Декодирование + инференс (или результат из кэша)
+        probabilities = None
+        if tta == "none" and len(members) == 1:
+            [[scored]] = await score_images(request, [content], members[0])
+        else:
+            from app.core.ml.model_loader import CLASS_NAMES
+            from app.utils.image_processor import TTA_PRESETS
 
-        logger.info("Tensor successfully created. Shape: %s", input_tensor.shape)
+            # TTA и/или ансамбль: все виды одним батчем, усредняем вероятности
+            views = TTA_PRESETS.get(tta, ())
+            probabilities = await score_views(request, content, views, members)
+            mean = probabilities.mean(dim=0)
+            class_index = int(mean.argmax())
+            scored = CachedPrediction(
+                prediction=CLASS_NAMES[class_index],
+                confidence=float(mean[class_index]),
+            )
 
-        # Достаем модель из состояния приложения
-        model = request.app.state.model
+        # created_at задаем на стороне приложения - refresh не нужен
+        new_prediction = PredictionRow(
+            filename=file.filename or "",
+            prediction=scored.prediction,
+            confidence=scored.confidence,
+            created_at=datetime.now(),
+            model_version="+".join(m.version for m in members),
+        )
+        await save_predictions(request, session, [new_prediction])
 
-        # Выполняем анализ без вычисления градиентов
-        with torch.no_grad():
-            output = model(input_tensor)
-            # Применяем Softmax для получения вероятностей
-            probabilities = torch.nn.functional.softmax(output, dim=1)
-            # Получаем вероятность и индекс класса с максимальной вероятностью
-            confidence, predicted_class = torch.max(probabilities, 1)
+        return to_response(new_prediction, probabilities)
 
-        # Определяем название класса
-        class_names = ["NORMAL", "PNEUMONIA"]
-        prediction_label = class_names[int(predicted_class.item())]
+    except Exception as e:
+        logger.exception("Error during prediction: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Processing error: {str(e)}",
+        ) from e
 
-        new_prediction = Prediction(
-            filename=file.filename,
-            prediction=prediction_label,
-            confidence=float(confidence.item()),
-        )
 
-        session.add(new_prediction)
-        await session.commit()
-        await session.refresh(new_prediction)
+@api_router.post("/predict/batch", response_model=list[PneumoniaPredictionResponse])
+async def predict_batch(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    session: AsyncSession = Depends(db_helper.session_getter),
+    served: "ServedModel" = Depends(leased_model),
+) -> list[PneumoniaPredictionResponse]:
+    limits = settings.upload
+    max_files = limits.max_batch_files
+    # (имя, байты, число кадров)
+    uploads: list[tuple[str, bytes, int]] = []
+    # Сколько байт снимков уже держит запрос (файлы + распакованные архивы)
+    total_bytes = 0
+
+    try:
+        for file in files:
+            if is_archive(file.content_type, file.filename):
+                # Архив (zip/tar) распаковываем в пуле
+                try:
+                    content = await read_upload(
+                        file, limits.max_archive_bytes, limits.read_chunk_bytes
+                    )
+                    members = await request.app.state.executor.run(
+                        extract_images,
+                        content,
+                        max_files,
+                        limits.max_file_bytes,
+                        limits.max_batch_bytes - total_bytes,
+                    )
+                    for name, member in members:
+                        header = inspect_image(member, limits.max_image_pixels, name)
+                        uploads.append((name, member, header.frames))
+                        total_bytes += len(member)
+                except UploadError as e:
+                    raise upload_rejected(e) from e
+                except ValueError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+                    ) from e
+            elif is_image_upload(file.content_type, file.filename):
+                content, header = await read_image(file, max_frames=max_files)
+                uploads.append((file.filename or "", content, header.frames))
+                total_bytes += len(content)
+                if total_bytes > limits.max_batch_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail=f"Batch images exceed {limits.max_batch_bytes} bytes",
+                    )
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{file.filename}: file must be an image or an archive",
+                )
+    finally:
+        for file in files:
+            await file.close()
 
-        return PneumoniaPredictionResponse(
-            filename=new_prediction.filename,
-            prediction=new_prediction.prediction,
-            confidence=round(new_prediction.confidence * 100, 2),
-            timestamp=new_prediction.created_at,
+    if not uploads:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No images found"
+        )
+    # Кадры multi-frame DICOM считаются отдельными снимками
+    if sum(frames for _, _, frames in uploads) > max_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {max_files} images per batch",
         )
 
+    try:
+        scored = await score_images(
+            request, [content for _, content, _ in uploads], served
+        )
     except Exception as e:
-        logger.exception("Error during prediction: %s", e)
+        logger.exception("Error during batch prediction: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Processing error: {str(e)}",
         ) from e
-    finally:
-        await file.close()
+
+    # Все записи одним INSERT (или одной пачкой в буфер записи)
+    created_at = datetime.now()
+    new_predictions = [
+        PredictionRow(
+            filename=name if len(frames) == 1 else f"{name}#{index}",
+            prediction=result.prediction,
+            confidence=result.confidence,
+            created_at=created_at,
+            model_version=served.version,
+        )
+        for (name, _, _), frames in zip(uploads, scored, strict=True)
+        for index, result in enumerate(frames, start=1)
+    ]
+    await save_predictions(request, session, new_predictions)
+
+    return [to_response(row) for row in new_predictions]
+
+
+def history_filters(
+    label: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    min_confidence: float | None = None,
+    max_confidence: float | None = None,
+) -> list[ColumnElement[bool]]:
+    """
+    Build WHERE clauses for history queries.
+
+    Args:
+        label: Keep only this predicted class.
+        since: Keep rows created at or after this time.
+        until: Keep rows created before this time.
+        min_confidence: Lower bound on the stored confidence (0.0 to 1.0).
+        max_confidence: Upper bound on the stored confidence (0.0 to 1.0).
+
+    Returns:
+        Conditions to combine with AND.
+    """
+    conditions: list[ColumnElement[bool]] = []
+    if label is not None:
+        conditions.append(Prediction.prediction == label)
+    if since is not None:
+        conditions.append(Prediction.created_at >= since)
+    if until is not None:
+        conditions.append(Prediction.created_at < until)
+    if min_confidence is not None:
+        conditions.append(Prediction.confidence >= min_confidence)
+    if max_confidence is not None:
+        conditions.append(Prediction.confidence <= max_confidence)
+    return conditions
 
 
 @api_router.get("/history", response_model=list[PneumoniaPredictionResponse])
 async def get_history(
-    session: AsyncSession = Depends(db_helper.session_getter), limit: int = 10
+    response: Response,
+    session: AsyncSession = Depends(db_helper.session_getter),
+    limit: int = Query(
+        settings.history.default_page_size,
+        ge=0,
+        le=settings.history.max_page_size,
+    ),
+    cursor: str | None = Query(
+        None, description="Value of X-Next-Cursor from the previous page"
+    ),
+    label: Literal["NORMAL", "PNEUMONIA"] | None = None,
+    min_confidence: float | None = Query(None, ge=0.0, le=1.0),
+    max_confidence: float | None = Query(None, ge=0.0, le=1.0),
+    since: datetime | None = None,
+    until: datetime | None = None,
 ) -> list[PneumoniaPredictionResponse]:
-    stmt = select(Prediction).order_by(Prediction.created_at.desc()).limit(limit)
+    # Keyset-пагинация по (created_at, id): без OFFSET, глубина страницы
+    # не влияет на стоимость запроса
+    conditions = history_filters(label, since, until, min_confidence, max_confidence)
+    if cursor is not None:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            ) from e
+        conditions.append(
+            tuple_(Prediction.created_at, Prediction.id)
+            < tuple_(cursor_created_at, cursor_id)
+        )
+
+    stmt = (
+        select(Prediction)
+        .where(*conditions)
+        .order_by(Prediction.created_at.desc(), Prediction.id.desc())
+        .limit(limit)
+    )
     result = await session.execute(stmt)
     predictions = result.scalars().all()
 
+    if limit and len(predictions) == limit:
+        last = predictions[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
     return [
         PneumoniaPredictionResponse(
             filename=p.filename,
             prediction=p.prediction,
             confidence=p.confidence,
             timestamp=p.created_at,
+            model_version=p.model_version,
         )
         for p in predictions
     ]
+
+
+@api_router.get("/cache/stats", response_model=CacheStatsResponse)
+async def get_cache_stats(request: Request) -> CacheStatsResponse:
+    cache: PredictionCache | None = request.app.state.prediction_cache
+    if cache is None:
+        return CacheStatsResponse(enabled=False)
+
+    stats = cache.stats
+    return CacheStatsResponse(
+        enabled=True,
+        memory_hits=stats.memory_hits,
+        redis_hits=stats.redis_hits,
+        misses=stats.misses,
+        redis_errors=stats.redis_errors,
+        size=stats.size,
+    )
@@ -0,0 +1,105 @@
+import csv
+import io
+import logging
+from collections.abc import AsyncGenerator, Sequence
+from datetime import datetime
+from typing import Any, Literal
+
+import orjson
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import ColumnElement, Row, select
+
+from app.api.v1.diagnosis import history_filters
+from app.core import db_helper, settings
+from app.core.models import Prediction
+
+api_router = APIRouter(prefix=settings.api.v1.lungcheck.prefix)
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = (
+    "id",
+    "filename",
+    "prediction",
+    "confidence",
+    "created_at",
+    "model_version",
+)
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def ndjson_chunk(rows: Sequence[Row[Any]]) -> bytes:
+    """Serialize rows as newline-delimited JSON objects."""
+    return b"".join(
+        orjson.dumps(row._asdict(), option=orjson.OPT_APPEND_NEWLINE) for row in rows
+    )
+
+
+def csv_chunk(rows: Sequence[Row[Any]]) -> bytes:
+    """Serialize rows as CSV lines (timestamps in ISO 8601, like the NDJSON)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value for value in row
+        )
+    return buffer.getvalue().encode()
+
+
+async def stream_predictions(
+    conditions: list[ColumnElement[bool]],
+    fmt: Literal["ndjson", "csv"],
+    chunk_size: int,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Stream matching prediction rows, one serialized chunk per fetch.
+
+    Plain column tuples are fetched through a server-side cursor
+    (``yield_per``), so neither ORM objects nor the whole result are held
+    in memory. The generator opens its own session: it runs after the
+    endpoint has returned, when request-scoped dependencies may already be
+    closed.
+
+    Args:
+        conditions: WHERE clauses (see ``history_filters``).
+        fmt: "ndjson" or "csv".
+        chunk_size: Rows fetched and serialized per chunk.
+
+    Yields:
+        bytes: The encoded rows of one chunk (the CSV header first).
+    """
+    encode = ndjson_chunk if fmt == "ndjson" else csv_chunk
+    if fmt == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+
+    stmt = (
+        select(*(getattr(Prediction, column) for column in EXPORT_COLUMNS))
+        .where(*conditions)
+        .order_by(Prediction.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    exported = 0
+    async with db_helper.session_factory() as session:
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            exported += len(rows)
+            yield encode(rows)
+    logger.info("Exported %d predictions as %s", exported, fmt)
+
+
+@api_router.get("/history/export", response_class=StreamingResponse)
+async def export_history(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    label: Literal["NORMAL", "PNEUMONIA"] | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    min_confidence: float | None = Query(None, ge=0.0, le=1.0),
+    max_confidence: float | None = Query(None, ge=0.0, le=1.0),
+) -> StreamingResponse:
+    # Память не растет с размером таблицы: строки идут чанками прямо из курсора
+    conditions = history_filters(label, since, until, min_confidence, max_confidence)
+    return StreamingResponse(
+        stream_predictions(conditions, fmt, settings.history.export_chunk_size),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="predictions.{fmt}"'},
+    )
@@ -0,0 +1,63 @@
+import asyncio
+import base64
+import logging
+
+from celery.result import AsyncResult
+from fastapi import APIRouter, File, HTTPException, UploadFile, status
+
+from app.api.v1.diagnosis import read_image
+from app.core import settings
+from app.schemas import JobResponse, JobStatusResponse, PneumoniaPredictionResponse
+from app.utils.upload import is_image_upload
+from app.worker import celery_app
+from app.worker.tasks import predict_image
+
+api_router = APIRouter(prefix=settings.api.v1.lungcheck.prefix)
+logger = logging.getLogger(__name__)
+
+
+@api_router.post(
+    "/predict/async",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def predict_async(file: UploadFile = File(...)) -> JobResponse:
+    if not is_image_upload(file.content_type, file.filename):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="File must be an image"
+        )
+
+    try:
+        content, _ = await read_image(file)
+    finally:
+        await file.close()
+
+    # Публикация в брокер - блокирующий вызов, уводим его из event loop
+    job = await asyncio.to_thread(
+        predict_image.delay,
+        base64.b64encode(content).decode("ascii"),
+        file.filename or "",
+    )
+    logger.info("Enqueued prediction job %s for %s", job.id, file.filename)
+
+    return JobResponse(job_id=job.id, status=job.status)
+
+
+@api_router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str) -> JobStatusResponse:
+    job = AsyncResult(job_id, app=celery_app)
+    state = await asyncio.to_thread(lambda: job.state)
+
+    if state == "SUCCESS":
+        result = await asyncio.to_thread(lambda: job.result)
+        return JobStatusResponse(
+            job_id=job_id,
+            status=state,
+            result=PneumoniaPredictionResponse(**result),
+        )
+
+    if state == "FAILURE":
+        error = await asyncio.to_thread(lambda: job.result)
+        return JobStatusResponse(job_id=job_id, status=state, error=str(error))
+
+    return JobStatusResponse(job_id=job_id, status=state)
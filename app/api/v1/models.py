@@ -0,0 +1,161 @@
+import logging
+import secrets
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+
+from app.core import settings
+from app.schemas import ModelInfo, ModelLoadRequest, ModelRegistryResponse
+
+if TYPE_CHECKING:
+    from app.core.ml.registry import ModelRegistry
+
+api_router = APIRouter(prefix=settings.api.v1.lungcheck.prefix, tags=["Models"])
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    """
+    Guard the endpoints that change which models are served.
+
+    Raises:
+        HTTPException: 403 while no admin token is configured, 401 if the
+            X-Admin-Token header does not match it.
+    """
+    expected = settings.registry.admin_token
+    if expected is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Model administration is disabled",
+        )
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token, expected.get_secret_value()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token"
+        )
+
+
+def weights_path(relative: str | None) -> Path:
+    """
+    Resolve a weights file inside the models directory.
+
+    Raises:
+        HTTPException: 400 if the path escapes the models directory.
+    """
+    if relative is None:
+        return settings.PROJECT_ROOT / settings.ml_config.model_path
+
+    models_dir = (settings.PROJECT_ROOT / settings.registry.models_dir).resolve()
+    path = (models_dir / relative).resolve()
+    if not path.is_relative_to(models_dir):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{relative}: weights must be inside {settings.registry.models_dir}",
+        )
+    return path
+
+
+def registry_response(registry: "ModelRegistry") -> ModelRegistryResponse:
+    return ModelRegistryResponse(
+        active=registry.active,
+        shadow=registry.shadow,
+        loading=registry.loading,
+        models=[
+            ModelInfo(
+                name=m.name,
+                version=m.version,
+                runtime=m.runtime,
+                loaded_at=datetime.fromtimestamp(m.loaded_at),
+            )
+            for m in registry.models
+        ],
+    )
+
+
+@api_router.get("/models", response_model=ModelRegistryResponse)
+async def list_models(request: Request) -> ModelRegistryResponse:
+    return registry_response(request.app.state.models)
+
+
+@api_router.post(
+    "/models/{name}/load",
+    response_model=ModelRegistryResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin)],
+)
+async def load_model(
+    request: Request, name: str, body: ModelLoadRequest
+) -> ModelRegistryResponse:
+    registry: ModelRegistry = request.app.state.models
+    path = weights_path(body.path)
+    if not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"No weights at {path.name}"
+        )
+    if request.app.state.executor.kind == "process":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Hot reload requires the thread executor",
+        )
+    from app.core.ml.model_loader import ModelLoader, StaleExportError
+
+    try:
+        ModelLoader.check_onnx_export(path)
+    except StaleExportError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+
+    # Загрузка и прогрев идут в фоне, прогресс виден в GET /models
+    registry.start_load(name, path, activate=body.activate)
+    logger.info("Loading model %r from %s", name, path)
+    return registry_response(registry)
+
+
+@api_router.post(
+    "/models/{name}/activate",
+    response_model=ModelRegistryResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def activate_model(request: Request, name: str) -> ModelRegistryResponse:
+    registry: ModelRegistry = request.app.state.models
+    try:
+        registry.activate(name)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    return registry_response(registry)
+
+
+@api_router.put(
+    "/models/shadow",
+    response_model=ModelRegistryResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def set_shadow_model(
+    request: Request, name: str | None = None
+) -> ModelRegistryResponse:
+    registry: ModelRegistry = request.app.state.models
+    try:
+        registry.set_shadow(name)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    return registry_response(registry)
+
+
+@api_router.delete(
+    "/models/{name}",
+    response_model=ModelRegistryResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def unload_model(request: Request, name: str) -> ModelRegistryResponse:
+    registry: ModelRegistry = request.app.state.models
+    try:
+        registry.unload(name)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    return registry_response(registry)
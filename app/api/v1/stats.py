@@ -0,0 +1,97 @@
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import ColumnElement, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import db_helper, settings
+from app.core.models import PredictionStat
+from app.core.prediction_stats import StatRow, bucket_start, merge
+from app.schemas import LabelStats, StatsBucket, StatsResponse
+
+api_router = APIRouter(prefix=settings.api.v1.lungcheck.prefix)
+
+
+def label_stats(stat: StatRow) -> LabelStats:
+    """Convert an aggregate row into its API representation."""
+    return LabelStats(
+        label=stat["prediction"],
+        count=stat["count"],
+        mean_confidence=stat["confidence_sum"] / stat["count"],
+        min_confidence=stat["confidence_min"],
+        max_confidence=stat["confidence_max"],
+    )
+
+
+def regroup(
+    rows: Iterable[StatRow], granularity: Literal["hour", "day"]
+) -> tuple[list[StatRow], list[StatRow]]:
+    """
+    Merge hourly aggregates into the requested buckets and per-label totals.
+
+    Args:
+        rows: Hourly aggregates, oldest first.
+        granularity: "hour" keeps the buckets, "day" merges them per day.
+
+    Returns:
+        The aggregates per bucket and label, and per label.
+    """
+    buckets: dict[tuple[datetime, str], StatRow] = {}
+    totals: dict[tuple[datetime, str], StatRow] = {}
+    for row in rows:
+        if granularity == "day":
+            row = {**row, "bucket": row["bucket"].replace(hour=0)}
+        merge(buckets, row)
+        # Итоги по метке: все бакеты под одним ключом
+        merge(totals, {**row, "bucket": datetime.min})
+    return [stat for _, stat in sorted(buckets.items())], [
+        stat for _, stat in sorted(totals.items())
+    ]
+
+
+@api_router.get("/stats", response_model=StatsResponse)
+async def get_stats(
+    session: AsyncSession = Depends(db_helper.session_getter),
+    granularity: Literal["hour", "day"] = "day",
+    label: Literal["NORMAL", "PNEUMONIA"] | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> StatsResponse:
+    # Читаем часовые агрегаты, а не predictions: стоимость зависит от числа
+    # бакетов в диапазоне, а не от числа записей. Границы - с точностью до часа
+    conditions: list[ColumnElement[bool]] = []
+    if label is not None:
+        conditions.append(PredictionStat.prediction == label)
+    if since is not None:
+        conditions.append(PredictionStat.bucket >= bucket_start(since))
+    if until is not None:
+        conditions.append(PredictionStat.bucket < until)
+
+    stmt = (
+        select(
+            PredictionStat.bucket,
+            PredictionStat.prediction,
+            PredictionStat.count,
+            PredictionStat.confidence_sum,
+            PredictionStat.confidence_min,
+            PredictionStat.confidence_max,
+        )
+        .where(*conditions)
+        .order_by(PredictionStat.bucket, PredictionStat.prediction)
+    )
+    result = await session.execute(stmt)
+    buckets, totals = regroup(
+        (StatRow(**row) for row in result.mappings()), granularity
+    )
+
+    return StatsResponse(
+        granularity=granularity,
+        total=sum(stat["count"] for stat in totals),
+        labels=[label_stats(stat) for stat in totals],
+        buckets=[
+            StatsBucket(bucket=stat["bucket"], **label_stats(stat).model_dump())
+            for stat in buckets
+        ],
+    )
@@ -1,12 +1,16 @@
 from pathlib import Path
+from typing import Literal
 
-from pydantic import BaseModel, PostgresDsn
+from pydantic import BaseModel, Field, PostgresDsn, RedisDsn, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 ENV_PATH = PROJECT_ROOT / ".env"
 ENV_TEMPLATE_PATH = PROJECT_ROOT / ".env.template"
 
+# Варианты модели (app/core/ml/variants.py); здесь, чтобы конфиг не тянул torch
+Runtime = Literal["eager", "dynamic_int8", "static_int8", "torchscript", "compile"]
+
 
 class DatabaseConfig(BaseModel):
     """
@@ -58,8 +62,238 @@ class MLConfig(BaseModel):
 
     Attributes:
         model_path: Relative path to the trained .pth weights file.
+        max_batch_size: Maximum number of images stacked into one forward pass.
+        max_batch_wait_ms: How long the first image of a batch may wait for
+            others before the batch is flushed.
+        mmap_weights: Memory-map the weights file instead of reading it into
+            private memory, so processes on one node share its pages.
+        runtime: Optimized variant to serve: "eager" (float32), "dynamic_int8",
+            "static_int8", "torchscript" (frozen) or "compile" (torch.compile).
+        channels_last: Use the NHWC memory format for weights and inputs.
+        parity_tolerance: Largest allowed difference between the softmax
+            outputs of the variant and the float model; above it the float
+            model is served instead.
+        calibration_dir: Directory of sample X-rays used for static
+            quantization and the parity check. Required by "static_int8";
+            other variants are checked on random inputs when it is unset.
+        calibration_samples: Number of inputs used for calibration and parity.
+        backend: Inference engine: "torch" or "onnx" (ONNX Runtime, CPU).
+        onnx_path: Relative path to the ONNX export (default: model_path with
+            the .onnx suffix).
+        max_ensemble_size: Most resident versions one /predict?ensemble=
+            request may combine (1-5, so that the joined versions fit in
+            ``predictions.model_version``).
+        grayscale: Fold the normalization and the RGB channels into the
+            first convolution: images are fed as one channel of raw pixels,
+            skipping RGB conversion and normalization in preprocessing.
     """
     model_path: str = "models/pneumonia_resnet18.pth"
+    max_batch_size: int = 16
+    max_batch_wait_ms: float = 5.0
+    mmap_weights: bool = True
+    runtime: Runtime = "eager"
+    channels_last: bool = False
+    parity_tolerance: float = 0.02
+    calibration_dir: str | None = None
+    calibration_samples: int = 16
+    backend: Literal["torch", "onnx"] = "torch"
+    onnx_path: str | None = None
+    # Версии (12 символов, ModelLoader.weights_version) через "+": 5 * 12 + 4
+    # укладываются в String(64) колонки predictions.model_version
+    max_ensemble_size: int = Field(4, ge=1, le=5)
+    grayscale: bool = False
+
+
+class ExecutorConfig(BaseModel):
+    """
+    Execution pool for CPU-bound image decoding and model inference.
+
+    Attributes:
+        kind: Pool type, "thread" or "process".
+        max_workers: Number of pool workers (default: number of CPU cores).
+        torch_threads: Intra-op torch threads per worker. When unset the
+            available cores are split evenly between the workers.
+        torch_interop_threads: Inter-op torch threads per worker.
+    """
+    kind: Literal["thread", "process"] = "thread"
+    max_workers: int | None = None
+    torch_threads: int | None = None
+    torch_interop_threads: int = 1
+
+
+class CacheConfig(BaseModel):
+    """
+    Content-hash prediction cache.
+
+    Attributes:
+        enabled: Look up repeated uploads before decoding them.
+        max_entries: Capacity of the in-process LRU tier.
+        ttl_seconds: Lifetime of a cached prediction in both tiers.
+        redis_url: Optional Redis instance shared by all pods.
+    """
+    enabled: bool = True
+    max_entries: int = 1024
+    ttl_seconds: float = 3600
+    redis_url: RedisDsn | None = None
+
+
+class CeleryConfig(BaseModel):
+    """
+    Background job queue for asynchronous predictions.
+
+    Attributes:
+        broker_url: Message broker the API publishes jobs to.
+        result_backend: Store that keeps job states and results.
+        result_expires: Seconds a finished job's result stays retrievable.
+        task_always_eager: Run jobs inline instead of sending them to a
+            worker (tests and local debugging only).
+    """
+    broker_url: str = "redis://localhost:6379/0"
+    result_backend: str = "redis://localhost:6379/1"
+    result_expires: int = 86400
+    task_always_eager: bool = False
+
+
+class UploadConfig(BaseModel):
+    """
+    Limits applied to uploaded images.
+
+    Attributes:
+        max_batch_files: Maximum number of images accepted by one batch
+            request, counting files inside archives.
+        max_request_bytes: Largest request body; larger requests are
+            rejected with 413 before the multipart body is parsed.
+        max_file_bytes: Largest single image (also per archive member).
+        max_archive_bytes: Largest uploaded zip/tar archive.
+        max_batch_bytes: Most decoded bytes held by one batch request:
+            plain images plus uncompressed archive members.
+        max_image_pixels: Largest width * height accepted from an image
+            header (decompression-bomb guard).
+        read_chunk_bytes: Chunk size used to stream uploads into memory.
+    """
+    max_batch_files: int = 64
+    max_request_bytes: int = 256 * 1024 * 1024
+    max_file_bytes: int = 20 * 1024 * 1024
+    max_archive_bytes: int = 200 * 1024 * 1024
+    max_batch_bytes: int = 256 * 1024 * 1024
+    max_image_pixels: int = 40_000_000
+    read_chunk_bytes: int = 1024 * 1024
+
+
+class WriterConfig(BaseModel):
+    """
+    Write-behind persistence of prediction rows.
+
+    Attributes:
+        enabled: Buffer rows and write them in batches instead of committing
+            inside each request.
+        batch_size: Flush as soon as this many rows are buffered.
+        flush_interval_ms: Maximum age of a buffered row before a flush.
+        max_pending: Buffer capacity; requests wait when it is full.
+        use_copy: Use PostgreSQL COPY for flushes when the driver is asyncpg.
+    """
+    enabled: bool = True
+    batch_size: int = 500
+    flush_interval_ms: float = 200
+    max_pending: int = 10_000
+    use_copy: bool = True
+
+
+class HistoryConfig(BaseModel):
+    """
+    Prediction history queries.
+
+    Attributes:
+        default_page_size: Rows returned by /history when no limit is given.
+        max_page_size: Hard cap on the ``limit`` parameter of /history.
+        export_chunk_size: Rows fetched from the cursor and serialized per
+            chunk by /history/export.
+    """
+    default_page_size: int = 10
+    max_page_size: int = 100
+    export_chunk_size: int = 1000
+
+
+class RetentionConfig(BaseModel):
+    """
+    Monthly partitions of the ``predictions`` table (PostgreSQL).
+
+    Attributes:
+        months: Full months of history kept in the table; older partitions
+            are detached, archived and dropped. Nothing expires when unset.
+        premake_months: Partitions created ahead of the current month.
+        archive_dir: Directory for the archived partitions (``.csv.gz``),
+            relative to the project root unless absolute.
+        compress_level: gzip level of the archives (1-9).
+        lock_timeout_ms: Give up on a DDL statement that waits longer than
+            this for its lock instead of queueing the writers behind it.
+        detach_concurrently: Detach with ``DETACH PARTITION ... CONCURRENTLY``,
+            which does not block reads and writes of the other partitions.
+            PostgreSQL does not allow it while a DEFAULT partition exists.
+    """
+    months: int | None = None
+    premake_months: int = 3
+    archive_dir: str = "archive"
+    compress_level: int = 6
+    lock_timeout_ms: int = 5000
+    detach_concurrently: bool = True
+
+
+class MetricsConfig(BaseModel):
+    """
+    Prometheus metrics.
+
+    Attributes:
+        enabled: Record request/stage metrics and expose them.
+        path: URL path of the metrics endpoint.
+    """
+    enabled: bool = True
+    path: str = "/metrics"
+
+
+class RegistryConfig(BaseModel):
+    """
+    Resident model versions and hot reload.
+
+    Attributes:
+        default_name: Name of the version loaded at startup.
+        models_dir: Directory that admin loads may read weights from.
+        max_resident: Most versions kept in memory at once; loading one
+            more evicts the oldest version that is neither active nor shadow.
+        admin_token: Token expected in the X-Admin-Token header of the
+            /models admin endpoints; they are disabled while it is unset.
+        watch: Poll ``MLConfig.model_path`` and reload the default version
+            when the file changes (e.g. after train.py finishes).
+        watch_interval_seconds: Polling period of the watcher.
+    """
+    default_name: str = "default"
+    models_dir: str = "models"
+    max_resident: int = 3
+    admin_token: SecretStr | None = None
+    watch: bool = False
+    watch_interval_seconds: float = 30
+
+
+class WarmupConfig(BaseModel):
+    """
+    Startup warm-up that runs before the pod reports ready.
+
+    Attributes:
+        enabled: Warm up in the background after startup; /health/ready
+            answers 503 until it finishes. When disabled the pod is ready
+            as soon as the model is loaded.
+        batch_sizes: Batch sizes pushed through the model (default: powers
+            of two up to ``ml_config.max_batch_size``).
+        rounds: Passes per batch size, each on every pool worker.
+        db_connections: Connections opened ahead of traffic (default:
+            ``db.pool_size``).
+        timeout_seconds: Upper bound on the database part of the warm-up.
+    """
+    enabled: bool = True
+    batch_sizes: list[int] | None = None
+    rounds: int = 2
+    db_connections: int | None = None
+    timeout_seconds: float = 60
 
 
 class ApiV1Prefix(BaseModel):
@@ -100,6 +334,16 @@ class Settings(BaseSettings):
     run: RunConfig = RunConfig()
     api: ApiPrefix = ApiPrefix()
     ml_config: MLConfig = MLConfig()
+    executor: ExecutorConfig = ExecutorConfig()
+    cache: CacheConfig = CacheConfig()
+    celery: CeleryConfig = CeleryConfig()
+    upload: UploadConfig = UploadConfig()
+    writer: WriterConfig = WriterConfig()
+    history: HistoryConfig = HistoryConfig()
+    retention: RetentionConfig = RetentionConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    registry: RegistryConfig = RegistryConfig()
     db: DatabaseConfig
 
 
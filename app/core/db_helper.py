@@ -6,7 +6,9 @@ asynchronous database engine creation, connection pooling, and session handling
 for the application.
 """
 
+import time
 from collections.abc import AsyncGenerator
+from functools import cached_property
 
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
@@ -14,8 +16,21 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
 from app.core.config import settings
+from app.core.metrics import DB_POOL_CHECKOUT_SECONDS
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waits."""
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
 
 
 class DatabaseHelper:
@@ -25,6 +40,8 @@ class DatabaseHelper:
     A class for managing asynchronous database connections and sessions.
     This class encapsulates the creation and management of SQLAlchemy async engine
     and session factory with configurable connection pooling and logging.
+    Both are created on first access, so importing the helper (e.g. from
+    Alembic or a CLI) does not build an engine or load the driver.
 
     Attributes:
         engine (AsyncEngine): The SQLAlchemy async engine instance.
@@ -57,14 +74,29 @@ class DatabaseHelper:
             - Connection pooling helps manage database connections efficiently.
             - Set echo=True only in development for debugging SQL queries.
         """
-        self.engine: AsyncEngine = create_async_engine(
-            url=url,
-            echo=echo,
-            echo_pool=echo_pool,
-            pool_size=pool_size,
-            max_overflow=max_overflow,
+        self.url = url
+        self.echo = echo
+        self.echo_pool = echo_pool
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+
+    @cached_property
+    def engine(self) -> AsyncEngine:
+        """Engine with its connection pool, created on first use."""
+        return create_async_engine(
+            url=self.url,
+            echo=self.echo,
+            echo_pool=self.echo_pool,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            # Время ожидания соединения из пула уходит в метрики
+            poolclass=InstrumentedQueuePool,
         )
-        self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
+
+    @cached_property
+    def session_factory(self) -> async_sessionmaker[AsyncSession]:
+        """Factory of sessions bound to :attr:`engine`."""
+        return async_sessionmaker(
             bind=self.engine,
             autoflush=False,
             autocommit=False,
@@ -79,8 +111,9 @@ class DatabaseHelper:
         clean up database connections and release resources.
 
         """
-
-        await self.engine.dispose()
+        # Движок мог так и не понадобиться - тогда и закрывать нечего
+        if "engine" in self.__dict__:
+            await self.engine.dispose()
 
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
         """
@@ -0,0 +1,162 @@
+"""
+Prometheus metrics of the service.
+
+All metrics live in the default ``prometheus_client`` registry, which also
+carries the standard process collector (``process_resident_memory_bytes``,
+CPU seconds, open file descriptors) used to size the pods.
+
+Pipeline stages are timed with :data:`STAGE_SECONDS`::
+
+    with STAGE_SECONDS.labels(stage="preprocess").time():
+        ...
+
+Stages timed inside ``forward_batch`` (``forward``, ``softmax``) are only
+visible with the thread executor; worker processes keep their own registry.
+"""
+
+import time
+from typing import TYPE_CHECKING
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    Info,
+    generate_latest,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+    from app.core.ml.registry import ModelRegistry
+    from app.core.prediction_writer import PredictionWriter
+
+# Стадии занимают от долей миллисекунды (кэш) до секунд (большой батч)
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)  # fmt: skip
+
+REQUESTS_TOTAL = Counter(
+    "lungcheck_http_requests_total",
+    "HTTP requests by method, route template and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "lungcheck_http_request_duration_seconds",
+    "HTTP request latency by method and route template.",
+    ["method", "route"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "lungcheck_http_requests_in_progress",
+    "HTTP requests currently being served.",
+)
+STAGE_SECONDS = Histogram(
+    "lungcheck_stage_duration_seconds",
+    "Time spent in each stage of the prediction pipeline.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+BATCH_SIZE = Histogram(
+    "lungcheck_inference_batch_size",
+    "Rows per batched forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_DEPTH = Gauge(
+    "lungcheck_inference_queue_depth",
+    "Submissions waiting in the inference batchers of all model versions.",
+)
+WRITER_PENDING = Gauge(
+    "lungcheck_prediction_writer_pending",
+    "Prediction rows buffered by the write-behind writer.",
+)
+WRITER_DROPPED = Counter(
+    "lungcheck_prediction_writer_dropped_rows_total",
+    "Prediction rows discarded after every write attempt of their batch failed.",
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "lungcheck_db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the database pool.",
+    buckets=STAGE_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "lungcheck_db_pool_checked_out",
+    "Database connections currently checked out of the pool.",
+)
+MODEL_INFO = Info("lungcheck_model", "Active model version of this process.")
+SHADOW_PREDICTIONS = Counter(
+    "lungcheck_shadow_predictions_total",
+    "Shadow-model predictions by shadow version and agreement with the active one.",
+    ["version", "outcome"],
+)
+
+
+def observe_runtime(
+    registry: "ModelRegistry",
+    engine: "AsyncEngine",
+    writer: "PredictionWriter | None" = None,
+) -> None:
+    """
+    Bind the gauges that are read at scrape time to live objects.
+
+    Args:
+        registry: Resident models whose batcher queues are exported.
+        engine: Engine whose pool usage is exported.
+        writer: Write-behind writer whose buffer size is exported, if enabled.
+    """
+    QUEUE_DEPTH.set_function(lambda: registry.queue_depth)
+    pool = engine.sync_engine.pool
+    checkedout = getattr(pool, "checkedout", None)
+    if checkedout is not None:
+        DB_POOL_CHECKED_OUT.set_function(checkedout)
+    if writer is not None:
+        WRITER_PENDING.set_function(lambda: writer.pending)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Expose all metrics in the Prometheus text format."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per route template.
+
+    The route label is the path template (``/api/v1/lungcheck/history``),
+    not the raw path, so the label set stays bounded; unmatched paths are
+    reported as ``unmatched``.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # FastAPI кладет найденный маршрут в scope при роутинге
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            REQUEST_SECONDS.labels(method, template).observe(
+                time.perf_counter() - start
+            )
+            REQUESTS_TOTAL.labels(method, template, str(status_code)).inc()
@@ -1,3 +1,3 @@
-from app.core.ml.model_loader import model_loader
-
-__all__ = ("model_loader",)
+# model_loader тянет torch, поэтому не реэкспортируется отсюда: легкие модули
+# пакета (кэш предсказаний) импортируются без ML-стека. Используйте
+# from app.core.ml.model_loader import model_loader
@@ -0,0 +1,70 @@
+"""
+Inference backends the service can serve the model through.
+
+A backend is any callable that maps a stacked [N, 3, 224, 224] input tensor
+([N, 1, 224, 224] raw pixels in grayscale mode) to [N, num_classes] logits.
+The PyTorch backend is the ``nn.Module`` itself; :class:`OnnxBackend` runs an
+ONNX export of the same weights on ONNX Runtime's CPU execution provider.
+"""
+
+import logging
+from collections.abc import Callable
+from pathlib import Path
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+InferenceBackend = Callable[[torch.Tensor], torch.Tensor]
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime inference session behind the backend call contract.
+
+    Attributes:
+        path: Location of the .onnx graph.
+        intra_op_threads: Threads used inside one operator.
+        inter_op_threads: Threads used across independent operators.
+        input_channels: Channels the graph expects (1 for a grayscale export).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+    ) -> None:
+        """
+        Create the inference session with full graph optimizations.
+
+        Args:
+            path: Location of the .onnx graph.
+            intra_op_threads: Threads used inside one operator.
+            inter_op_threads: Threads used across independent operators.
+        """
+        import onnxruntime as ort
+
+        self.path = path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        self.session = ort.InferenceSession(
+            str(path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        graph_input = self.session.get_inputs()[0]
+        self.input_name = graph_input.name
+        self.input_channels = graph_input.shape[1]
+        logger.info("ONNX Runtime session created for %s", path)
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        """Run the graph on a batch and return the logits as a tensor."""
+        inputs = batch.detach().contiguous().numpy()
+        (logits,) = self.session.run(None, {self.input_name: inputs})
+        return torch.from_numpy(logits)
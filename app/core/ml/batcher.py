@@ -0,0 +1,306 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent ``/predict`` calls each submit a single preprocessed tensor. The
+batcher gathers them into one stacked tensor, runs a single forward pass and
+hands every caller back its own softmax/argmax slice.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import torch
+
+from app.core.metrics import BATCH_SIZE, STAGE_SECONDS
+
+if TYPE_CHECKING:
+    from app.core.ml.executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class InferenceResult:
+    """
+    Per-sample result of a batched forward pass.
+
+    Attributes:
+        class_index: Index of the most probable class.
+        confidence: Probability of that class (0.0 to 1.0).
+        probabilities: Softmax output for this sample, shape [num_classes].
+    """
+
+    class_index: int
+    confidence: float
+    probabilities: torch.Tensor
+
+
+def forward_batch(
+    model: Callable[[torch.Tensor], torch.Tensor], batch: torch.Tensor
+) -> list[InferenceResult]:
+    """
+    Run the model on a stacked batch and split the output per sample.
+
+    Args:
+        model: Callable that maps an [N, C, H, W] tensor to [N, num_classes] logits.
+        batch: Stacked input tensor.
+
+    Returns:
+        One InferenceResult per row of the batch, in order.
+    """
+    with torch.inference_mode():
+        with STAGE_SECONDS.labels(stage="forward").time():
+            logits = model(batch)
+        with STAGE_SECONDS.labels(stage="softmax").time():
+            probabilities = torch.nn.functional.softmax(logits, dim=1)
+            confidence, predicted_class = torch.max(probabilities, 1)
+
+    return [
+        InferenceResult(
+            class_index=int(predicted_class[i]),
+            confidence=float(confidence[i]),
+            probabilities=probabilities[i],
+        )
+        for i in range(probabilities.shape[0])
+    ]
+
+
+class InferenceBatcher:
+    """
+    Asyncio scheduler that coalesces concurrent inference requests.
+
+    A batch is flushed as soon as it reaches ``max_batch_size`` samples or
+    ``max_wait_ms`` milliseconds have passed since its first sample arrived,
+    whichever happens first. A submission that would push a batch past
+    ``max_batch_size`` starts the next batch instead; only a single
+    submission larger than the cap is run on its own as one batch.
+
+    When an executor is given, forward passes run in its pool and up to
+    ``executor.max_workers`` batches may be in flight at once; otherwise they
+    run inline on the event loop.
+
+    Attributes:
+        model: Callable producing logits for a stacked input tensor.
+        max_batch_size: Upper bound on the number of samples per forward pass.
+        max_wait_ms: Longest time the first sample of a batch may wait.
+        executor: Optional pool the forward passes are offloaded to.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[torch.Tensor], torch.Tensor],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        executor: "InferenceExecutor | None" = None,
+    ) -> None:
+        """
+        Initialize the batcher.
+
+        Args:
+            model: Callable producing logits for a stacked input tensor.
+            max_batch_size: Upper bound on the number of samples per forward pass.
+            max_wait_ms: Longest time the first sample of a batch may wait.
+            executor: Optional pool the forward passes are offloaded to.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+        self._slots = asyncio.Semaphore(executor.max_workers if executor else 1)
+        self._inflight: set[asyncio.Task[None]] = set()
+        # None в очереди - метка stop(drain=True): за ней отправок не будет
+        self._queue: asyncio.Queue[
+            tuple[torch.Tensor, asyncio.Future[list[InferenceResult]]] | None
+        ] = asyncio.Queue()
+        self._task: asyncio.Task[None] | None = None
+        self._draining = False
+        # Отправка, не поместившаяся в прошлый батч: открывает следующий
+        self._carry: (
+            tuple[torch.Tensor, asyncio.Future[list[InferenceResult]]] | None
+        ) = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of submissions waiting to be batched."""
+        return self._queue.qsize() + (self._carry is not None)
+
+    def start(self) -> None:
+        """Start the background batching loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="inference-batcher")
+
+    async def stop(self, drain: bool = False) -> None:
+        """
+        Stop the batching loop and fail any submissions still queued.
+
+        Args:
+            drain: Refuse new submissions but serve every one already
+                accepted, including a batch still being collected (used when
+                a model version is retired while serving).
+        """
+        if self._task is None:
+            return
+
+        if drain:
+            self._draining = True
+            self._queue.put_nowait(None)
+        else:
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._draining = False
+
+        # Уже запущенные батчи доводим до конца
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        pending = [self._queue.get_nowait() for _ in range(self._queue.qsize())]
+        if self._carry is not None:
+            pending.append(self._carry)
+            self._carry = None
+        for item in pending:
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError("Inference batcher stopped"))
+
+    async def submit(self, tensor: torch.Tensor) -> list[InferenceResult]:
+        """
+        Queue a tensor for inference and wait for its results.
+
+        Args:
+            tensor: Preprocessed input of shape [K, C, H, W]. K is usually 1,
+                but several samples from one caller stay together in a batch.
+
+        Returns:
+            K results in the order of the input rows.
+        """
+        if self._task is None or self._draining:
+            raise RuntimeError("Inference batcher is not running")
+
+        future: asyncio.Future[list[InferenceResult]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        await self._queue.put((tensor, future))
+        return await future
+
+    async def predict(self, tensor: torch.Tensor) -> InferenceResult:
+        """
+        Convenience wrapper around :meth:`submit` for a single image.
+
+        Args:
+            tensor: Preprocessed input of shape [1, C, H, W].
+
+        Returns:
+            The result for that image.
+        """
+        results = await self.submit(tensor)
+        return results[0]
+
+    async def _collect(
+        self,
+    ) -> list[tuple[torch.Tensor, asyncio.Future[list[InferenceResult]]]]:
+        """
+        Wait for the first submission, then gather more until a flush condition.
+
+        Returns:
+            The batch; empty once a draining stop has served everything.
+        """
+        first = self._carry or await self._queue.get()
+        self._carry = None
+        if first is None:
+            return []
+        items = [first]
+        size = first[0].shape[0]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        try:
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except TimeoutError:
+                    break
+                if item is None:
+                    # Новых отправок не будет - батч уходит сразу, метка
+                    # остается для следующего сбора
+                    self._queue.put_nowait(None)
+                    break
+                if size + item[0].shape[0] > self.max_batch_size:
+                    self._carry = item
+                    break
+                items.append(item)
+                size += item[0].shape[0]
+        except asyncio.CancelledError:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference batcher stopped"))
+            raise
+
+        return items
+
+    async def _run(self) -> None:
+        """Main loop: collect a batch and hand it off for execution."""
+        while True:
+            await self._slots.acquire()
+            try:
+                items = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not items:
+                self._slots.release()
+                return
+
+            if self.executor is None:
+                await self._execute(items)
+                continue
+
+            task = asyncio.create_task(self._execute(items))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _execute(
+        self, items: list[tuple[torch.Tensor, asyncio.Future[list[InferenceResult]]]]
+    ) -> None:
+        """Run one batch and distribute the per-caller slices."""
+        try:
+            # Клиент мог отключиться, пока запрос стоял в очереди
+            items = [(tensor, future) for tensor, future in items if not future.done()]
+            if not items:
+                return
+
+            batch = torch.cat([tensor for tensor, _ in items])
+            BATCH_SIZE.observe(batch.shape[0])
+            try:
+                if self.executor is None:
+                    results = forward_batch(self.model, batch)
+                else:
+                    results = await self.executor.infer(self.model, batch)
+            except Exception as e:
+                logger.exception("Batched inference failed: %s", e)
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            logger.debug("Processed inference batch of %d", batch.shape[0])
+
+            offset = 0
+            for tensor, future in items:
+                count = tensor.shape[0]
+                if not future.done():
+                    future.set_result(results[offset : offset + count])
+                offset += count
+        finally:
+            self._slots.release()
@@ -0,0 +1,195 @@
+"""
+Content-addressed cache of prediction results.
+
+Identical uploads (re-sent studies, integration retries) map to the same key:
+a digest of the raw bytes combined with the version of the model weights and
+the runtime serving them. A hit skips image decoding and the forward pass
+entirely.
+
+Two tiers are supported: an in-process LRU with size and TTL limits, and an
+optional Redis tier shared by all pods.
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+import orjson
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPrediction:
+    """
+    Cached outcome of a single prediction.
+
+    Attributes:
+        prediction: Predicted class label.
+        confidence: Probability of that class (0.0 to 1.0).
+    """
+
+    prediction: str
+    confidence: float
+
+
+@dataclass(slots=True)
+class CacheStats:
+    """
+    Hit/miss counters of the prediction cache.
+
+    Attributes:
+        memory_hits: Lookups answered by the in-process tier.
+        redis_hits: Lookups answered by the Redis tier.
+        misses: Lookups answered by neither tier.
+        redis_errors: Redis operations that failed and were skipped.
+        size: Entries currently held in the in-process tier.
+    """
+
+    memory_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    redis_errors: int = 0
+    size: int = 0
+
+
+class PredictionCache:
+    """
+    Two-tier (LRU in memory, optional Redis) cache of prediction results.
+
+    Attributes:
+        max_entries: Capacity of the in-process tier.
+        ttl_seconds: Lifetime of an entry in both tiers.
+        key_prefix: Namespace for keys in Redis.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        redis_url: str | None = None,
+        key_prefix: str = "lungcheck:prediction:",
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Capacity of the in-process tier; least recently used
+                entries are evicted first.
+            ttl_seconds: Lifetime of an entry in both tiers.
+            redis_url: URL of the shared Redis tier. None disables it.
+            key_prefix: Namespace for keys in Redis.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self._entries: OrderedDict[str, tuple[float, CachedPrediction]] = OrderedDict()
+        self._stats = CacheStats()
+        self._redis: Redis | None = None
+
+        if redis_url:
+            from redis.asyncio import from_url
+
+            self._redis = from_url(redis_url)
+
+    @staticmethod
+    def make_key(content: bytes, model_version: str, runtime: str) -> str:
+        """
+        Build the cache key for an upload.
+
+        Args:
+            content: Raw uploaded bytes.
+            model_version: Version of the weights that would score the upload.
+            runtime: Variant serving those weights (``ModelLoader.runtime``);
+                e.g. int8 or ONNX outputs differ slightly from eager ones.
+
+        Returns:
+            Hex digest that changes whenever the bytes, the model or the
+            runtime change.
+        """
+        digest = hashlib.blake2b(content, digest_size=20)
+        digest.update(f"{model_version}:{runtime}".encode())
+        return digest.hexdigest()
+
+    @property
+    def stats(self) -> CacheStats:
+        """Snapshot of the hit/miss counters."""
+        self._stats.size = len(self._entries)
+        return CacheStats(**asdict(self._stats))
+
+    async def get(self, key: str) -> CachedPrediction | None:
+        """
+        Look up a key, first in memory, then in Redis.
+
+        A Redis hit is promoted into the in-process tier.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats.memory_hits += 1
+                return value
+            del self._entries[key]
+
+        if self._redis is not None:
+            from redis.exceptions import RedisError
+
+            try:
+                raw = await self._redis.get(self.key_prefix + key)
+            except RedisError as e:
+                logger.warning("Prediction cache: Redis get failed: %s", e)
+                self._stats.redis_errors += 1
+                raw = None
+
+            if raw is not None:
+                value = CachedPrediction(**orjson.loads(raw))
+                self._remember(key, value)
+                self._stats.redis_hits += 1
+                return value
+
+        self._stats.misses += 1
+        return None
+
+    async def set(self, key: str, value: CachedPrediction) -> None:
+        """Store a result in both tiers."""
+        self._remember(key, value)
+
+        if self._redis is not None:
+            from redis.exceptions import RedisError
+
+            try:
+                await self._redis.set(
+                    self.key_prefix + key,
+                    orjson.dumps(asdict(value)),
+                    ex=max(1, int(self.ttl_seconds)),
+                )
+            except RedisError as e:
+                logger.warning("Prediction cache: Redis set failed: %s", e)
+                self._stats.redis_errors += 1
+
+    def clear(self) -> None:
+        """Drop every entry of the in-process tier."""
+        self._entries.clear()
+
+    async def close(self) -> None:
+        """Release the Redis connection pool, if any."""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def _remember(self, key: str, value: CachedPrediction) -> None:
+        """Insert into the LRU tier, evicting the oldest entries beyond capacity."""
+        if self.max_entries <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
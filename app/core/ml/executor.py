@@ -0,0 +1,220 @@
+"""
+Execution pool for CPU-bound image decoding and model inference.
+
+Keeps PIL decoding and torch forward passes off the asyncio event loop so a
+single large X-ray cannot stall unrelated requests on the same worker. The
+pool is either a thread pool (cheap, shares the in-process model) or a process
+pool (sidesteps the GIL and uses every core of the pod).
+
+In process mode the weights are loaded once by the API process, moved to
+shared memory and handed to the workers as read-only views, so RSS does not
+grow with the worker count. Input and output tensors travel through
+``torch.multiprocessing`` reductions, i.e. as shared-memory handles rather
+than pickled copies of the data.
+"""
+
+import asyncio
+import logging
+import os
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Literal, ParamSpec, TypeVar
+
+import torch
+import torch.multiprocessing as torch_mp
+
+from app.core.ml.batcher import InferenceResult, forward_batch
+from app.core.ml.variants import is_shareable
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Модель, загруженная внутри процесса-воркера (только для kind="process")
+_worker_model: Callable[[torch.Tensor], torch.Tensor] | None = None
+
+
+def available_cpus() -> int:
+    """Return the number of CPU cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+def threads_per_worker(max_workers: int | None) -> int:
+    """
+    Split the available cores evenly between pool workers.
+
+    Args:
+        max_workers: Pool size (default: one worker per core).
+
+    Returns:
+        Intra-op threads each worker may use without oversubscribing the CPU.
+    """
+    cpus = available_cpus()
+    return max(1, cpus // (max_workers or cpus))
+
+
+def configure_torch_threads(num_threads: int, interop_threads: int) -> None:
+    """
+    Set torch intra-op and inter-op thread pools for the current process.
+
+    Inter-op threads can only be set once, before any parallel work has
+    started, so a repeated call keeps the existing value.
+
+    Args:
+        num_threads: Intra-op threads (used inside a single operator).
+        interop_threads: Inter-op threads (used across independent operators).
+    """
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        logger.debug("torch inter-op threads already initialized, keeping them")
+
+
+def _init_process_worker(
+    num_threads: int,
+    interop_threads: int,
+    model: Callable[[torch.Tensor], torch.Tensor] | None = None,
+) -> None:
+    """
+    Process pool initializer: pin torch threads and attach the model.
+
+    Args:
+        num_threads: Intra-op torch threads for this worker.
+        interop_threads: Inter-op torch threads for this worker.
+        model: Model whose parameters live in shared memory. When omitted the
+            worker loads its own private copy.
+    """
+    global _worker_model
+
+    configure_torch_threads(num_threads, interop_threads)
+
+    if model is None:
+        from app.core.ml.model_loader import ModelLoader
+
+        model = ModelLoader().load_model()
+
+    _worker_model = model
+
+
+def _forward_in_worker(batch: torch.Tensor) -> list[InferenceResult]:
+    """Run a batch through the model owned by the current worker process."""
+    if _worker_model is None:
+        raise RuntimeError("Inference worker has no model loaded")
+    return forward_batch(_worker_model, batch)
+
+
+class InferenceExecutor:
+    """
+    Size-configurable pool for decoding and inference.
+
+    Attributes:
+        kind: "thread" or "process".
+        max_workers: Number of pool workers.
+        torch_threads: Intra-op torch threads per worker.
+        torch_interop_threads: Inter-op torch threads per worker.
+    """
+
+    def __init__(
+        self,
+        kind: Literal["thread", "process"] = "thread",
+        max_workers: int | None = None,
+        torch_threads: int | None = None,
+        torch_interop_threads: int = 1,
+    ) -> None:
+        """
+        Initialize the pool settings. No workers are started until :meth:`start`.
+
+        Args:
+            kind: "thread" or "process".
+            max_workers: Number of pool workers (default: number of CPU cores).
+            torch_threads: Intra-op torch threads per worker. When unset the
+                cores are split evenly between workers so that concurrent
+                forward passes do not oversubscribe the CPU.
+            torch_interop_threads: Inter-op torch threads per worker.
+        """
+        self.kind = kind
+        self.max_workers = max_workers or available_cpus()
+        self.torch_threads = torch_threads or threads_per_worker(self.max_workers)
+        self.torch_interop_threads = torch_interop_threads
+        self._pool: Executor | None = None
+
+    def start(
+        self, model: Callable[[torch.Tensor], torch.Tensor] | None = None
+    ) -> None:
+        """
+        Create the underlying pool and configure torch threading.
+
+        Args:
+            model: Model already loaded in this process. In process mode its
+                parameters are moved to shared memory and reused by every
+                worker instead of each worker loading the weights again.
+        """
+        if self._pool is not None:
+            return
+
+        if self.kind == "process":
+            if model is not None and not is_shareable(model):
+                logger.info("Model variant is not shareable, workers load their own")
+                model = None
+            if isinstance(model, torch.nn.Module):
+                model.share_memory()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=torch_mp.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.torch_threads, self.torch_interop_threads, model),
+            )
+        else:
+            configure_torch_threads(self.torch_threads, self.torch_interop_threads)
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="inference"
+            )
+
+        logger.info(
+            "Started %s pool: %d workers x %d torch threads",
+            self.kind,
+            self.max_workers,
+            self.torch_threads,
+        )
+
+    def shutdown(self) -> None:
+        """Stop the pool, waiting for running tasks to finish."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
+        """
+        Run a blocking callable in the pool and await its result.
+
+        For a process pool ``fn`` and its arguments must be picklable.
+        """
+        if self._pool is None:
+            raise RuntimeError("Inference executor is not running")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    async def infer(
+        self, model: Callable[[torch.Tensor], torch.Tensor], batch: torch.Tensor
+    ) -> list[InferenceResult]:
+        """
+        Run a forward pass in the pool.
+
+        Args:
+            model: The in-process model. Used by thread pools only; process
+                workers use the shared model attached at startup.
+            batch: Stacked input tensor.
+
+        Returns:
+            One InferenceResult per row of the batch.
+        """
+        if self.kind == "process":
+            return await self.run(_forward_in_worker, batch)
+        return await self.run(forward_batch, model, batch)
@@ -0,0 +1,131 @@
+"""
+Export the trained PyTorch weights to ONNX for the ONNX Runtime backend.
+
+Reads the .pth produced by ``train.py`` and writes a .onnx file alongside it
+(or to ``--output``), with a dynamic batch dimension. The export is checked
+against the PyTorch model before the command exits.
+
+Usage::
+
+    python -m app.core.ml.export_onnx [--weights PATH] [--output PATH]
+        [--grayscale]
+"""
+
+import argparse
+import logging
+from pathlib import Path
+
+import torch
+
+from app.core.config import settings
+from app.core.ml.backends import OnnxBackend
+from app.core.ml.model_loader import ModelLoader
+from app.core.ml.variants import fold_grayscale
+from app.utils.image_processor import MEAN, STD
+
+logger = logging.getLogger(__name__)
+
+
+def export_onnx(
+    weights_path: Path,
+    output_path: Path,
+    opset: int = 17,
+    tolerance: float = 1e-4,
+    grayscale: bool = False,
+) -> Path:
+    """
+    Export the float32 model to ONNX and verify the result.
+
+    Args:
+        weights_path: Trained .pth weights.
+        output_path: Where to write the .onnx graph.
+        opset: ONNX opset version.
+        tolerance: Largest allowed difference between PyTorch and ONNX
+            Runtime logits on a random batch.
+        grayscale: Export the model with the folded first convolution,
+            taking one channel of raw pixels (see ``fold_grayscale``).
+
+    Returns:
+        The path of the written file.
+
+    Raises:
+        FileNotFoundError: If the weights do not exist.
+        ValueError: If ONNX Runtime outputs diverge from PyTorch.
+    """
+    if not weights_path.exists():
+        raise FileNotFoundError(f"Weights not found: {weights_path}")
+
+    loader = ModelLoader()
+    loader.device = torch.device("cpu")
+    model = loader.load_float_model(weights_path)
+    if grayscale:
+        model = fold_grayscale(model, MEAN, STD, 224)
+
+    def sample(batch_size: int) -> torch.Tensor:
+        if grayscale:
+            return torch.rand(batch_size, 1, 224, 224) * 255
+        return torch.randn(batch_size, 3, 224, 224)
+
+    dummy = sample(2)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    torch.onnx.export(
+        model,
+        (dummy,),
+        str(output_path),
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+        dynamo=False,
+    )
+
+    # Проверяем, что ONNX Runtime выдает те же логиты
+    check = sample(3)
+    with torch.inference_mode():
+        expected = model(check)
+    actual = OnnxBackend(output_path)(check)
+    error = float((expected - actual).abs().max())
+    if error > tolerance:
+        raise ValueError(f"ONNX export diverges from PyTorch: max diff {error:.2e}")
+
+    logger.info("Exported %s -> %s (max diff %.2e)", weights_path, output_path, error)
+    return output_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--weights",
+        type=Path,
+        default=settings.PROJECT_ROOT / settings.ml_config.model_path,
+        help="trained .pth weights (default: MLConfig.model_path)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="output .onnx path (default: next to the weights)",
+    )
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument(
+        "--grayscale",
+        action=argparse.BooleanOptionalAction,
+        default=settings.ml_config.grayscale,
+        help="fold conv1 for single-channel input (default: MLConfig.grayscale)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    export_onnx(
+        args.weights,
+        args.output or args.weights.with_suffix(".onnx"),
+        args.opset,
+        grayscale=args.grayscale,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,330 @@
+import hashlib
 import logging
-from typing import cast
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
 
 import torch
 import torch.nn as nn
-from torchvision import models
-from torchvision.models import ResNet
 
 from app.core.config import settings
+from app.core.ml.backends import InferenceBackend, OnnxBackend
+from app.core.ml.executor import threads_per_worker
+from app.core.ml.variants import (
+    build_variant,
+    fold_grayscale,
+    parity_error,
+    uses_channels_last,
+)
+
+if TYPE_CHECKING:
+    # torchvision тянет весь зоопарк моделей, импортируем его только при сборке
+    from torchvision.models import ResNet
 
 logger = logging.getLogger(__name__)
 
+UNTRAINED_VERSION = "untrained"
+
+# Порядок совпадает с ImageFolder.classes при обучении (train.py)
+CLASS_NAMES = ["NORMAL", "PNEUMONIA"]
+
+
+class StaleExportError(RuntimeError):
+    """The ONNX export is older than the weights it would be served for."""
+
 
 class ModelLoader:
     def __init__(self, model_name: str = "resnet18") -> None:
         self.model_name = model_name
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = None
+        self.version = UNTRAINED_VERSION
+        self.runtime = "eager"
+
+    @staticmethod
+    def weights_version(weights_path: Path) -> str:
+        """
+        Derive a short, stable version identifier from the weights file content.
+
+        Args:
+            weights_path: Path to the .pth file.
+
+        Returns:
+            The first 12 hex digits of the file's SHA-256 digest.
+        """
+        digest = hashlib.sha256()
+        with weights_path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:12]
+
+    @staticmethod
+    def check_onnx_export(weights_path: Path) -> None:
+        """
+        Refuse to serve a .pth through an ONNX export made before it.
+
+        With the ONNX backend a .pth is served by the export next to it, so
+        after retraining an old export would keep answering under the old
+        version.
+
+        Args:
+            weights_path: Weights about to be loaded.
+
+        Raises:
+            StaleExportError: If the export exists and is older than the
+                weights.
+        """
+        if settings.ml_config.backend != "onnx" or weights_path.suffix == ".onnx":
+            return
+        onnx_path = weights_path.with_suffix(".onnx")
+        try:
+            if onnx_path.stat().st_mtime >= weights_path.stat().st_mtime:
+                return
+        except FileNotFoundError:
+            # Без экспорта (или весов) load_model сам откатится на PyTorch
+            return
+        raise StaleExportError(
+            f"ONNX export {onnx_path.name} is older than {weights_path.name}; "
+            "re-export it with python -m app.core.ml.export_onnx"
+        )
+
+    def load_model(self, weights_path: Path | None = None) -> InferenceBackend:
+        """
+        Build the inference backend selected by ``MLConfig.backend``.
+
+        Args:
+            weights_path: Weights to serve (default: ``MLConfig.model_path``).
+                An ``.onnx`` file is always served with ONNX Runtime.
+
+        Returns:
+            The PyTorch model (possibly an optimized variant) or an ONNX
+            Runtime session wrapper; both map an input batch to logits.
+
+        Raises:
+            StaleExportError: With the ONNX backend, if the export next to
+                ``weights_path`` predates it.
+        """
+        if weights_path is not None and weights_path.suffix == ".onnx":
+            backend = self.load_onnx(weights_path)
+            if backend is None:
+                raise FileNotFoundError(weights_path)
+            self.model = backend
+            return backend
+
+        if settings.ml_config.backend == "onnx":
+            if weights_path is not None:
+                self.check_onnx_export(weights_path)
+            backend = self.load_onnx(
+                weights_path.with_suffix(".onnx") if weights_path else None
+            )
+            if backend is not None:
+                self.model = backend
+                return backend
+
+        model = self.load_float_model(weights_path)
+        if settings.ml_config.grayscale:
+            from app.utils.image_processor import MEAN, STD, image_processor
+
+            model = fold_grayscale(model, MEAN, STD, image_processor.img_size)
+        model = self.optimize(model)
+        if settings.ml_config.grayscale:
+            self.runtime += "+grayscale"
+        self.model = model
+
+        logger.info(
+            "Model %s (%s) loaded successfully on %s",
+            self.version,
+            self.runtime,
+            self.device,
+        )
+        return model
+
+    def load_float_model(self, weights_path: Path | None = None) -> "ResNet":
+        """
+        Build the float32 eager ResNet and load the trained weights into it.
+
+        Args:
+            weights_path: Weights to load (default: ``MLConfig.model_path``).
+
+        Returns:
+            The model in eval mode on ``self.device``.
+        """
+        from torchvision import models
 
-    def load_model(self) -> ResNet:
         logger.info("Initializing %s architecture...", self.model_name)
 
         model: ResNet = models.resnet18(weights=None)
-        model.fc = nn.Linear(model.fc.in_features, 2)
+        model.fc = nn.Linear(model.fc.in_features, len(CLASS_NAMES))
 
-        weights_path = settings.PROJECT_ROOT / settings.ml_config.model_path
+        weights_path = (
+            weights_path or settings.PROJECT_ROOT / settings.ml_config.model_path
+        )
 
         if weights_path.exists():
             logger.info("Loading trained weights from %s", weights_path)
-            model.load_state_dict(torch.load(weights_path, map_location=self.device))
+            # mmap: страницы весов берутся из page cache и делятся между
+            # процессами (несколько uvicorn-воркеров держат одну копию)
+            mmap = settings.ml_config.mmap_weights and self.device.type == "cpu"
+            state_dict = torch.load(
+                weights_path, map_location=self.device, mmap=mmap, weights_only=True
+            )
+            model.load_state_dict(state_dict, assign=mmap)
+            self.version = self.weights_version(weights_path)
         else:
             logger.warning("Trained weights NOT FOUND at %s", weights_path)
+            self.version = UNTRAINED_VERSION
 
         model.to(self.device)
         model.eval()
+        return model
 
-        self.model = model
+    def onnx_path(self) -> Path:
+        """Location of the ONNX export (next to the .pth unless configured)."""
+        configured = settings.ml_config.onnx_path
+        if configured:
+            return settings.PROJECT_ROOT / configured
+        return (settings.PROJECT_ROOT / settings.ml_config.model_path).with_suffix(
+            ".onnx"
+        )
 
-        logger.info("Model loaded successfully on %s", self.device)
-        return model
+    def load_onnx(self, path: Path | None = None) -> OnnxBackend | None:
+        """
+        Create an ONNX Runtime backend for the exported graph.
+
+        Args:
+            path: Exported graph (default: :meth:`onnx_path`).
+
+        Returns:
+            The backend, or None if the export does not exist yet (the
+            PyTorch backend is served instead).
+        """
+        path = path or self.onnx_path()
+        if not path.exists():
+            logger.warning(
+                "ONNX export NOT FOUND at %s (run python -m app.core.ml.export_onnx), "
+                "falling back to PyTorch",
+                path,
+            )
+            return None
+
+        backend = OnnxBackend(
+            path,
+            intra_op_threads=settings.executor.torch_threads
+            or threads_per_worker(settings.executor.max_workers),
+            inter_op_threads=settings.executor.torch_interop_threads,
+        )
+        expected = 1 if settings.ml_config.grayscale else 3
+        if backend.input_channels != expected:
+            logger.warning(
+                "ONNX export %s takes %s channels, not %d (re-export it after "
+                "changing MLConfig.grayscale), falling back to PyTorch",
+                path,
+                backend.input_channels,
+                expected,
+            )
+            return None
+
+        self.version = self.weights_version(path)
+        self.runtime = "onnx+grayscale" if expected == 1 else "onnx"
+        logger.info("ONNX model %s loaded successfully", self.version)
+        return backend
+
+    def calibration_inputs(self) -> torch.Tensor | None:
+        """
+        Representative inputs for static quantization and the parity check.
+
+        Returns:
+            Preprocessed images from ``MLConfig.calibration_dir``, or None
+            when it is unset or holds no images.
+        """
+        calibration_dir = settings.ml_config.calibration_dir
+        if not calibration_dir:
+            return None
+
+        from app.utils.archive import is_image_member
+        from app.utils.image_processor import image_processor
+
+        root = settings.PROJECT_ROOT / calibration_dir
+        paths = sorted(
+            p
+            for p in root.rglob("*")
+            if p.is_file() and is_image_member(p.relative_to(root).as_posix())
+        )[: settings.ml_config.calibration_samples]
+        if not paths:
+            logger.warning("No calibration images in %s", calibration_dir)
+            return None
+        return image_processor.process_images([p.read_bytes() for p in paths]).to(
+            self.device
+        )
+
+    def random_inputs(self) -> torch.Tensor:
+        """Random inputs for the parity check when no X-rays are configured."""
+        from app.utils.image_processor import image_processor
+
+        count = settings.ml_config.calibration_samples
+        size = image_processor.img_size
+        generator = torch.Generator().manual_seed(0)
+        if settings.ml_config.grayscale:
+            # Модель со свернутым conv1 ждет сырые пиксели 0..255
+            inputs = torch.rand(count, 1, size, size, generator=generator) * 255
+            return inputs.to(self.device)
+        return torch.randn(count, 3, size, size, generator=generator).to(self.device)
+
+    def optimize(self, model: nn.Module) -> nn.Module:
+        """
+        Replace the float32 eager model by the configured runtime variant.
+
+        The variant is served only if it builds and its softmax outputs stay
+        within ``MLConfig.parity_tolerance`` of the float model; otherwise the
+        float model is kept and the reason is logged.
+
+        Args:
+            model: The float32 model in eval mode.
+
+        Returns:
+            The variant to serve.
+        """
+        runtime = settings.ml_config.runtime
+        channels_last = settings.ml_config.channels_last
+        self.runtime = "eager"
+
+        if runtime == "eager" and not channels_last:
+            return model
+        if self.device.type != "cpu" and runtime in ("dynamic_int8", "static_int8"):
+            logger.warning("INT8 runtime %s is CPU-only, serving float model", runtime)
+            return model
+
+        try:
+            inputs = self.calibration_inputs()
+            if inputs is None:
+                if runtime == "static_int8":
+                    # Диапазоны активаций по шуму ничего не говорят о снимках
+                    logger.error(
+                        "static_int8 needs real X-rays in MLConfig.calibration_dir, "
+                        "serving float model"
+                    )
+                    return model
+                inputs = self.random_inputs()
+            variant = build_variant(model, runtime, channels_last, inputs)
+            error = parity_error(model, variant, inputs)
+        except Exception as e:
+            logger.exception("Could not build %s variant: %s", runtime, e)
+            return model
+
+        if error > settings.ml_config.parity_tolerance:
+            logger.error(
+                "%s variant failed parity check (max softmax diff %.4f > %.4f), "
+                "serving float model",
+                runtime,
+                error,
+                settings.ml_config.parity_tolerance,
+            )
+            return model
+
+        self.runtime = runtime
+        if uses_channels_last(runtime, channels_last):
+            self.runtime += "+channels_last"
+        logger.info("Serving %s variant (max softmax diff %.2e)", self.runtime, error)
+        return variant
 
 
 model_loader = ModelLoader()
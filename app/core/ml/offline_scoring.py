@@ -0,0 +1,640 @@
+"""
+Offline batch scoring of whole image directories on a CPU node.
+
+Files are decoded by a pool of worker processes into a bounded window of
+chunks (at most ``queue_size`` chunks are decoded ahead), so decoding of the
+next batches overlaps with the forward pass of the current one while memory
+stays bounded. The main process runs batched inference with the remaining
+cores and streams the results to CSV, Parquet or the ``predictions`` table.
+
+Files are scored in sorted order. After every flush a checkpoint records how
+many files are done (and, for CSV, the byte offset written), so an
+interrupted run resumes where it stopped instead of starting over.
+
+Usage::
+
+    python -m app.core.ml.offline_scoring INPUT_DIR [--output PATH]
+        [--format csv|parquet|db] [--batch-size 64] [--decode-workers N]
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import logging
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Protocol, TextIO
+
+import orjson
+import torch
+import torch.multiprocessing as torch_mp
+
+from app.core.config import settings
+from app.core.ml.batcher import InferenceResult, forward_batch
+from app.core.ml.executor import available_cpus, configure_torch_threads
+from app.core.ml.model_loader import CLASS_NAMES, ModelLoader
+from app.core.prediction_writer import COLUMNS, PredictionRow, PredictionWriter
+from app.utils.archive import is_image_member
+from app.utils.image_processor import image_processor
+
+logger = logging.getLogger(__name__)
+
+
+def list_images(root: Path) -> list[str]:
+    """
+    Find the image files under ``root``.
+
+    Args:
+        root: Directory searched recursively.
+
+    Returns:
+        Paths relative to ``root`` (POSIX separators), sorted.
+    """
+    return sorted(
+        name
+        for path in root.rglob("*")
+        if path.is_file() and is_image_member(name := path.relative_to(root).as_posix())
+    )
+
+
+class DecodedChunk(NamedTuple):
+    """
+    Result of decoding one chunk of files in a worker process.
+
+    Attributes:
+        batch: Stacked input rows of the decoded files.
+        frames: Name and number of rows of every decoded file, in order.
+        failed: Name and error of every file that could not be decoded.
+    """
+
+    batch: torch.Tensor
+    frames: list[tuple[str, int]]
+    failed: list[tuple[str, str]]
+
+
+def _init_decoder() -> None:
+    """Process pool initializer: one torch thread per decode worker."""
+    configure_torch_threads(1, 1)
+
+
+def decode_files(root: str, names: list[str]) -> DecodedChunk:
+    """
+    Read and preprocess a chunk of files (runs in a decode worker).
+
+    Args:
+        root: Input directory.
+        names: Paths relative to ``root``.
+
+    Returns:
+        The stacked rows; unreadable files are reported instead of raising.
+    """
+    tensors: list[torch.Tensor] = []
+    frames: list[tuple[str, int]] = []
+    failed: list[tuple[str, str]] = []
+    for name in names:
+        try:
+            tensor = image_processor.process_image((Path(root) / name).read_bytes())
+        except Exception as e:
+            failed.append((name, repr(e)))
+            continue
+        tensors.append(tensor)
+        frames.append((name, tensor.shape[0]))
+
+    size = image_processor.img_size
+    empty = torch.empty(0, image_processor.channels, size, size)
+    batch = torch.cat(tensors) if tensors else empty
+    return DecodedChunk(batch, frames, failed)
+
+
+@dataclass
+class Checkpoint:
+    """
+    Progress of a scoring run, saved after every flush.
+
+    Attributes:
+        input: Input directory the run scores.
+        model_version: Version of the weights the run scores with.
+        done: Number of files (in sorted order) whose results are written.
+        last: Name of the last file done, used to detect a changed input.
+        position: Sink-specific resume position (CSV byte offset).
+    """
+
+    input: str
+    model_version: str
+    done: int = 0
+    last: str | None = None
+    position: int | None = None
+
+    @classmethod
+    def load(cls, path: Path, root: Path, model_version: str) -> "Checkpoint":
+        """
+        Read the checkpoint of an earlier run, or start a new one.
+
+        Raises:
+            ValueError: If the checkpoint belongs to another input directory
+                or model version.
+        """
+        checkpoint = cls(str(root.resolve()), model_version)
+        if not path.exists():
+            return checkpoint
+
+        saved = cls(**orjson.loads(path.read_bytes()))
+        if (saved.input, saved.model_version) != (
+            checkpoint.input,
+            checkpoint.model_version,
+        ):
+            raise ValueError(
+                f"{path} was written for {saved.input} with model "
+                f"{saved.model_version}; remove it to start over"
+            )
+        return saved
+
+    def verify(self, names: list[str]) -> None:
+        """
+        Check that the files done so far are still the same.
+
+        Raises:
+            ValueError: If files were added or removed before the resume point.
+        """
+        if self.done and (len(names) < self.done or names[self.done - 1] != self.last):
+            raise ValueError(
+                "Input files changed since the checkpoint; remove it to start over"
+            )
+
+    def save(self, path: Path) -> None:
+        """Write the checkpoint atomically (a crash leaves the old one intact)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(orjson.dumps(asdict(self)))
+        os.replace(tmp, path)
+
+
+class Sink(Protocol):
+    """Destination of the scored rows."""
+
+    def open(self, position: int | None) -> None:
+        """Prepare for writing; ``position`` comes from the checkpoint."""
+
+    def write(self, rows: list[PredictionRow], first: int) -> int | None:
+        """
+        Durably write rows of the files starting at index ``first``.
+
+        Returns:
+            Position to resume from after these rows (stored in the checkpoint).
+        """
+
+    def close(self) -> None:
+        """Release the destination."""
+
+
+class CsvSink:
+    """
+    Append rows to one CSV file.
+
+    The resume position is the byte offset after the last flush: rows written
+    after it by an interrupted run are truncated, so none is duplicated.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: TextIO | None = None
+        self._writer: csv.DictWriter[str] | None = None
+
+    def open(self, position: int | None) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if position is None:
+            self._file = self.path.open("w", newline="", encoding="utf-8")
+        else:
+            self._file = self.path.open("r+", newline="", encoding="utf-8")
+            self._file.seek(position)
+            self._file.truncate()
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS)
+        if position is None:
+            self._writer.writeheader()
+
+    def write(self, rows: list[PredictionRow], first: int) -> int | None:
+        assert self._file is not None and self._writer is not None
+        self._writer.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetSink:
+    """
+    Write every flush as a Parquet part file in one directory.
+
+    Parts are named after the index of their first file, so a part rewritten
+    after a resume replaces the incomplete one. Requires pyarrow.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError(
+                "Parquet output requires pyarrow (install the parquet extra)"
+            ) from e
+
+        self.directory = directory
+        self._pa = pa
+        self._pq = pq
+        self._schema = pa.schema(
+            [
+                ("filename", pa.string()),
+                ("prediction", pa.string()),
+                ("confidence", pa.float64()),
+                ("created_at", pa.timestamp("us")),
+                ("model_version", pa.string()),
+            ]
+        )
+
+    def open(self, position: int | None) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, rows: list[PredictionRow], first: int) -> int | None:
+        table = self._pa.Table.from_pylist(rows, schema=self._schema)
+        path = self.directory / f"part-{first:08d}.parquet"
+        tmp = path.with_name(path.name + ".tmp")
+        self._pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class DatabaseSink:
+    """
+    Bulk-insert rows into the ``predictions`` table.
+
+    Rows go through :class:`PredictionWriter` (COPY with asyncpg, multi-row
+    INSERT otherwise). A crash between a commit and the checkpoint repeats at
+    most one flush on resume.
+    """
+
+    def __init__(self, url: str, batch_size: int = 1000) -> None:
+        self.url = url
+        self.batch_size = batch_size
+        self._runner: asyncio.Runner | None = None
+        self._writer: PredictionWriter | None = None
+
+    def open(self, position: int | None) -> None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.pool import NullPool
+
+        self._engine = create_async_engine(self.url, poolclass=NullPool)
+        self._writer = PredictionWriter(
+            async_sessionmaker(self._engine, expire_on_commit=False),
+            batch_size=self.batch_size,
+            flush_interval_ms=0,
+        )
+        # Синхронный конвейер: один event loop на все вставки
+        self._runner = asyncio.Runner()
+        self._runner.run(self._start())
+
+    async def _start(self) -> None:
+        assert self._writer is not None
+        self._writer.start()
+
+    async def _write(self, rows: list[PredictionRow]) -> None:
+        assert self._writer is not None
+        await self._writer.put_many(rows)
+        await self._writer.flush()
+
+    def write(self, rows: list[PredictionRow], first: int) -> int | None:
+        assert self._runner is not None and self._writer is not None
+        dropped = self._writer.dropped
+        self._runner.run(self._write(rows))
+        if self._writer.dropped > dropped:
+            raise RuntimeError(
+                f"{self._writer.dropped - dropped} rows were not written"
+            )
+        return None
+
+    def close(self) -> None:
+        if self._runner is None or self._writer is None:
+            return
+        self._runner.run(self._writer.stop())
+        self._runner.run(self._engine.dispose())
+        self._runner.close()
+        self._runner = None
+
+
+class Progress:
+    """Progress and throughput line on stderr, refreshed at most every second."""
+
+    def __init__(self, total: int, done: int = 0, stream: TextIO = sys.stderr) -> None:
+        self.total = total
+        self.start_done = done
+        self.stream = stream
+        self.started = time.perf_counter()
+        self._shown = 0.0
+        # В лог-файл пишем строки, в терминал - одну обновляемую
+        self._end = "\r" if stream.isatty() else "\n"
+
+    def update(self, done: int, images: int, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self._shown < 1.0:
+            return
+        self._shown = now
+
+        elapsed = max(now - self.started, 1e-9)
+        rate = (done - self.start_done) / elapsed
+        eta = (self.total - done) / rate if rate else float("inf")
+        self.stream.write(
+            f"{done}/{self.total} files ({done / max(self.total, 1):.1%}) "
+            f"{images / elapsed:.1f} img/s ETA {eta:.0f}s{self._end}"
+        )
+        self.stream.flush()
+
+
+@dataclass
+class ScoringSummary:
+    """
+    Outcome of a scoring run.
+
+    Attributes:
+        files: Files processed in this run (scored or failed).
+        images: Rows scored (multi-frame DICOM counts every frame).
+        failed: Files that could not be decoded.
+        elapsed_seconds: Wall time of the run.
+        decode_wait_seconds: Time inference waited for decoded chunks; a
+            large share means more decode workers would help.
+        inference_seconds: Time spent in forward passes.
+    """
+
+    files: int = 0
+    images: int = 0
+    failed: list[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    decode_wait_seconds: float = 0.0
+    inference_seconds: float = 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class BatchScorer:
+    """
+    Decode-ahead, batched scoring of an image directory.
+
+    Attributes:
+        model: Callable mapping an input batch to logits.
+        model_version: Version stored with every row.
+        batch_size: Files per decode chunk and forward pass.
+        decode_workers: Decode processes.
+        torch_threads: Intra-op threads of the forward pass.
+        queue_size: Most chunks decoded ahead of inference.
+        flush_files: Files between flushes (and checkpoints).
+    """
+
+    def __init__(
+        self,
+        model: Callable[[torch.Tensor], torch.Tensor],
+        model_version: str,
+        batch_size: int = 64,
+        decode_workers: int | None = None,
+        torch_threads: int | None = None,
+        queue_size: int | None = None,
+        flush_files: int = 1024,
+    ) -> None:
+        """
+        Initialize the scorer.
+
+        Args:
+            model: Callable mapping an input batch to logits.
+            model_version: Version stored with every row.
+            batch_size: Files per decode chunk and forward pass.
+            decode_workers: Decode processes (default: a quarter of the
+                cores, at least one).
+            torch_threads: Intra-op threads of the forward pass (default:
+                the cores not used for decoding).
+            queue_size: Most chunks decoded ahead (default: two per decode
+                worker).
+            flush_files: Files between flushes (and checkpoints).
+        """
+        cpus = available_cpus()
+        self.model = model
+        self.model_version = model_version
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers or max(1, cpus // 4)
+        self.torch_threads = torch_threads or max(1, cpus - self.decode_workers)
+        self.queue_size = queue_size or 2 * self.decode_workers
+        self.flush_files = flush_files
+
+    def run(
+        self,
+        root: Path,
+        sink: Sink,
+        checkpoint_path: Path,
+        progress: bool = True,
+    ) -> ScoringSummary:
+        """
+        Score every image under ``root`` not done yet according to the checkpoint.
+
+        Args:
+            root: Input directory.
+            sink: Destination of the rows.
+            checkpoint_path: Where progress is kept between runs.
+            progress: Show progress and throughput on stderr.
+
+        Returns:
+            What this run did.
+
+        Raises:
+            ValueError: If the checkpoint does not match the input or model.
+        """
+        names = list_images(root)
+        checkpoint = Checkpoint.load(checkpoint_path, root, self.model_version)
+        checkpoint.verify(names)
+        pending = names[checkpoint.done :]
+        logger.info(
+            "Scoring %d of %d files under %s (%d decode workers, %d torch threads)",
+            len(pending),
+            len(names),
+            root,
+            self.decode_workers,
+            self.torch_threads,
+        )
+
+        configure_torch_threads(self.torch_threads, 1)
+        display = Progress(len(names), checkpoint.done) if progress else None
+        summary = ScoringSummary()
+        started = time.perf_counter()
+        chunks = (
+            pending[i : i + self.batch_size]
+            for i in range(0, len(pending), self.batch_size)
+        )
+
+        sink.open(checkpoint.position)
+        pool = ProcessPoolExecutor(
+            max_workers=self.decode_workers,
+            mp_context=torch_mp.get_context("spawn"),
+            initializer=_init_decoder,
+        )
+        try:
+            window: deque[Future[DecodedChunk]] = deque()
+            rows: list[PredictionRow] = []
+            first = done = checkpoint.done
+
+            while True:
+                # Держим в работе не больше queue_size чанков: декодирование
+                # идет впереди инференса, но память ограничена
+                for chunk in itertools.islice(chunks, self.queue_size - len(window)):
+                    window.append(pool.submit(decode_files, str(root), chunk))
+                if not window:
+                    break
+
+                wait_start = time.perf_counter()
+                decoded = window.popleft().result()
+                summary.decode_wait_seconds += time.perf_counter() - wait_start
+
+                rows.extend(self._score(decoded, summary))
+                for name, error in decoded.failed:
+                    logger.warning("Skipping %s: %s", name, error)
+                    summary.failed.append(name)
+                done += len(decoded.frames) + len(decoded.failed)
+
+                if done - first >= self.flush_files or done == len(names):
+                    checkpoint.position = sink.write(rows, first)
+                    checkpoint.done, checkpoint.last = done, names[done - 1]
+                    checkpoint.save(checkpoint_path)
+                    rows.clear()
+                    first = done
+
+                if display is not None:
+                    display.update(done, summary.images, force=done == len(names))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            sink.close()
+
+        summary.files = len(pending)
+        summary.elapsed_seconds = time.perf_counter() - started
+        return summary
+
+    def _score(
+        self, decoded: DecodedChunk, summary: ScoringSummary
+    ) -> list[PredictionRow]:
+        """Run one forward pass over a decoded chunk and build its rows."""
+        if not decoded.frames:
+            return []
+
+        start = time.perf_counter()
+        results = iter(forward_batch(self.model, decoded.batch))
+        summary.inference_seconds += time.perf_counter() - start
+        summary.images += decoded.batch.shape[0]
+
+        created_at = datetime.now()
+        rows: list[PredictionRow] = []
+        for name, count in decoded.frames:
+            file_results: list[InferenceResult] = list(itertools.islice(results, count))
+            for index, result in enumerate(file_results, start=1):
+                rows.append(
+                    PredictionRow(
+                        # Кадры multi-frame DICOM - как в /predict/batch
+                        filename=name if count == 1 else f"{name}#{index}",
+                        prediction=CLASS_NAMES[result.class_index],
+                        confidence=result.confidence,
+                        created_at=created_at,
+                        model_version=self.model_version,
+                    )
+                )
+        return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", type=Path, help="directory searched for images")
+    parser.add_argument(
+        "--format", choices=("csv", "parquet", "db"), default="csv", dest="fmt"
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="CSV file or Parquet directory (default: scores.csv / scores/)",
+    )
+    parser.add_argument(
+        "--db-url",
+        default=str(settings.db.url),
+        help="async SQLAlchemy URL for --format db (default: DbConfig.url)",
+    )
+    parser.add_argument(
+        "--weights",
+        type=Path,
+        default=settings.PROJECT_ROOT / settings.ml_config.model_path,
+        help="weights to score with (default: MLConfig.model_path)",
+    )
+    parser.add_argument("--checkpoint", type=Path, help="progress file for resuming")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--decode-workers", type=int)
+    parser.add_argument("--torch-threads", type=int)
+    parser.add_argument("--queue-size", type=int)
+    parser.add_argument("--flush-files", type=int, default=1024)
+    parser.add_argument("--no-progress", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+
+    sink: Sink
+    if args.fmt == "db":
+        sink = DatabaseSink(args.db_url)
+        checkpoint = args.checkpoint or Path(
+            f"{args.input.resolve().name}.scoring.json"
+        )
+    elif args.fmt == "parquet":
+        output = args.output or Path("scores")
+        sink = ParquetSink(output)
+        checkpoint = args.checkpoint or output / "checkpoint.json"
+    else:
+        output = args.output or Path("scores.csv")
+        sink = CsvSink(output)
+        checkpoint = args.checkpoint or output.with_name(output.name + ".checkpoint")
+
+    loader = ModelLoader()
+    loader.device = torch.device("cpu")
+    model = loader.load_model(args.weights)
+    scorer = BatchScorer(
+        model,
+        loader.version,
+        batch_size=args.batch_size,
+        decode_workers=args.decode_workers,
+        torch_threads=args.torch_threads,
+        queue_size=args.queue_size,
+        flush_files=args.flush_files,
+    )
+    summary = scorer.run(args.input, sink, checkpoint, progress=not args.no_progress)
+
+    logger.info(
+        "Scored %d images from %d files in %.1fs (%.1f img/s, %d failed); "
+        "waited %.1fs for decoding, %.1fs in inference",
+        summary.images,
+        summary.files,
+        summary.elapsed_seconds,
+        summary.images_per_second,
+        len(summary.failed),
+        summary.decode_wait_seconds,
+        summary.inference_seconds,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""
+Resident model versions, hot reload and shadow traffic.
+
+Every resident version has its own batcher (a batch never mixes versions)
+and shares the execution pool. Loading a version builds and warms it up in
+the background; activating it swaps the registry's active name, a single
+assignment. Requests hold a lease on the version they picked, so they and
+the batches already queued finish on the old version before its batcher
+is stopped.
+
+A second version can be marked as shadow: it scores the same inputs in the
+background and only its agreement with the active version is recorded.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import torch
+
+from app.core.config import settings
+from app.core.metrics import MODEL_INFO, SHADOW_PREDICTIONS
+from app.core.ml.batcher import InferenceBatcher, InferenceResult
+from app.core.ml.executor import InferenceExecutor
+from app.core.ml.model_loader import ModelLoader, StaleExportError
+from app.core.warmup import warm_up_model
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ServedModel:
+    """
+    One resident model version.
+
+    Attributes:
+        name: Name requests select the version by.
+        version: Content hash of the weights (stored with every prediction).
+        runtime: Runtime variant the weights are served with.
+        model: Callable mapping an input batch to logits.
+        batcher: Batcher that serves this version only.
+        loaded_at: Unix time the version became resident.
+        leases: Requests currently using this version.
+    """
+
+    name: str
+    version: str
+    runtime: str
+    model: Callable[[torch.Tensor], torch.Tensor]
+    batcher: InferenceBatcher
+    loaded_at: float = field(default_factory=time.time)
+    leases: int = 0
+
+
+class ModelRegistry:
+    """
+    Named model versions resident in this process.
+
+    Attributes:
+        executor: Pool shared by the batchers of all versions.
+        max_batch_size: Batch size limit of every batcher.
+        max_wait_ms: Batching window of every batcher.
+        max_resident: Most versions kept in memory at once.
+        warmup_batch_sizes: Batch sizes a new version is warmed up with.
+        active: Name of the version that serves requests by default.
+        shadow: Name of the version that scores requests in the background.
+    """
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_resident: int = 3,
+        warmup_batch_sizes: list[int] | None = None,
+    ) -> None:
+        """
+        Initialize an empty registry.
+
+        Args:
+            executor: Pool shared by the batchers of all versions.
+            max_batch_size: Batch size limit of every batcher.
+            max_wait_ms: Batching window of every batcher.
+            max_resident: Most versions kept in memory at once.
+            warmup_batch_sizes: Batch sizes a new version is warmed up with
+                (no warm-up when empty).
+        """
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_resident = max_resident
+        self.warmup_batch_sizes = warmup_batch_sizes or []
+        self.active: str | None = None
+        self.shadow: str | None = None
+        self._models: dict[str, ServedModel] = {}
+        self._loading: dict[str, asyncio.Task[ServedModel]] = {}
+        self._background: set[asyncio.Task[None]] = set()
+
+    @property
+    def models(self) -> list[ServedModel]:
+        """Resident versions, oldest first."""
+        return list(self._models.values())
+
+    @property
+    def loading(self) -> list[str]:
+        """Names of versions currently being loaded."""
+        return [name for name, task in self._loading.items() if not task.done()]
+
+    @property
+    def queue_depth(self) -> int:
+        """Submissions waiting in the batchers of all versions."""
+        return sum(m.batcher.queue_depth for m in self._models.values())
+
+    def get(self, name: str | None = None) -> ServedModel:
+        """
+        Resolve a version by name.
+
+        Args:
+            name: Version name (default: the active version).
+
+        Raises:
+            KeyError: If no such version is resident.
+        """
+        name = name or self.active
+        if name is None or name not in self._models:
+            raise KeyError(f"Model {name!r} is not loaded")
+        return self._models[name]
+
+    @contextmanager
+    def lease(self, name: str | None = None) -> Iterator[ServedModel]:
+        """
+        Use a version for the duration of a request.
+
+        A retired version keeps serving until its last lease is released.
+
+        Args:
+            name: Version name (default: the active version).
+
+        Raises:
+            KeyError: If no such version is resident.
+        """
+        served = self.get(name)
+        served.leases += 1
+        try:
+            yield served
+        finally:
+            served.leases -= 1
+
+    def add(
+        self,
+        name: str,
+        model: Callable[[torch.Tensor], torch.Tensor],
+        version: str,
+        runtime: str,
+        activate: bool = False,
+    ) -> ServedModel:
+        """
+        Make an already loaded model resident and start its batcher.
+
+        A version with the same name is replaced and retired in the
+        background once its queued batches are served.
+
+        Args:
+            name: Name requests select the version by.
+            model: Callable mapping an input batch to logits.
+            version: Content hash of the weights.
+            runtime: Runtime variant of the model.
+            activate: Serve it by default from now on. The first version
+                added, and a new version of the active name, are always
+                activated.
+
+        Returns:
+            The resident version.
+        """
+        batcher = InferenceBatcher(
+            model,
+            max_batch_size=self.max_batch_size,
+            max_wait_ms=self.max_wait_ms,
+            executor=self.executor,
+        )
+        batcher.start()
+        served = ServedModel(name, version, runtime, model, batcher)
+
+        replaced = self._models.pop(name, None)
+        self._models[name] = served
+        # Перезагрузка активной версии под тем же именем тоже ее активирует
+        if activate or self.active in (None, name):
+            self.activate(name)
+        if replaced is not None:
+            self._retire(replaced)
+        self._evict()
+
+        logger.info("Model %s is resident as %r", version, name)
+        return served
+
+    async def load(
+        self, name: str, weights_path: Path, activate: bool = False
+    ) -> ServedModel:
+        """
+        Load, warm up and add a version without blocking the event loop.
+
+        Args:
+            name: Name requests select the version by.
+            weights_path: .pth (or .onnx) file to serve.
+            activate: Serve it by default once it is warm.
+
+        Returns:
+            The resident version.
+
+        Raises:
+            FileNotFoundError: If the weights file does not exist.
+            StaleExportError: With the ONNX backend, if the export of the
+                weights predates them.
+            RuntimeError: With a process pool, whose workers keep the model
+                they were started with.
+        """
+        if self.executor.kind == "process":
+            raise RuntimeError("Hot reload requires the thread executor")
+        if not weights_path.is_file():
+            raise FileNotFoundError(f"No weights at {weights_path}")
+        ModelLoader.check_onnx_export(weights_path)
+
+        loader = ModelLoader()
+        model = await asyncio.to_thread(loader.load_model, weights_path)
+        if self.warmup_batch_sizes:
+            await warm_up_model(self.executor, model, self.warmup_batch_sizes)
+        return self.add(name, model, loader.version, loader.runtime, activate)
+
+    def start_load(
+        self, name: str, weights_path: Path, activate: bool = False
+    ) -> asyncio.Task[ServedModel]:
+        """
+        Schedule :meth:`load` in the background.
+
+        Returns:
+            The loading task; a load of the same name already in progress
+            is returned instead of starting another one.
+        """
+        task = self._loading.get(name)
+        if task is not None and not task.done():
+            return task
+
+        task = asyncio.create_task(
+            self.load(name, weights_path, activate), name=f"load-model-{name}"
+        )
+        task.add_done_callback(self._log_load_failure)
+        self._loading[name] = task
+        return task
+
+    async def watch(self, name: str, weights_path: Path, interval: float) -> None:
+        """
+        Reload ``name`` whenever ``weights_path`` changes on disk.
+
+        Polls the modification time, so it also works on volumes without
+        inotify. A change is picked up once the time has stayed the same for
+        one poll, so a file still being written is not loaded. With the ONNX
+        backend the export next to the weights is watched too: new weights
+        are not served until it is re-exported. Runs until cancelled; failed
+        reloads are logged and retried on the next change.
+
+        Args:
+            name: Version to replace.
+            weights_path: Weights file to watch.
+            interval: Seconds between polls.
+        """
+
+        export_path = weights_path.with_suffix(".onnx")
+        watch_export = (
+            settings.ml_config.backend == "onnx" and weights_path != export_path
+        )
+
+        def mtime() -> float | None:
+            try:
+                current = weights_path.stat().st_mtime
+                if watch_export and export_path.exists():
+                    # Перевыгрузка ONNX тоже считается изменением весов
+                    current = max(current, export_path.stat().st_mtime)
+                return current
+            except FileNotFoundError:
+                return None
+
+        seen = mtime()
+        pending = None
+        while True:
+            await asyncio.sleep(interval)
+            current = mtime()
+            if current is None or current == seen:
+                continue
+            if current != pending:
+                # Файл мог еще дописываться - ждем, пока mtime перестанет меняться
+                pending = current
+                continue
+            seen = current
+            logger.info("Weights %s changed, reloading %r", weights_path, name)
+            try:
+                await self.load(name, weights_path)
+            except StaleExportError as e:
+                logger.error("Not reloading %r, serving the old version: %s", name, e)
+            except Exception as e:
+                logger.error("Reload of %r failed: %r", name, e)
+
+    def activate(self, name: str) -> None:
+        """
+        Serve ``name`` by default from now on.
+
+        Raises:
+            KeyError: If no such version is resident.
+        """
+        served = self.get(name)
+        # Одно присваивание: новые запросы сразу идут в новую версию,
+        # уже начатые дорабатывают на старой
+        self.active = name
+        if self.shadow == name:
+            self.shadow = None
+        MODEL_INFO.info(
+            {"name": name, "version": served.version, "runtime": served.runtime}
+        )
+        logger.info("Active model is now %r (%s)", name, served.version)
+
+    def set_shadow(self, name: str | None) -> None:
+        """
+        Score every request also with ``name`` in the background.
+
+        Args:
+            name: Resident version, or None to stop shadow traffic.
+
+        Raises:
+            KeyError: If no such version is resident.
+            ValueError: If it is the active version.
+        """
+        if name is not None:
+            self.get(name)
+            if name == self.active:
+                raise ValueError("The active model cannot be its own shadow")
+        self.shadow = name
+
+    def unload(self, name: str) -> None:
+        """
+        Drop a version that is neither active nor shadow.
+
+        Raises:
+            KeyError: If no such version is resident.
+            ValueError: If it is active or shadow.
+        """
+        served = self.get(name)
+        if name in (self.active, self.shadow):
+            raise ValueError(f"Model {name!r} is active or shadow")
+        del self._models[name]
+        self._retire(served)
+
+    def score_shadow(self, rows: torch.Tensor, primary: list[InferenceResult]) -> None:
+        """
+        Score ``rows`` with the shadow version in the background.
+
+        Only the agreement of the predicted classes is recorded.
+
+        Args:
+            rows: Stacked inputs the active version has scored.
+            primary: Results of the active version for these rows.
+        """
+        if self.shadow is None or self.shadow not in self._models:
+            return
+        shadow = self._models[self.shadow]
+        shadow.leases += 1
+
+        async def compare() -> None:
+            try:
+                results = await shadow.batcher.submit(rows)
+            finally:
+                shadow.leases -= 1
+            for mine, theirs in zip(primary, results, strict=True):
+                agree = mine.class_index == theirs.class_index
+                SHADOW_PREDICTIONS.labels(
+                    shadow.version, "agree" if agree else "disagree"
+                ).inc()
+
+        self._spawn(compare())
+
+    async def close(self) -> None:
+        """Cancel pending loads and stop the batchers of all versions."""
+        for task in self._loading.values():
+            task.cancel()
+        await asyncio.gather(*self._loading.values(), return_exceptions=True)
+        await asyncio.gather(*self._background, return_exceptions=True)
+        for served in self._models.values():
+            await served.batcher.stop()
+        self._models.clear()
+
+    def _retire(self, served: ServedModel) -> None:
+        """Stop a version's batcher once its leases and queue are done."""
+
+        async def stop_when_idle() -> None:
+            while served.leases:  # noqa: ASYNC110
+                await asyncio.sleep(0.01)
+            await served.batcher.stop(drain=True)
+            logger.info("Model %s (%r) retired", served.version, served.name)
+
+        self._spawn(stop_when_idle())
+
+    def _evict(self) -> None:
+        """Drop the oldest spare versions beyond ``max_resident``."""
+        spare = [n for n in self._models if n not in (self.active, self.shadow)]
+        while len(self._models) > self.max_resident and spare:
+            self._retire(self._models.pop(spare.pop(0)))
+
+    def _spawn(self, coroutine: Coroutine[object, object, None]) -> None:
+        """Run a coroutine in the background and keep a reference to it."""
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @staticmethod
+    def _log_load_failure(task: asyncio.Task[ServedModel]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Model load %s failed: %r", task.get_name(), task.exception())
@@ -0,0 +1,231 @@
+"""
+Optimized runtime variants of the float32 eager model.
+
+The service runs on CPU-only nodes, so the variants target CPU latency and
+memory: INT8 quantization (dynamic or static), frozen TorchScript,
+``torch.compile`` and the channels_last memory format. Every variant is
+compared with the float model on the same inputs before it is served.
+
+Independently of the runtime, the first convolution can be folded for
+grayscale input (:func:`fold_grayscale`), so X-rays are fed as one channel
+of raw pixels.
+"""
+
+import copy
+import logging
+import warnings
+
+import torch
+import torch.nn as nn
+
+from app.core.config import Runtime
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelsLast(nn.Module):
+    """Wrapper that feeds NHWC-strided input to a channels_last model."""
+
+    def __init__(self, model: nn.Module) -> None:
+        super().__init__()
+        self.model = model.to(memory_format=torch.channels_last)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+class GrayscaleConv(nn.Module):
+    """
+    First convolution of an RGB model folded for raw single-channel input.
+
+    For a gray image every channel holds the same pixel ``g``, normalized as
+    ``g * scale[c] + shift[c]``. The convolution is linear, so summing the
+    kernels weighted by ``scale`` gives one single-channel kernel, and the
+    ``shift`` part becomes a constant bias map. The map is computed with
+    the original zero padding, so it is exact at the borders too (there the
+    padding was zero after normalization, not a normalized black pixel).
+    """
+
+    def __init__(
+        self,
+        conv: nn.Conv2d,
+        mean: tuple[float, ...],
+        std: tuple[float, ...],
+        input_size: int,
+    ) -> None:
+        """
+        Fold ``conv`` for [N, 1, input_size, input_size] inputs in 0..255.
+
+        Args:
+            conv: The RGB convolution (3 input channels, groups=1).
+            mean: Per-channel normalization mean (of 0..1 values).
+            std: Per-channel normalization standard deviation.
+            input_size: Side length of the inputs the bias map is built for.
+        """
+        super().__init__()
+        std_t = torch.tensor(std).view(1, 3, 1, 1)
+        mean_t = torch.tensor(mean).view(1, 3, 1, 1)
+        weight = conv.weight.detach()
+
+        self.conv = nn.Conv2d(
+            1,
+            conv.out_channels,
+            conv.kernel_size,
+            conv.stride,
+            conv.padding,
+            conv.dilation,
+            bias=False,
+        )
+        with torch.no_grad():
+            self.conv.weight.copy_((weight / (255 * std_t)).sum(1, keepdim=True))
+            # Вклад сдвига нормализации: свертка постоянного изображения
+            shift = (-mean_t / std_t).expand(1, 3, input_size, input_size)
+            bias = nn.functional.conv2d(
+                shift, weight, conv.bias, conv.stride, conv.padding, conv.dilation
+            )
+        self.register_buffer("bias_map", bias)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.conv(x) + self.bias_map
+
+
+def fold_grayscale(
+    model: nn.Module,
+    mean: tuple[float, ...],
+    std: tuple[float, ...],
+    input_size: int,
+) -> nn.Module:
+    """
+    Make an RGB ResNet take one channel of raw 0..255 pixels.
+
+    ``conv1`` is replaced by :class:`GrayscaleConv`; on gray images the
+    result matches the RGB model fed the normalized three-channel tensor,
+    with a third of the first layer's multiply-adds.
+
+    Args:
+        model: The float32 model with an RGB ``conv1``, modified in place
+            (a copy would not keep memory-mapped weights shared).
+        mean: Per-channel normalization mean the model was trained with.
+        std: Per-channel normalization standard deviation.
+        input_size: Side length of the model inputs.
+
+    Returns:
+        The same model with the folded first convolution.
+    """
+    model.conv1 = GrayscaleConv(model.conv1, mean, std, input_size)
+    return model
+
+
+def _quantize_dynamic(model: nn.Module) -> nn.Module:
+    """INT8 weights with activations quantized on the fly (Linear layers only)."""
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+
+
+def _quantize_static(model: nn.Module, calibration: torch.Tensor) -> nn.Module:
+    """INT8 weights and activations (FX graph mode, x86 backend)."""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    example_inputs = (calibration[:1],)
+    prepared = prepare_fx(
+        copy.deepcopy(model), get_default_qconfig_mapping("x86"), example_inputs
+    )
+    # Калибровка: собираем диапазоны активаций на примерах
+    with torch.inference_mode():
+        for sample in calibration.split(1):
+            prepared(sample)
+    return convert_fx(prepared)
+
+
+def _torchscript(model: nn.Module) -> nn.Module:
+    """Scripted, frozen and inference-optimized graph."""
+    scripted = torch.jit.script(copy.deepcopy(model).eval())
+    frozen = torch.jit.freeze(scripted)
+    return torch.jit.optimize_for_inference(frozen)
+
+
+def uses_channels_last(runtime: Runtime, channels_last: bool) -> bool:
+    """Whether :func:`build_variant` applies channels_last to ``runtime``."""
+    # Квантованные ядра работают в NCHW, формат для них не меняем
+    return channels_last and runtime not in ("dynamic_int8", "static_int8")
+
+
+def build_variant(
+    model: nn.Module,
+    runtime: Runtime,
+    channels_last: bool,
+    calibration: torch.Tensor,
+) -> nn.Module:
+    """
+    Build the requested runtime variant of a float32 eval-mode model.
+
+    Args:
+        model: The float32 model in eval mode. It is not modified.
+        runtime: Which optimization to apply.
+        channels_last: Convert weights and inputs to NHWC memory format
+            (ignored by the INT8 runtimes).
+        calibration: Representative inputs, used by static quantization.
+
+    Returns:
+        A callable module with the same input/output contract as ``model``.
+    """
+    variant = model
+    if uses_channels_last(runtime, channels_last):
+        variant = ChannelsLast(copy.deepcopy(model))
+
+    with warnings.catch_warnings():
+        # torch.ao.quantization помечен устаревшим, но работает на CPU-сборке
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", UserWarning)
+
+        if runtime == "dynamic_int8":
+            return _quantize_dynamic(variant)
+        if runtime == "static_int8":
+            return _quantize_static(variant, calibration)
+
+    if runtime == "torchscript":
+        return _torchscript(variant)
+    if runtime == "compile":
+        return torch.compile(variant)
+    return variant
+
+
+def parity_error(
+    reference: nn.Module, candidate: nn.Module, inputs: torch.Tensor
+) -> float:
+    """
+    Largest absolute difference between the softmax outputs of two models.
+
+    Args:
+        reference: The float32 eager model.
+        candidate: The optimized variant.
+        inputs: Batch to run through both models.
+
+    Returns:
+        max |softmax(reference) - softmax(candidate)| over all samples/classes.
+    """
+    with torch.inference_mode():
+        expected = torch.softmax(reference(inputs), dim=1)
+        actual = torch.softmax(candidate(inputs), dim=1)
+    return float((expected - actual).abs().max())
+
+
+def is_shareable(model: object) -> bool:
+    """
+    Tell whether a model's weights can be shared with spawned worker processes.
+
+    TorchScript modules, ``torch.compile`` wrappers and non-torch backends
+    (ONNX Runtime sessions) cannot be pickled, and quantized modules keep
+    their weights in packed objects outside of shared memory; workers must
+    build those themselves.
+    """
+    if not isinstance(model, nn.Module):
+        return False
+    if isinstance(model, torch.jit.ScriptModule) or hasattr(model, "_orig_mod"):
+        return False
+    return not any(
+        type(module).__module__.startswith("torch.ao.nn.quantized")
+        for module in model.modules()
+    )
@@ -1,7 +1,9 @@
 from app.core.models.base import Base
 from app.core.models.prediction import Prediction
+from app.core.models.prediction_stat import PredictionStat
 
 __all__ = (
     "Base",
     "Prediction",
+    "PredictionStat",
 )
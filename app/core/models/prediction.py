@@ -1,15 +1,29 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, Float, String
+from sqlalchemy import DateTime, Float, Index, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.models.base import Base
 
 
 class Prediction(Base):
+    # В PostgreSQL таблица секционирована по месяцам created_at (ключ секций
+    # входит в первичный ключ: (id, created_at)); секциями управляет
+    # app/core/partitions.py, для ORM это та же таблица
+    __table_args__ = (
+        # Keyset-пагинация /history: ORDER BY created_at DESC, id DESC
+        Index("ix_predictions_created_at_id", "created_at", "id"),
+        # Фильтр по метке + та же сортировка
+        Index(
+            "ix_predictions_prediction_created_at_id", "prediction", "created_at", "id"
+        ),
+    )
+
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     prediction: Mapped[str] = mapped_column(String(50), nullable=False)
     confidence: Mapped[float] = mapped_column(Float, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.now, server_default=None
     )
+    # Версия весов (ModelLoader.weights_version), NULL у записей до ее появления
+    model_version: Mapped[str | None] = mapped_column(String(64), nullable=True)
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.models.base import Base
+
+
+class PredictionStat(Base):
+    __table_args__ = (
+        # Ключ upsert: одна строка на (час, метка)
+        UniqueConstraint("bucket", "prediction"),
+    )
+
+    # Начало часа, в который попали записи (created_at без минут и секунд)
+    bucket: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    prediction: Mapped[str] = mapped_column(String(50), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    confidence_sum: Mapped[float] = mapped_column(Float, nullable=False)
+    confidence_min: Mapped[float] = mapped_column(Float, nullable=False)
+    confidence_max: Mapped[float] = mapped_column(Float, nullable=False)
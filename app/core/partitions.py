@@ -0,0 +1,444 @@
+"""
+Maintenance of the monthly partitions of the ``predictions`` table.
+
+Meant to run periodically (e.g. daily from cron or a Kubernetes CronJob):
+
+    python -m app.core.partitions [--dry-run]
+
+Partitions for the next ``RetentionConfig.premake_months`` months are created
+ahead of time; rows outside them land in the DEFAULT partition
+``predictions_default`` and are moved into their month's partition when it is
+created. When ``RetentionConfig.months`` is set, partitions that are entirely
+older are detached, archived to ``<archive_dir>/<partition>.csv.gz`` with COPY
+and dropped. Every statement runs in autocommit mode under a lock timeout, so
+no step holds a lock on the parent table for long; an interrupted run is
+finished by the next one. PostgreSQL refuses ``DETACH ... CONCURRENTLY`` while
+a DEFAULT partition exists, so expired partitions are then detached with a
+plain (brief, catalog-only) ``DETACH``.
+"""
+
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core import db_helper, settings
+from app.core.config import RetentionConfig
+from app.core.models import Prediction
+
+logger = logging.getLogger(__name__)
+
+PARENT = Prediction.__tablename__
+# Секции: predictions_legacy (таблица до секционирования), predictions_default
+# и predictions_yYYYYmMM
+NAME_PATTERN = re.compile(rf"^{PARENT}_(?:legacy|default|y(\d{{4}})m(\d{{2}}))$")
+DEFAULT_PARTITION = f"{PARENT}_default"
+BOUND_PATTERN = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def month_start(timestamp: datetime) -> datetime:
+    """First moment of the month a timestamp falls into."""
+    return datetime(timestamp.year, timestamp.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """First day of the month ``months`` after (or before) ``month``."""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Name of the partition holding the rows of ``month``."""
+    return f"{PARENT}_y{month:%Ym%m}"
+
+
+def parse_bounds(expression: str) -> tuple[datetime | None, datetime | None]:
+    """
+    Parse the range of a partition from ``pg_get_expr(relpartbound)``.
+
+    Args:
+        expression: E.g. ``FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')``.
+
+    Returns:
+        The inclusive lower and exclusive upper bound; None for MINVALUE or
+        MAXVALUE, and both None for the DEFAULT partition.
+    """
+    if expression == "DEFAULT":
+        return None, None
+    match = BOUND_PATTERN.search(expression)
+    if match is None:
+        raise ValueError(f"Not a range partition bound: {expression}")
+
+    def bound(value: str) -> datetime | None:
+        if value in ("MINVALUE", "MAXVALUE"):
+            return None
+        return datetime.fromisoformat(value.strip("'"))
+
+    lower, upper = match.groups()
+    return bound(lower), bound(upper)
+
+
+@dataclass(frozen=True)
+class Partition:
+    """
+    A table holding ``predictions`` rows.
+
+    Attributes:
+        name: Table name.
+        lower: Inclusive lower bound (None for MINVALUE or when detached).
+        upper: Exclusive upper bound (None for MAXVALUE or when detached).
+        attached: Whether it is a partition of ``predictions``; a detached
+            one is left over from an interrupted run.
+        detach_pending: Whether a concurrent detach was interrupted.
+    """
+
+    name: str
+    lower: datetime | None = None
+    upper: datetime | None = None
+    attached: bool = True
+    detach_pending: bool = False
+
+    @property
+    def default(self) -> bool:
+        """Whether this is the DEFAULT partition."""
+        return self.name == DEFAULT_PARTITION
+
+    @property
+    def month(self) -> datetime | None:
+        """The month of a monthly partition, None for the other tables."""
+        match = NAME_PATTERN.match(self.name)
+        if match is None or match.group(1) is None:
+            return None
+        return datetime(int(match.group(1)), int(match.group(2)), 1)
+
+    def covers(self, month: datetime) -> bool:
+        """Whether the rows of ``month`` are routed to this partition."""
+        return (
+            self.attached
+            and not self.default
+            and not self.detach_pending
+            and (self.lower is None or self.lower <= month)
+            and (self.upper is None or month < self.upper)
+        )
+
+
+@dataclass
+class MaintenancePlan:
+    """
+    What one maintenance run does.
+
+    Attributes:
+        create: Months whose partitions are created (or attached, when left
+            over from an interrupted run).
+        archive: Partitions detached, archived and dropped.
+    """
+
+    create: list[datetime] = field(default_factory=list)
+    archive: list[Partition] = field(default_factory=list)
+
+
+def plan_maintenance(
+    partitions: Iterable[Partition],
+    now: datetime,
+    months: int | None,
+    premake_months: int,
+) -> MaintenancePlan:
+    """
+    Decide which partitions to create and which to archive.
+
+    Args:
+        partitions: Current partitions and detached leftovers.
+        now: Current time.
+        months: Full months of history to keep (None: keep everything).
+        premake_months: Months to prepare ahead of the current one.
+
+    Returns:
+        MaintenancePlan: Partitions to create and partitions to archive.
+    """
+    partitions = list(partitions)
+    current = month_start(now)
+    plan = MaintenancePlan()
+    for offset in range(premake_months + 1):
+        month = add_months(current, offset)
+        if not any(p.covers(month) for p in partitions):
+            plan.create.append(month)
+
+    cutoff = None if months is None else add_months(current, -months)
+    for partition in partitions:
+        if partition.default:
+            # Секция по умолчанию не архивируется: ее строки уходят в секции
+            # месяцев при их создании
+            continue
+        if partition.detach_pending:
+            # Отсоединение уже началось - доводим его до конца
+            plan.archive.append(partition)
+        elif partition.attached:
+            if (
+                cutoff is not None
+                and partition.upper is not None
+                and partition.upper <= cutoff
+            ):
+                plan.archive.append(partition)
+        elif partition.month is None:
+            # Старую таблицу отсоединяем только при истечении срока
+            plan.archive.append(partition)
+        elif cutoff is not None and add_months(partition.month, 1) <= cutoff:
+            plan.archive.append(partition)
+    return plan
+
+
+async def fetch_partitions(connection: AsyncConnection) -> list[Partition]:
+    """
+    Read the partitions of ``predictions`` and detached leftovers.
+
+    Raises:
+        RuntimeError: If ``predictions`` is not partitioned (the migration
+            has not been applied).
+    """
+    partitioned = await connection.scalar(
+        text(
+            "SELECT count(*) FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass(:parent)"
+        ),
+        {"parent": PARENT},
+    )
+    if not partitioned:
+        raise RuntimeError(f"Table {PARENT} is not partitioned; run the migrations")
+
+    result = await connection.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), "
+            "i.inhdetachpending "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:parent)"
+        ),
+        {"parent": PARENT},
+    )
+    partitions = [
+        Partition(name, *parse_bounds(bound), detach_pending=pending)
+        for name, bound, pending in result
+    ]
+
+    result = await connection.execute(
+        text(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind = 'r' AND NOT relispartition "
+            "AND relnamespace = to_regnamespace(current_schema()) "
+            "AND starts_with(relname, :prefix)"
+        ),
+        {"prefix": f"{PARENT}_"},
+    )
+    partitions.extend(
+        Partition(name, attached=False)
+        for (name,) in result
+        if NAME_PATTERN.match(name)
+    )
+    return partitions
+
+
+async def create_partition(
+    connection: AsyncConnection, month: datetime, default: bool = False
+) -> None:
+    """
+    Create the partition of ``month`` (idempotent).
+
+    The empty table is created on its own and then attached: ATTACH only
+    takes SHARE UPDATE EXCLUSIVE on the parent, whereas CREATE TABLE ...
+    PARTITION OF would block all reads and writes while waiting for its lock.
+
+    Args:
+        connection: Connection in autocommit mode.
+        month: First day of the month.
+        default: Whether ``predictions`` has a DEFAULT partition. ATTACH
+            fails while it holds rows of ``month``, so they are moved into
+            the new partition in the same transaction, with inserts into the
+            DEFAULT partition blocked until it commits.
+    """
+    name = partition_name(month)
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    await connection.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {PARENT} INCLUDING DEFAULTS)")
+    )
+    attach = (
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    )
+    if default:
+        # Один оператор - одна транзакция в режиме autocommit
+        attach = f"""
+            DO $$
+            BEGIN
+                LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE;
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE created_at >= '{lower}' AND created_at < '{upper}'
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved;
+                {attach};
+            END $$
+            """
+    await connection.execute(text(attach))
+    logger.info("Created partition %s", name)
+
+
+async def detach_partition(
+    connection: AsyncConnection, partition: Partition, concurrently: bool
+) -> None:
+    """Detach a partition, finishing an interrupted concurrent detach."""
+    if partition.detach_pending:
+        mode = " FINALIZE"
+    elif partition.attached:
+        mode = " CONCURRENTLY" if concurrently else ""
+    else:
+        return
+    await connection.execute(
+        text(f"ALTER TABLE {PARENT} DETACH PARTITION {partition.name}{mode}")
+    )
+
+
+async def archive_table(
+    connection: AsyncConnection, name: str, directory: Path, compress_level: int
+) -> tuple[Path, int]:
+    """
+    Copy a detached partition into a gzip-compressed CSV file.
+
+    The file is written under a temporary name, synced and renamed, and only
+    if COPY reported as many rows as the table holds.
+
+    Returns:
+        The archive path and the number of archived rows.
+
+    Raises:
+        RuntimeError: If the row counts differ.
+    """
+    raw = await connection.get_raw_connection()
+    driver = raw.driver_connection
+    expected = await driver.fetchval(f"SELECT count(*) FROM {name}")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.csv.gz"
+    partial = path.with_name(f"{path.name}.tmp")
+    with (
+        partial.open("wb") as file,
+        gzip.GzipFile(f"{name}.csv", "wb", compress_level, file) as archive,
+    ):
+
+        async def write(chunk: bytes) -> None:
+            archive.write(chunk)
+
+        status = await driver.copy_from_table(
+            name, output=write, format="csv", header=True
+        )
+        archive.close()
+        file.flush()
+        os.fsync(file.fileno())
+
+    copied = int(status.split()[-1])
+    if copied != expected:
+        partial.unlink()
+        raise RuntimeError(f"Archived {copied} of {expected} rows of {name}")
+    os.replace(partial, path)
+    return path, copied
+
+
+async def maintain(
+    engine: AsyncEngine,
+    config: RetentionConfig,
+    now: datetime | None = None,
+    dry_run: bool = False,
+) -> MaintenancePlan:
+    """
+    Create upcoming partitions and archive expired ones.
+
+    Args:
+        engine: Engine of the application database (PostgreSQL, asyncpg).
+        config: Retention policy.
+        now: Current time (default: ``datetime.now()``, like ``created_at``).
+        dry_run: Only log what would be done.
+
+    Returns:
+        MaintenancePlan: What was (or would be) done.
+    """
+    if engine.dialect.driver != "asyncpg":
+        raise RuntimeError("Partition maintenance requires PostgreSQL with asyncpg")
+
+    archive_dir = Path(config.archive_dir)
+    if not archive_dir.is_absolute():
+        archive_dir = settings.PROJECT_ROOT / archive_dir
+
+    async with engine.connect() as connection:
+        # Каждый DDL - своя короткая транзакция; DETACH CONCURRENTLY иначе
+        # и не выполнить
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text(f"SET lock_timeout = {config.lock_timeout_ms}"))
+
+        partitions = await fetch_partitions(connection)
+        plan = plan_maintenance(
+            partitions, now or datetime.now(), config.months, config.premake_months
+        )
+        logger.info(
+            "Partitions to create: %s; to archive: %s",
+            [partition_name(month) for month in plan.create] or "none",
+            [partition.name for partition in plan.archive] or "none",
+        )
+        for partition in partitions:
+            if (
+                not partition.attached
+                and partition not in plan.archive
+                and partition.month not in plan.create
+            ):
+                logger.warning("Leaving detached table %s in place", partition.name)
+        if dry_run:
+            return plan
+
+        default = any(p.default and p.attached for p in partitions)
+        # Сначала будущие секции: вставки не должны упираться в их отсутствие
+        for month in plan.create:
+            await create_partition(connection, month, default)
+
+        # При наличии секции по умолчанию PostgreSQL не умеет DETACH CONCURRENTLY
+        concurrently = config.detach_concurrently and not default
+        for partition in plan.archive:
+            await detach_partition(connection, partition, concurrently)
+            path, rows = await archive_table(
+                connection, partition.name, archive_dir, config.compress_level
+            )
+            await connection.execute(text(f"DROP TABLE {partition.name}"))
+            logger.info("Archived %d rows of %s to %s", rows, partition.name, path)
+
+    return plan
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only log the planned changes"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+
+    async def run() -> None:
+        try:
+            await maintain(db_helper.engine, settings.retention, dry_run=args.dry_run)
+        finally:
+            await db_helper.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
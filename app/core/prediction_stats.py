@@ -0,0 +1,278 @@
+"""
+Hourly rollup of prediction rows for the statistics endpoint.
+
+Every write of ``predictions`` rows also upserts one ``prediction_stats`` row
+per (hour, label) in the same transaction: count, sum, min and max of the
+confidence. Reads then scan buckets instead of predictions. Rows that were
+stored before the rollup existed are added once with the backfill command:
+
+    python -m app.core.prediction_stats
+"""
+
+import argparse
+import asyncio
+import logging
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timedelta
+from typing import Any, TypedDict
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker
+
+from app.core import db_helper
+from app.core.models import Prediction, PredictionStat
+
+logger = logging.getLogger(__name__)
+
+# Строк на один INSERT при backfill: 6 параметров на строку, лимит
+# PostgreSQL - 65535 параметров на запрос
+UPSERT_BATCH = 5000
+# Буфер записи может сбросить строки прошлого часа уже после его окончания:
+# последние бакеты backfill пересчитывает под блокировкой
+LATE_WRITES = timedelta(hours=1)
+
+
+class StatRow(TypedDict):
+    """Column values of one ``prediction_stats`` row."""
+
+    bucket: datetime
+    prediction: str
+    count: int
+    confidence_sum: float
+    confidence_min: float
+    confidence_max: float
+
+
+def bucket_start(timestamp: datetime) -> datetime:
+    """Start of the hour bucket a timestamp falls into."""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def merge(stats: dict[tuple[datetime, str], StatRow], stat: StatRow) -> None:
+    """Add one partial aggregate to ``stats``, keyed by (bucket, label)."""
+    key = (stat["bucket"], stat["prediction"])
+    current = stats.get(key)
+    if current is None:
+        stats[key] = stat.copy()
+        return
+
+    current["count"] += stat["count"]
+    current["confidence_sum"] += stat["confidence_sum"]
+    current["confidence_min"] = min(current["confidence_min"], stat["confidence_min"])
+    current["confidence_max"] = max(current["confidence_max"], stat["confidence_max"])
+
+
+def rollup(
+    rows: Iterable[Mapping[str, Any]],
+    stats: dict[tuple[datetime, str], StatRow] | None = None,
+) -> dict[tuple[datetime, str], StatRow]:
+    """
+    Aggregate prediction rows into hour buckets.
+
+    Args:
+        rows: Mappings with ``created_at``, ``prediction`` and ``confidence``.
+        stats: Aggregates to extend (a new dict when omitted).
+
+    Returns:
+        The aggregates keyed by (bucket, label).
+    """
+    stats = {} if stats is None else stats
+    for row in rows:
+        confidence = row["confidence"]
+        merge(
+            stats,
+            StatRow(
+                bucket=bucket_start(row["created_at"]),
+                prediction=row["prediction"],
+                count=1,
+                confidence_sum=confidence,
+                confidence_min=confidence,
+                confidence_max=confidence,
+            ),
+        )
+    return stats
+
+
+def upsert_statement(
+    dialect: str, stats: list[StatRow]
+) -> postgresql.Insert | sqlite.Insert:
+    """
+    Build an INSERT ... ON CONFLICT that adds ``stats`` to existing buckets.
+
+    Args:
+        dialect: SQLAlchemy dialect name ("postgresql" or "sqlite").
+        stats: Aggregates with distinct (bucket, label) keys.
+
+    Raises:
+        NotImplementedError: For dialects without ON CONFLICT support here.
+    """
+    if dialect == "postgresql":
+        stmt = postgresql.insert(PredictionStat)
+        least, greatest = func.least, func.greatest
+    elif dialect == "sqlite":
+        # В SQLite min()/max() с несколькими аргументами - скалярные функции
+        stmt = sqlite.insert(PredictionStat)
+        least, greatest = func.min, func.max
+    else:
+        raise NotImplementedError(f"No upsert for the {dialect} dialect")
+
+    stmt = stmt.values(stats)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[PredictionStat.bucket, PredictionStat.prediction],
+        set_={
+            "count": PredictionStat.count + excluded.count,
+            "confidence_sum": PredictionStat.confidence_sum + excluded.confidence_sum,
+            "confidence_min": least(
+                PredictionStat.confidence_min, excluded.confidence_min
+            ),
+            "confidence_max": greatest(
+                PredictionStat.confidence_max, excluded.confidence_max
+            ),
+        },
+    )
+
+
+async def record_stats(
+    connection: AsyncConnection, rows: Iterable[Mapping[str, Any]]
+) -> None:
+    """
+    Add freshly written prediction rows to the rollup.
+
+    Must run in the transaction that inserts the rows, so the rollup never
+    counts a prediction that was rolled back.
+
+    Args:
+        connection: Connection of the inserting transaction.
+        rows: The inserted rows (``PredictionRow`` or equivalent mappings).
+    """
+    # Одинаковый порядок ключей во всех транзакциях: без взаимных блокировок
+    stats = [stat for _, stat in sorted(rollup(rows).items())]
+    if stats:
+        await connection.execute(upsert_statement(connection.dialect.name, stats))
+
+
+async def rebuild(
+    session: AsyncSession,
+    chunk_size: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[int, int]:
+    """
+    Recompute the buckets of one time range from the stored predictions.
+
+    The range's buckets are deleted and written again in the session's
+    transaction; the caller commits.
+
+    Args:
+        session: Session of the rebuilding transaction.
+        chunk_size: Prediction rows fetched per round trip.
+        since: First bucket of the range (unbounded when omitted).
+        until: Bucket the range ends before (unbounded when omitted).
+
+    Returns:
+        The numbers of prediction rows aggregated and of buckets written.
+    """
+    bucket_filter = []
+    row_filter = []
+    if since is not None:
+        bucket_filter.append(PredictionStat.bucket >= since)
+        row_filter.append(Prediction.created_at >= since)
+    if until is not None:
+        bucket_filter.append(PredictionStat.bucket < until)
+        row_filter.append(Prediction.created_at < until)
+
+    await session.execute(delete(PredictionStat).where(*bucket_filter))
+    stmt = (
+        select(Prediction.created_at, Prediction.prediction, Prediction.confidence)
+        .where(*row_filter)
+        .execution_options(yield_per=chunk_size)
+    )
+    stats: dict[tuple[datetime, str], StatRow] = {}
+    scanned = 0
+    result = await session.stream(stmt)
+    async for partition in result.mappings().partitions():
+        rollup(partition, stats)
+        scanned += len(partition)
+
+    dialect = (await session.connection()).dialect.name
+    values = [stat for _, stat in sorted(stats.items())]
+    for start in range(0, len(values), UPSERT_BATCH):
+        await session.execute(
+            upsert_statement(dialect, values[start : start + UPSERT_BATCH])
+        )
+    return scanned, len(values)
+
+
+async def backfill(
+    session_factory: async_sessionmaker[AsyncSession],
+    chunk_size: int = 10_000,
+    now: datetime | None = None,
+) -> int:
+    """
+    Rebuild the rollup from every stored prediction.
+
+    History below a watermark (the start of the previous hour) is rebuilt
+    first without any table lock: writers only add rows stamped with the
+    current time, so they never touch those buckets. The remaining one or
+    two buckets are then recomputed in a short transaction that locks the
+    table on PostgreSQL, so the writers that race with it wait for its
+    commit and their rows are counted exactly once.
+
+    Args:
+        session_factory: Factory for the rebuilding sessions.
+        chunk_size: Prediction rows fetched per round trip.
+        now: Current time (default: ``datetime.now()``, like ``created_at``).
+
+    Returns:
+        int: Number of prediction rows aggregated.
+    """
+    watermark = bucket_start(now or datetime.now()) - LATE_WRITES
+
+    async with session_factory() as session:
+        scanned, buckets = await rebuild(session, chunk_size, until=watermark)
+        await session.commit()
+    logger.info(
+        "Rolled up %d predictions before %s into %d buckets",
+        scanned,
+        watermark,
+        buckets,
+    )
+
+    async with session_factory() as session:
+        connection = await session.connection()
+        if connection.dialect.name == "postgresql":
+            await connection.execute(
+                text(
+                    f"LOCK TABLE {PredictionStat.__tablename__} "
+                    "IN SHARE ROW EXCLUSIVE MODE"
+                )
+            )
+        recent, buckets = await rebuild(session, chunk_size, since=watermark)
+        await session.commit()
+    logger.info("Rolled up %d recent predictions into %d buckets", recent, buckets)
+    return scanned + recent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+
+    async def run() -> None:
+        try:
+            await backfill(db_helper.session_factory, args.chunk_size)
+        finally:
+            await db_helper.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Write-behind persistence of prediction audit rows.
+
+Instead of a commit (and a refresh) per request, rows are buffered in memory
+and flushed in batches: with asyncpg through ``COPY`` (copy_records_to_table),
+otherwise through a single multi-row INSERT. The buffer is bounded, so when
+the database falls behind, producers wait (backpressure) rather than growing
+memory without limit. Each batch also updates the hourly statistics rollup
+in the same transaction.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from datetime import datetime
+from typing import TypedDict
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.metrics import STAGE_SECONDS, WRITER_DROPPED
+from app.core.models import Prediction
+from app.core.prediction_stats import record_stats
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionRow(TypedDict):
+    """Column values of one ``predictions`` row (``id`` comes from the database)."""
+
+    filename: str
+    prediction: str
+    confidence: float
+    created_at: datetime
+    model_version: str | None
+
+
+COLUMNS = ("filename", "prediction", "confidence", "created_at", "model_version")
+
+
+class PredictionWriter:
+    """
+    Buffered, batched writer for Prediction rows.
+
+    Attributes:
+        batch_size: Flush as soon as this many rows are buffered.
+        flush_interval_ms: Flush at the latest this long after the first
+            buffered row arrived.
+        max_pending: Capacity of the buffer; ``put`` waits when it is full.
+        use_copy: Use PostgreSQL COPY when the driver is asyncpg.
+        max_retries: Attempts per batch before its rows are dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        batch_size: int = 500,
+        flush_interval_ms: float = 200,
+        max_pending: int = 10_000,
+        use_copy: bool = True,
+        max_retries: int = 3,
+    ) -> None:
+        """
+        Initialize the writer. Nothing is written until :meth:`start`.
+
+        Args:
+            session_factory: Factory for the sessions used to write batches.
+            batch_size: Flush as soon as this many rows are buffered.
+            flush_interval_ms: Maximum age of a buffered row before a flush.
+            max_pending: Capacity of the buffer.
+            use_copy: Use PostgreSQL COPY when the driver is asyncpg.
+            max_retries: Attempts per batch before its rows are dropped.
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending = max_pending
+        self.use_copy = use_copy
+        self.max_retries = max_retries
+        self.written = 0
+        self.dropped = 0
+        # None - сигнал остановки: дописать накопленное и выйти
+        self._queue: asyncio.Queue[PredictionRow | None] = asyncio.Queue(
+            maxsize=max_pending
+        )
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def pending(self) -> int:
+        """Rows buffered and not yet written."""
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        """Start the background flush loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="prediction-writer")
+
+    async def stop(self) -> None:
+        """Write every buffered row, then stop the flush loop."""
+        if self._task is None:
+            return
+
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def put(self, row: PredictionRow) -> None:
+        """Buffer a row, waiting while the buffer is full."""
+        await self._queue.put(row)
+
+    async def put_many(self, rows: Iterable[PredictionRow]) -> None:
+        """Buffer several rows, waiting while the buffer is full."""
+        for row in rows:
+            await self._queue.put(row)
+
+    async def flush(self) -> None:
+        """Wait until every row buffered so far has been written (or dropped)."""
+        await self._queue.join()
+
+    async def _collect(self) -> tuple[list[PredictionRow], bool]:
+        """
+        Wait for the first row, then gather more until a flush condition.
+
+        Returns:
+            The collected rows and whether the stop signal was received.
+        """
+        rows: list[PredictionRow] = []
+        deadline: float | None = None
+
+        while len(rows) < self.batch_size:
+            if not self._queue.empty():
+                # Забираем все, что уже лежит в буфере, без ожидания
+                item = self._queue.get_nowait()
+            elif deadline is None:
+                item = await self._queue.get()
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except TimeoutError:
+                    break
+
+            if item is None:
+                return rows, True
+            rows.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval_ms / 1000
+
+        return rows, False
+
+    async def _run(self) -> None:
+        """Main loop: collect a batch, write it, acknowledge the rows."""
+        stopping = False
+        while not stopping:
+            rows, stopping = await self._collect()
+            try:
+                if rows:
+                    await self._write_with_retries(rows)
+            finally:
+                for _ in range(len(rows) + stopping):
+                    self._queue.task_done()
+
+    async def _write_with_retries(self, rows: list[PredictionRow]) -> None:
+        """Write a batch, retrying transient failures with a short backoff."""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with STAGE_SECONDS.labels(stage="db_flush").time():
+                    await self._write(rows)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.dropped += len(rows)
+                    WRITER_DROPPED.inc(len(rows))
+                    logger.exception(
+                        "Dropping %d prediction rows after %d attempts: %s",
+                        len(rows),
+                        attempt,
+                        e,
+                    )
+                    return
+                logger.warning("Prediction batch write failed, retrying: %s", e)
+                await asyncio.sleep(0.1 * 2**attempt)
+            else:
+                self.written += len(rows)
+                logger.debug("Flushed %d prediction rows", len(rows))
+                return
+
+    async def _write(self, rows: list[PredictionRow]) -> None:
+        """Write one batch and its rollup in a single transaction."""
+        async with self.session_factory() as session:
+            connection = await session.connection()
+            if self.use_copy and connection.dialect.driver == "asyncpg":
+                raw = await connection.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    Prediction.__tablename__,
+                    records=[tuple(row[c] for c in COLUMNS) for row in rows],
+                    columns=COLUMNS,
+                )
+            else:
+                await session.execute(insert(Prediction), rows)
+            await record_stats(connection, rows)
+            await session.commit()
@@ -0,0 +1,145 @@
+"""
+Startup warm-up of the inference path and the database pool.
+
+The first requests after a pod starts would otherwise pay for allocator
+growth, oneDNN kernel selection (per input shape), TorchScript/compile
+specialization and opening database connections. The warm-up runs
+synthetic forward passes at the served batch sizes on every pool worker
+and opens the pool's connections before the pod is reported ready.
+"""
+
+import asyncio
+import io
+import logging
+import time
+from collections.abc import Callable
+from contextlib import AsyncExitStack
+
+import torch
+from PIL import Image
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.ml.executor import InferenceExecutor
+from app.utils.image_processor import image_processor
+
+logger = logging.getLogger(__name__)
+
+
+def default_batch_sizes(max_batch_size: int) -> list[int]:
+    """
+    Powers of two up to ``max_batch_size``, plus the maximum itself.
+
+    Args:
+        max_batch_size: Largest batch the batcher will form.
+
+    Returns:
+        Sorted batch sizes, e.g. [1, 2, 4, 8, 12] for 12.
+    """
+    sizes = []
+    size = 1
+    while size < max_batch_size:
+        sizes.append(size)
+        size *= 2
+    sizes.append(max_batch_size)
+    return sizes
+
+
+async def warm_up_model(
+    executor: InferenceExecutor,
+    model: Callable[[torch.Tensor], torch.Tensor],
+    batch_sizes: list[int],
+    rounds: int = 2,
+) -> None:
+    """
+    Run synthetic forward passes and one image decode through the pool.
+
+    Every round submits ``executor.max_workers`` concurrent passes per batch
+    size so that each worker (thread or process) selects its kernels.
+
+    Args:
+        executor: Running pool that serves inference.
+        model: In-process model (ignored by process workers).
+        batch_sizes: Batch sizes to specialize for.
+        rounds: Passes per batch size and worker.
+    """
+    buffer = io.BytesIO()
+    Image.new("L", (512, 512), 128).save(buffer, "JPEG")
+    await executor.run(image_processor.process_images, [buffer.getvalue()])
+
+    for batch_size in batch_sizes:
+        size = image_processor.img_size
+        batch = torch.zeros(batch_size, image_processor.channels, size, size)
+        for _ in range(rounds):
+            await asyncio.gather(
+                *(executor.infer(model, batch) for _ in range(executor.max_workers))
+            )
+
+
+async def warm_up_database(
+    session_factory: async_sessionmaker[AsyncSession], connections: int
+) -> None:
+    """
+    Open ``connections`` pooled connections and return them to the pool.
+
+    All sessions are held at once, so the pool has to open distinct
+    connections instead of reusing one.
+
+    Args:
+        session_factory: Factory bound to the engine whose pool is warmed.
+        connections: Number of connections to open.
+    """
+    async with AsyncExitStack() as stack:
+        for _ in range(connections):
+            session = await stack.enter_async_context(session_factory())
+            await session.execute(text("SELECT 1"))
+
+
+async def warm_up(
+    executor: InferenceExecutor,
+    model: Callable[[torch.Tensor], torch.Tensor],
+    session_factory: async_sessionmaker[AsyncSession],
+    batch_sizes: list[int],
+    rounds: int,
+    db_connections: int,
+    timeout_seconds: float,
+) -> bool:
+    """
+    Warm up the model and the database pool.
+
+    A failing database warm-up is only logged: connections are retried by
+    the pool on demand. A failing forward pass means the model cannot
+    serve, and the pod must not report ready.
+
+    Args:
+        executor: Running pool that serves inference.
+        model: In-process model.
+        session_factory: Factory bound to the application engine.
+        batch_sizes: Batch sizes to specialize for.
+        rounds: Passes per batch size and worker.
+        db_connections: Connections to open ahead of traffic.
+        timeout_seconds: Upper bound on the database warm-up.
+
+    Returns:
+        True when the model warmed up successfully.
+    """
+    start = time.perf_counter()
+    try:
+        await warm_up_model(executor, model, batch_sizes, rounds)
+    except Exception:
+        logger.exception("Model warm-up failed, the pod stays not ready")
+        return False
+
+    try:
+        async with asyncio.timeout(timeout_seconds):
+            await warm_up_database(session_factory, db_connections)
+    except Exception as e:
+        logger.warning("Database warm-up failed: %r", e)
+
+    logger.info(
+        "Warm-up finished in %.2fs (batch sizes %s, %d DB connections)",
+        time.perf_counter() - start,
+        batch_sizes,
+        db_connections,
+    )
+    return True
@@ -6,9 +6,10 @@ customized Swagger UI and ReDoc documentation, async lifespan management,
 and ORJSON response serialization.
 """
 
+import asyncio
 import logging
 from collections.abc import AsyncGenerator
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.openapi.docs import (
@@ -19,8 +20,16 @@ from fastapi.openapi.docs import (
 from fastapi.responses import HTMLResponse, ORJSONResponse
 
 from app.api import api_router
-from app.core import db_helper
-from app.core.ml.model_loader import model_loader
+from app.api.health import api_router as health_router
+from app.core import db_helper, settings
+from app.core.metrics import (
+    MetricsMiddleware,
+    metrics_endpoint,
+    observe_runtime,
+)
+from app.core.ml.cache import PredictionCache
+from app.core.prediction_writer import PredictionWriter
+from app.utils.upload import RequestSizeLimitMiddleware
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +40,10 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     Async context manager for FastAPI application lifecycle.
 
     Handles startup and shutdown events for the application, including
-    database connection management.
+    model loading, the model registry (one inference batcher per resident
+    version), buffered prediction writes and database connection management.
+    The warm-up runs in the background; ``app.state.ready`` turns True once
+    it has finished.
 
     Args:
         app: The FastAPI application instance.
@@ -40,19 +52,137 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         None: Control passes to the application runtime.
 
     """
+    # ML-стек (torch) грузится здесь, а не при импорте app.main
+    from app.core.ml.executor import InferenceExecutor
+    from app.core.ml.model_loader import model_loader
+    from app.core.ml.registry import ModelRegistry
+    from app.core.warmup import default_batch_sizes
+
     # Startup: Resources are initialized here
     logger.info("Starting up LungCheck application...")
 
     logger.info("Loading ML model...")
-    app.state.model = model_loader.load_model()
+    model = model_loader.load_model()
+
+    # Декодирование и инференс выполняются вне event loop
+    app.state.executor = InferenceExecutor(
+        kind=settings.executor.kind,
+        max_workers=settings.executor.max_workers,
+        torch_threads=settings.executor.torch_threads,
+        torch_interop_threads=settings.executor.torch_interop_threads,
+    )
+    app.state.executor.start(model=model)
+
+    # Резидентные версии модели, у каждой свой батчер
+    app.state.models = ModelRegistry(
+        app.state.executor,
+        max_batch_size=settings.ml_config.max_batch_size,
+        max_wait_ms=settings.ml_config.max_batch_wait_ms,
+        max_resident=settings.registry.max_resident,
+        warmup_batch_sizes=(
+            settings.warmup.batch_sizes
+            or default_batch_sizes(settings.ml_config.max_batch_size)
+            if settings.warmup.enabled
+            else None
+        ),
+    )
+    app.state.models.add(
+        settings.registry.default_name,
+        model,
+        model_loader.version,
+        model_loader.runtime,
+    )
+
+    app.state.prediction_cache = None
+    if settings.cache.enabled:
+        redis_url = settings.cache.redis_url
+        app.state.prediction_cache = PredictionCache(
+            max_entries=settings.cache.max_entries,
+            ttl_seconds=settings.cache.ttl_seconds,
+            redis_url=str(redis_url) if redis_url else None,
+        )
+
+    # Записи о предсказаниях пишутся в БД пачками в фоне
+    app.state.prediction_writer = None
+    if settings.writer.enabled:
+        app.state.prediction_writer = PredictionWriter(
+            db_helper.session_factory,
+            batch_size=settings.writer.batch_size,
+            flush_interval_ms=settings.writer.flush_interval_ms,
+            max_pending=settings.writer.max_pending,
+            use_copy=settings.writer.use_copy,
+        )
+        app.state.prediction_writer.start()
+
+    # Очередь батчера, пул БД и буфер записи читаются при каждом scrape
+    observe_runtime(app.state.models, db_helper.engine, app.state.prediction_writer)
+
+    # Прогрев идет в фоне: /health/live отвечает сразу, /health/ready - после него
+    app.state.ready = False
+    app.state.warmup = asyncio.create_task(start_warmup(app), name="warmup")
+
+    # Новые веса после train.py подхватываются без рестарта пода
+    app.state.weights_watcher = None
+    if settings.registry.watch:
+        app.state.weights_watcher = asyncio.create_task(
+            app.state.models.watch(
+                settings.registry.default_name,
+                settings.PROJECT_ROOT / settings.ml_config.model_path,
+                settings.registry.watch_interval_seconds,
+            ),
+            name="weights-watcher",
+        )
 
     yield
     logger.info("Shutting down LungCheck application...")
+    # Под перестает принимать трафик до остановки ресурсов
+    app.state.ready = False
+    for task in (app.state.warmup, app.state.weights_watcher):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
     # Shutdown: Cleanup resources
+    if app.state.prediction_writer is not None:
+        await app.state.prediction_writer.stop()
+        logger.info("Buffered predictions flushed.")
+    if app.state.prediction_cache is not None:
+        await app.state.prediction_cache.close()
+    await app.state.models.close()
+    app.state.executor.shutdown()
     await db_helper.dispose()
     logger.info("Database connections disposed.")
 
 
+async def start_warmup(app: FastAPI) -> None:
+    """
+    Warm up the model and the database pool, then mark the app ready.
+
+    Args:
+        app: The FastAPI application whose state holds the executor and models.
+    """
+    config = settings.warmup
+    if not config.enabled:
+        app.state.ready = True
+        return
+
+    from app.core.warmup import warm_up
+
+    app.state.ready = await warm_up(
+        app.state.executor,
+        app.state.models.get().model,
+        db_helper.session_factory,
+        batch_sizes=app.state.models.warmup_batch_sizes,
+        rounds=config.rounds,
+        db_connections=(
+            settings.db.pool_size
+            if config.db_connections is None
+            else config.db_connections
+        ),
+        timeout_seconds=config.timeout_seconds,
+    )
+
+
 def register_static_docs_routes(app: FastAPI) -> None:
     """
     Register custom static documentation routes for Swagger UI and ReDoc.
@@ -139,6 +269,9 @@ def create_app(
     Creates a FastAPI application with:
     - ORJSON response serialization for performance
     - Async lifespan management
+    - Liveness and readiness probes
+    - A request body size limit
+    - Prometheus request metrics and the metrics endpoint
     - Optional custom documentation endpoints
 
     Args:
@@ -157,6 +290,16 @@ def create_app(
     )
 
     app.include_router(api_router)
+    app.include_router(health_router)
+    # Слишком большие тела запросов отклоняем до разбора multipart
+    app.add_middleware(
+        RequestSizeLimitMiddleware, max_bytes=settings.upload.max_request_bytes
+    )
+
+    if settings.metrics.enabled:
+        # Добавлен последним - внешний слой, видит и отклоненные запросы
+        app.add_middleware(MetricsMiddleware)
+        app.add_route(settings.metrics.path, metrics_endpoint, include_in_schema=False)
 
     if create_custom_static_urls:
         register_static_docs_routes(app)
@@ -1,3 +1,20 @@
+from app.schemas.cache import CacheStatsResponse
 from app.schemas.diagnosis import PneumoniaPredictionResponse
+from app.schemas.health import HealthResponse
+from app.schemas.jobs import JobResponse, JobStatusResponse
+from app.schemas.registry import ModelInfo, ModelLoadRequest, ModelRegistryResponse
+from app.schemas.stats import LabelStats, StatsBucket, StatsResponse
 
-__all__ = ("PneumoniaPredictionResponse",)
+__all__ = (
+    "CacheStatsResponse",
+    "HealthResponse",
+    "JobResponse",
+    "JobStatusResponse",
+    "LabelStats",
+    "ModelInfo",
+    "ModelLoadRequest",
+    "ModelRegistryResponse",
+    "PneumoniaPredictionResponse",
+    "StatsBucket",
+    "StatsResponse",
+)
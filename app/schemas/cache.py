@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+
+class CacheStatsResponse(BaseModel):
+    """
+    Hit/miss counters of the prediction cache.
+
+    Attributes:
+        enabled: Whether the cache is consulted at all.
+        memory_hits: Lookups answered by the in-process LRU tier.
+        redis_hits: Lookups answered by the shared Redis tier.
+        misses: Lookups that required a full decode and forward pass.
+        redis_errors: Redis operations that failed and were skipped.
+        size: Entries currently held in the in-process tier.
+    """
+    enabled: bool
+    memory_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    redis_errors: int = 0
+    size: int = 0
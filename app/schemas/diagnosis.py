@@ -15,8 +15,20 @@ class PneumoniaPredictionResponse(BaseModel):
         prediction: Predicted class label ('NORMAL' or 'PNEUMONIA').
         confidence: Model confidence score as a percentage (0.0 to 100.0).
         timestamp: The exact time when the diagnosis was generated.
+        model_version: Version of the weights that produced the diagnosis
+            (unknown for rows stored before versions were recorded); versions
+            of an ensemble are joined with "+".
+        views: Number of scored views (TTA views times ensemble members),
+            present for augmented/ensemble predictions only.
+        probabilities: Per-class probability averaged over the views, in
+            percent.
+        spread: Per-class standard deviation over the views, in percent.
     """
     filename: str
     prediction: str
     confidence: float
     timestamp: datetime
+    model_version: str | None = None
+    views: int | None = None
+    probabilities: dict[str, float] | None = None
+    spread: dict[str, float] | None = None
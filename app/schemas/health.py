@@ -0,0 +1,13 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class HealthResponse(BaseModel):
+    """
+    Probe answer.
+
+    Attributes:
+        status: "alive" for liveness; "ready" or "warming_up" for readiness.
+    """
+    status: Literal["alive", "ready", "warming_up"]
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+
+from app.schemas.diagnosis import PneumoniaPredictionResponse
+
+
+class JobResponse(BaseModel):
+    """
+    Acknowledgement of an enqueued prediction job.
+
+    Attributes:
+        job_id: Identifier to poll at GET /jobs/{job_id}.
+        status: Celery state of the job at the time of the response.
+    """
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    """
+    Current state of a prediction job.
+
+    Attributes:
+        job_id: Identifier of the job.
+        status: Celery state (PENDING, STARTED, SUCCESS, FAILURE, ...).
+        result: Diagnosis, present once the job has succeeded.
+        error: Failure reason, present if the job has failed.
+    """
+    job_id: str
+    status: str
+    result: PneumoniaPredictionResponse | None = None
+    error: str | None = None
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class ModelInfo(BaseModel):
+    """
+    One resident model version.
+
+    Attributes:
+        name: Name requests select the version by (``?model=``).
+        version: Content hash of the weights.
+        runtime: Runtime variant the weights are served with.
+        loaded_at: When the version became resident.
+    """
+    name: str
+    version: str
+    runtime: str
+    loaded_at: datetime
+
+
+class ModelRegistryResponse(BaseModel):
+    """
+    Resident model versions of the answering pod.
+
+    Attributes:
+        active: Version serving requests without ``?model=``.
+        shadow: Version scoring the same requests in the background.
+        loading: Versions currently being loaded and warmed up.
+        models: Resident versions, oldest first.
+    """
+    active: str | None
+    shadow: str | None
+    loading: list[str]
+    models: list[ModelInfo]
+
+
+class ModelLoadRequest(BaseModel):
+    """
+    Request to load a model version.
+
+    Attributes:
+        path: Weights file relative to the models directory (default: the
+            configured ``MLConfig.model_path``).
+        activate: Serve the version by default once it is warm.
+    """
+    path: str | None = None
+    activate: bool = False
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class LabelStats(BaseModel):
+    """
+    Aggregates of the predictions of one class.
+
+    Attributes:
+        label: Predicted class ('NORMAL' or 'PNEUMONIA').
+        count: Number of predictions.
+        mean_confidence: Mean stored confidence (0.0 to 1.0).
+        min_confidence: Lowest stored confidence.
+        max_confidence: Highest stored confidence.
+    """
+    label: str
+    count: int
+    mean_confidence: float
+    min_confidence: float
+    max_confidence: float
+
+
+class StatsBucket(LabelStats):
+    """
+    Aggregates of one class within one hour or day.
+
+    Attributes:
+        bucket: Start of the hour or day.
+    """
+    bucket: datetime
+
+
+class StatsResponse(BaseModel):
+    """
+    Prediction statistics over a time range.
+
+    Attributes:
+        granularity: Width of the buckets, "hour" or "day".
+        total: Number of predictions in the range.
+        labels: Aggregates per class over the whole range.
+        buckets: Aggregates per bucket and class, oldest first.
+    """
+    granularity: Literal["hour", "day"]
+    total: int
+    labels: list[LabelStats]
+    buckets: list[StatsBucket]
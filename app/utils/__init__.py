@@ -1,4 +1,6 @@
-__all__ = ("camel_case_to_snake_case", "image_processor")
+__all__ = ("camel_case_to_snake_case",)
 
+# image_processor тянет torch, поэтому не реэкспортируется отсюда: модели БД
+# и миграции импортируют app.utils без ML-стека. Используйте
+# from app.utils.image_processor import image_processor
 from app.utils.case_converter import camel_case_to_snake_case
-from app.utils.image_processor import image_processor
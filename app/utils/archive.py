@@ -0,0 +1,123 @@
+"""
+Extraction of image files from zip/tar archives uploaded in one request.
+"""
+
+import io
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+
+from app.utils.upload import PayloadTooLarge
+
+ARCHIVE_CONTENT_TYPES = frozenset(
+    {
+        "application/zip",
+        "application/x-zip-compressed",
+        "application/x-tar",
+        "application/gzip",
+        "application/x-gzip",
+        "application/x-gtar",
+    }
+)
+IMAGE_EXTENSIONS = frozenset(
+    {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp", ".dcm"}
+)
+
+
+def is_archive(content_type: str | None, filename: str | None) -> bool:
+    """Tell whether an upload should be treated as an archive of images."""
+    if content_type in ARCHIVE_CONTENT_TYPES:
+        return True
+    name = (filename or "").lower()
+    return name.endswith((".zip", ".tar", ".tar.gz", ".tgz"))
+
+
+def is_image_member(name: str) -> bool:
+    """Skip directories, hidden files (e.g. __MACOSX) and non-image entries."""
+    path = PurePosixPath(name)
+    if any(part.startswith((".", "__")) for part in path.parts):
+        return False
+    return path.suffix.lower() in IMAGE_EXTENSIONS
+
+
+def _check_member_size(name: str, size: int, max_bytes: int | None) -> None:
+    if max_bytes is not None and size > max_bytes:
+        raise ValueError(f"{name}: archive member exceeds {max_bytes} bytes")
+
+
+def _check_total_size(total: int, max_bytes: int | None) -> None:
+    if max_bytes is not None and total > max_bytes:
+        raise PayloadTooLarge(f"Archive images exceed {max_bytes} bytes in total")
+
+
+def extract_images(
+    content: bytes,
+    max_members: int,
+    max_member_bytes: int | None = None,
+    max_total_bytes: int | None = None,
+) -> list[tuple[str, bytes]]:
+    """
+    Read every image file from a zip or tar archive.
+
+    Args:
+        content: Raw archive bytes.
+        max_members: Maximum number of images accepted from one archive.
+        max_member_bytes: Largest accepted uncompressed image; checked
+            against the archive index and while reading (zip bomb guard).
+        max_total_bytes: Most uncompressed image bytes accepted from the
+            whole archive, so a request never holds ``max_members`` times
+            ``max_member_bytes`` in memory.
+
+    Returns:
+        (member name, member bytes) pairs in archive order.
+
+    Raises:
+        ValueError: If the bytes are not a supported archive, contain
+            more than ``max_members`` images or an image larger than
+            ``max_member_bytes``.
+        PayloadTooLarge: If the images add up to more than
+            ``max_total_bytes``.
+    """
+    images: list[tuple[str, bytes]] = []
+    total = 0
+    buffer = io.BytesIO(content)
+
+    if zipfile.is_zipfile(buffer):
+        with zipfile.ZipFile(buffer) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_image_member(info.filename):
+                    continue
+                if len(images) >= max_members:
+                    raise ValueError(f"Archive contains more than {max_members} images")
+                _check_member_size(info.filename, info.file_size, max_member_bytes)
+                _check_total_size(total + info.file_size, max_total_bytes)
+                with archive.open(info) as member:
+                    # Размер в заголовке zip можно подделать - читаем с лимитом
+                    data = member.read(
+                        -1 if max_member_bytes is None else max_member_bytes + 1
+                    )
+                _check_member_size(info.filename, len(data), max_member_bytes)
+                total += len(data)
+                _check_total_size(total, max_total_bytes)
+                images.append((info.filename, data))
+        return images
+
+    buffer.seek(0)
+    try:
+        archive_tar = tarfile.open(fileobj=buffer, mode="r:*")
+    except tarfile.TarError as e:
+        raise ValueError("Unsupported archive format") from e
+
+    with archive_tar:
+        for member in archive_tar:
+            if not member.isfile() or not is_image_member(member.name):
+                continue
+            if len(images) >= max_members:
+                raise ValueError(f"Archive contains more than {max_members} images")
+            _check_member_size(member.name, member.size, max_member_bytes)
+            total += member.size
+            _check_total_size(total, max_total_bytes)
+            extracted = archive_tar.extractfile(member)
+            if extracted is not None:
+                images.append((member.name, extracted.read()))
+    return images
@@ -1,8 +1,83 @@
 import io
+from collections.abc import Callable, Sequence
+from functools import cached_property
+from typing import TYPE_CHECKING
 
+import numpy as np
 import torch
 from PIL import Image
-from torchvision import transforms
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from pydicom.dataset import Dataset
+    from pydicom.multival import MultiValue
+
+# Стандарт нормализации для ResNet (ImageNet)
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+# Кроме тегов самих пикселей из DICOM читаем только теги LUT/окна
+DICOM_TAGS = [
+    0x00281050,  # Window Center
+    0x00281051,  # Window Width
+    0x00281052,  # Rescale Intercept
+    0x00281053,  # Rescale Slope
+    0x00281056,  # VOI LUT Function
+    0x00283000,  # Modality LUT Sequence
+    0x00283010,  # VOI LUT Sequence
+]
+
+# Доля стороны холста, которую занимает кроп при TTA: холст декодируется
+# со стороной img_size / TTA_CROP, и кроп ложится на пиксели один к одному
+TTA_CROP = 0.875
+
+# Ракурсы TTA как аффинные преобразования (масштаб, сдвиг x, сдвиг y,
+# отражение) в нормированных координатах холста [-1, 1]
+TTA_VIEWS: dict[str, tuple[float, float, float, bool]] = {
+    "full": (1.0, 0.0, 0.0, False),
+    "hflip": (1.0, 0.0, 0.0, True),
+    "center": (TTA_CROP, 0.0, 0.0, False),
+    "top_left": (TTA_CROP, TTA_CROP - 1, TTA_CROP - 1, False),
+    "top_right": (TTA_CROP, 1 - TTA_CROP, TTA_CROP - 1, False),
+    "bottom_left": (TTA_CROP, TTA_CROP - 1, 1 - TTA_CROP, False),
+    "bottom_right": (TTA_CROP, 1 - TTA_CROP, 1 - TTA_CROP, False),
+    "zoom_out": (1.1, 0.0, 0.0, False),
+}
+
+TTA_PRESETS: dict[str, tuple[str, ...]] = {
+    "flip": ("full", "hflip"),
+    "full": tuple(TTA_VIEWS),
+}
+
+
+def is_dicom(file_content: bytes) -> bool:
+    """Tell whether bytes are a DICOM Part 10 file (``DICM`` after the preamble)."""
+    return file_content[128:132] == b"DICM"
+
+
+def _first_value(value: "float | MultiValue[float]") -> float:
+    """First value of a possibly multi-valued DICOM number (e.g. Window Center)."""
+    from pydicom.multival import MultiValue
+
+    return float(value[0] if isinstance(value, MultiValue) else value)
+
+
+def _bin_frame(pixels: np.ndarray, step: int) -> np.ndarray:
+    """
+    Downsample a frame by averaging ``step`` x ``step`` blocks.
+
+    The sum is accumulated from ``step ** 2`` strided views into a float32
+    array of the reduced size, so no full-resolution copy is made.
+    """
+    height, width = pixels.shape[0] // step, pixels.shape[1] // step
+    binned = np.zeros((height, width, *pixels.shape[2:]), dtype=np.float32)
+    for dy in range(step):
+        for dx in range(step):
+            binned += pixels[dy : height * step : step, dx : width * step : step]
+    if step > 1:
+        binned /= step * step
+    return binned
 
 
 class ImageProcessor:
@@ -13,47 +88,274 @@ class ImageProcessor:
     suitable for deep learning inference, ensuring consistency between
     training and production data.
     """
-    def __init__(self, img_size: int = 224) -> None:
+    def __init__(
+        self, img_size: int = 224, draft_factor: int = 2, grayscale: bool = False
+    ) -> None:
         """
         Initialize the preprocessing pipeline with standard ResNet transformations.
 
         Args:
             img_size: Target dimension for image resizing (default: 224).
+            draft_factor: JPEGs are decoded at reduced scale, but never below
+                ``img_size * draft_factor`` pixels per side. 0 disables draft
+                decoding.
+            grayscale: Produce one channel of raw 0..255 pixels for a model
+                with a folded first convolution (see ``fold_grayscale``)
+                instead of three normalized RGB channels.
+        """
+        self.img_size = img_size
+        self.draft_factor = draft_factor
+        self.grayscale = grayscale
+        self.channels = 1 if grayscale else 3
+
+        # (x / 255 - mean) / std == x * scale + shift: одна операция на пиксель
+        std = np.asarray(STD, dtype=np.float32).reshape(3, 1, 1)
+        mean = np.asarray(MEAN, dtype=np.float32).reshape(3, 1, 1)
+        self._scale = 1 / (255 * std)
+        self._shift = -mean / std
+
+    @cached_property
+    def transform(self) -> Callable[[Image.Image], torch.Tensor]:
+        """
+        Reference torchvision pipeline (as in training) to check the fast path.
+
+        Built on first use: torchvision pulls in its whole model zoo, which
+        the serving path does not need.
         """
-        self.transform = transforms.Compose(
+        from torchvision import transforms
+
+        return transforms.Compose(
             [
-                transforms.Resize((img_size, img_size)),  # К стандарту размера
+                transforms.Resize((self.img_size, self.img_size)),  # К стандарту размера
                 transforms.ToTensor(),  # пиксели в массив чисел (тензор, яркость /255).
-                transforms.Normalize(  # Стандарт для ResNet
-                    mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]
-                ),
+                transforms.Normalize(mean=MEAN, std=STD),  # Стандарт для ResNet
             ]
         )
 
+    def _decode(
+        self, file_content: bytes, size: int | None = None
+    ) -> list[Image.Image]:
+        """
+        Decode image bytes and resize them to ``size`` in one resample.
+
+        Grayscale images stay single-channel; everything that is neither
+        grayscale nor RGB is converted to RGB as before (to grayscale in
+        grayscale mode). DICOM files yield one image per frame, every other
+        format exactly one.
+
+        Args:
+            file_content: Raw image bytes.
+            size: Output side length (default: ``img_size``).
+        """
+        size = size or self.img_size
+        if is_dicom(file_content):
+            images = self._decode_dicom(file_content, size)
+            if self.grayscale:
+                images = [i if i.mode == "F" else i.convert("L") for i in images]
+            return images
+
+        image = Image.open(io.BytesIO(file_content))
+
+        # JPEG умеет уменьшать изображение прямо при декодировании (DCT scaling),
+        # а в режиме grayscale - сразу отдавать только яркость
+        if image.format == "JPEG" and self.draft_factor:
+            target = size * self.draft_factor
+            image.draft("L" if self.grayscale else image.mode, (target, target))
+
+        if image.mode in ("1", "LA") or (self.grayscale and image.mode != "L"):
+            image = image.convert("L")
+        elif image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+
+        return [image.resize((size, size), Image.Resampling.BILINEAR)]
+
+    def _decode_dicom(self, file_content: bytes, size: int) -> list[Image.Image]:
+        """
+        Decode every frame of a DICOM file into a resized grayscale image.
+
+        Frames are decoded one at a time. Each is first box-downsampled to
+        about ``size * draft_factor`` pixels per side (see
+        :func:`_bin_frame`), so the modality LUT, VOI LUT/windowing and
+        scaling to 0..255 only touch the reduced array.
+        """
+        from pydicom.dataset import Dataset
+        from pydicom.pixels import apply_modality_lut, iter_pixels
+
+        # iter_pixels заполняет tags прочитанными тегами при первом кадре
+        tags = Dataset()
+        frames = iter_pixels(
+            io.BytesIO(file_content), ds_out=tags, specific_tags=DICOM_TAGS
+        )
+        target = size * max(self.draft_factor, 1)
+        images = []
+
+        for index, pixels in enumerate(frames):
+            step = max(1, min(pixels.shape[:2]) // target)
+            values = _bin_frame(pixels, step)
+
+            if values.ndim == 3:
+                # Цветной DICOM уже в RGB: окно к нему не применяется
+                image = Image.fromarray(values.round().astype(np.uint8), "RGB")
+            else:
+                if "ModalityLUTSequence" in tags:
+                    # Табличная LUT работает с целыми значениями
+                    stored = values.round().astype(pixels.dtype)
+                    values = apply_modality_lut(stored, tags).astype(np.float32)
+                else:
+                    # Rescale линейный, поэтому его можно делать после усреднения
+                    values *= float(tags.get("RescaleSlope") or 1)
+                    values += float(tags.get("RescaleIntercept") or 0)
+                image = Image.fromarray(self._apply_window(values, tags, index), "F")
+
+            images.append(image.resize((size, size), Image.Resampling.BILINEAR))
+        return images
+
+    @staticmethod
+    def _apply_window(values: np.ndarray, tags: "Dataset", index: int) -> np.ndarray:
+        """
+        Map modality values to 0..255 in place using the file's VOI settings.
+
+        Uses the VOI LUT (or a non-linear VOI LUT Function) through pydicom,
+        otherwise the linear Window Center/Width from the header, and falls
+        back to the frame's min/max when no window is stored. MONOCHROME1
+        frames are inverted so that bone is always bright.
+        """
+        voi_function = tags.get("VOILUTFunction") or "LINEAR"
+        if "VOILUTSequence" in tags or voi_function != "LINEAR":
+            from pydicom.pixels import apply_voi_lut
+
+            values = apply_voi_lut(values, tags, index=index).astype(np.float32)
+            low, high = float(values.min()), float(values.max())
+        elif "WindowCenter" in tags and "WindowWidth" in tags:
+            center = _first_value(tags.WindowCenter)
+            width = _first_value(tags.WindowWidth)
+            # Линейное окно по DICOM PS3.3 C.11.2.1.2
+            low = center - 0.5 - (width - 1) / 2
+            high = center - 0.5 + (width - 1) / 2
+        else:
+            low, high = float(values.min()), float(values.max())
+
+        values -= low
+        values *= 255 / max(high - low, 1e-6)
+        np.clip(values, 0, 255, out=values)
+        if tags.get("PhotometricInterpretation") == "MONOCHROME1":
+            np.subtract(255, values, out=values)
+        return values
+
+    def _normalize_into(self, image: Image.Image, out: np.ndarray) -> None:
+        """
+        Write the normalized [3, H, W] float32 pixels of ``image`` into ``out``.
+
+        In grayscale mode ``out`` is [1, H, W] and receives the raw pixels:
+        the normalization is folded into the model's first convolution.
+        """
+        pixels = np.asarray(image)
+        if self.grayscale:
+            np.copyto(out[0], pixels)
+            return
+        if pixels.ndim == 2:
+            # Ч/б снимок: канал размножается в RGB только на этом шаге
+            np.multiply(pixels, self._scale, out=out)
+        else:
+            np.multiply(pixels.transpose(2, 0, 1), self._scale, out=out)
+        out += self._shift
+
     def process_image(self, file_content: bytes) -> torch.Tensor:
         """
         Convert raw image bytes into a 4D input tensor.
 
         The process includes:
-        1. Decoding bytes and forcing RGB mode (handles grayscale X-rays).
-        2. Applying Resize, Tensor conversion, and Normalization.
-        3. Adding a batch dimension (NCHW format) required by PyTorch.
+        1. Decoding bytes (downscaled on decode for JPEG), keeping grayscale
+           X-rays single-channel.
+        2. One bilinear resize straight to ``img_size``.
+        3. Scaling and normalization as one vectorized op into the output
+           tensor, which already has the batch dimension (NCHW format).
+
+        The result matches :attr:`transform` applied to the RGB image up to
+        float rounding (and the draft downscale for large JPEGs).
+
+        DICOM files (optional ``pydicom`` dependency) are windowed to 8-bit
+        range first and produce one row per frame.
+
+        In grayscale mode the RGB conversion and the normalization are
+        skipped: the tensor has one channel of raw 0..255 pixel values.
 
         Args:
             file_content: Raw bytes from the uploaded file.
 
         Returns:
-            torch.Tensor: Preprocessed tensor of shape [1, 3, 224, 224].
+            torch.Tensor: Preprocessed tensor of shape [1, C, 224, 224]
+            ([frames, C, 224, 224] for multi-frame DICOM), C = ``channels``.
+        """
+        images = self._decode(file_content)
+        tensor = torch.empty(len(images), self.channels, self.img_size, self.img_size)
+        rows = tensor.numpy()
+        for i, image in enumerate(images):
+            self._normalize_into(image, rows[i])
+        return tensor
+
+    def process_views(
+        self, file_content: bytes, views: Sequence[str] = TTA_PRESETS["flip"]
+    ) -> torch.Tensor:
         """
-        # 1. Перевод ч/б рентгена в RGB
-        image = Image.open(io.BytesIO(file_content)).convert("RGB")
+        Build test-time augmentation views of one image as a single batch.
 
-        # 2. Применяем трансформации
-        tensor: torch.Tensor = self.transform(image)
+        The image is decoded and normalized once, onto a canvas slightly
+        larger than ``img_size``; all views (flip, crops, zoom) are then
+        sampled from it by one batched ``grid_sample`` call, one affine
+        transform per view. Multi-frame DICOM uses the first frame.
 
-        # 3. Добавляем размерность батча: из [3, 224, 224] делаем [1, 3, 224, 224]
-        return tensor.unsqueeze(0)
+        Args:
+            file_content: Raw bytes from the uploaded file.
+            views: Names from :data:`TTA_VIEWS`.
+
+        Returns:
+            torch.Tensor: Tensor of shape [len(views), C, 224, 224].
+        """
+        canvas_size = round(self.img_size / TTA_CROP)
+        image = self._decode(file_content, canvas_size)[0]
+        canvas = torch.empty(1, self.channels, canvas_size, canvas_size)
+        self._normalize_into(image, canvas.numpy()[0])
+
+        theta = torch.tensor(
+            [
+                [[-scale if flip else scale, 0.0, dx], [0.0, scale, dy]]
+                for scale, dx, dy, flip in (TTA_VIEWS[view] for view in views)
+            ]
+        )
+        size = (len(views), self.channels, self.img_size, self.img_size)
+        grid = torch.nn.functional.affine_grid(theta, list(size), align_corners=False)
+        # border: при уменьшении (zoom_out) края продолжаются, а не чернеют
+        return torch.nn.functional.grid_sample(
+            canvas.expand(len(views), -1, -1, -1),
+            grid,
+            mode="bilinear",
+            padding_mode="border",
+            align_corners=False,
+        )
+
+    def process_images(self, contents: Sequence[bytes]) -> torch.Tensor:
+        """
+        Convert several images into one batch tensor.
+
+        Each image is written straight into its row of a preallocated batch,
+        so no per-image tensors are concatenated afterwards.
+
+        Args:
+            contents: Raw bytes of each image.
+
+        Returns:
+            torch.Tensor: Preprocessed tensor of shape [N, C, 224, 224], with
+            one row per frame for multi-frame DICOM.
+        """
+        # Держим в памяти только уменьшенные до 224 изображения
+        images = [image for content in contents for image in self._decode(content)]
+        batch = torch.empty(len(images), self.channels, self.img_size, self.img_size)
+        rows = batch.numpy()
+        for i, image in enumerate(images):
+            self._normalize_into(image, rows[i])
+        return batch
 
 
 # Создаем экземпляр для использования в роутах
-image_processor = ImageProcessor()
+image_processor = ImageProcessor(grayscale=settings.ml_config.grayscale)
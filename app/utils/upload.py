@@ -0,0 +1,221 @@
+"""
+Size-bounded ingestion and cheap validation of uploaded images.
+
+Uploads are read in chunks and abandoned as soon as they exceed the size
+limit, so a request never holds more than ``max_bytes`` of one file in
+memory. Images are then checked by their magic bytes and by the dimensions
+in their header (Pillow's lazy ``open`` reads only the header), before any
+pixel data is decoded.
+"""
+
+import io
+import warnings
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image, UnidentifiedImageError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Сигнатуры поддерживаемых форматов: (смещение, байты) -> формат Pillow
+MAGIC_BYTES: tuple[tuple[int, bytes, str], ...] = (
+    (0, b"\xff\xd8\xff", "JPEG"),
+    (0, b"\x89PNG\r\n\x1a\n", "PNG"),
+    (0, b"BM", "BMP"),
+    (0, b"II*\x00", "TIFF"),
+    (0, b"MM\x00*", "TIFF"),
+    (8, b"WEBP", "WEBP"),
+    (128, b"DICM", "DICOM"),
+)
+DICOM_CONTENT_TYPES = frozenset({"application/dicom", "application/dicom+octet"})
+
+
+@dataclass(frozen=True, slots=True)
+class ImageHeader:
+    """
+    What an image header declares, read without decoding pixels.
+
+    Attributes:
+        format: Pillow format name, or "DICOM".
+        width: Frame width in pixels.
+        height: Frame height in pixels.
+        frames: Number of frames (more than one only for DICOM).
+    """
+
+    format: str
+    width: int
+    height: int
+    frames: int = 1
+
+
+class UploadError(ValueError):
+    """An upload was rejected before it was decoded."""
+
+
+class PayloadTooLarge(UploadError):
+    """An upload exceeds a byte or pixel limit."""
+
+
+def is_image_upload(content_type: str | None, filename: str | None) -> bool:
+    """Tell whether an upload should be treated as an image (DICOM included)."""
+    if content_type and content_type.startswith("image/"):
+        return True
+    if content_type in DICOM_CONTENT_TYPES:
+        return True
+    return PurePosixPath(filename or "").suffix.lower() == ".dcm"
+
+
+def sniff_format(head: bytes) -> str | None:
+    """
+    Identify an image format by its leading bytes.
+
+    Args:
+        head: The first bytes of the file (132 cover the DICOM preamble).
+
+    Returns:
+        The Pillow format name ("DICOM" for DICOM files), or None if the
+        signature is not supported.
+    """
+    for offset, signature, image_format in MAGIC_BYTES:
+        if head[offset : offset + len(signature)] == signature:
+            return image_format
+    return None
+
+
+async def read_upload(file: UploadFile, max_bytes: int, chunk_size: int) -> bytes:
+    """
+    Read an uploaded file into memory, giving up once it exceeds a limit.
+
+    Args:
+        file: The multipart file (already spooled by Starlette).
+        max_bytes: Largest accepted size.
+        chunk_size: Bytes read per step.
+
+    Returns:
+        The file content.
+
+    Raises:
+        PayloadTooLarge: If the file is larger than ``max_bytes``.
+    """
+    name = file.filename or "upload"
+    # Размер известен после разбора multipart - отказываем, не читая файл
+    if file.size is not None and file.size > max_bytes:
+        raise PayloadTooLarge(f"{name}: file exceeds {max_bytes} bytes")
+
+    buffer = bytearray()
+    while chunk := await file.read(chunk_size):
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise PayloadTooLarge(f"{name}: file exceeds {max_bytes} bytes")
+    return bytes(buffer)
+
+
+def _inspect_pillow(content: bytes, image_format: str, name: str) -> ImageHeader:
+    """Read the image dimensions with Pillow's lazy open (header only)."""
+    try:
+        with warnings.catch_warnings():
+            # Лимит пикселей проверяем сами, предупреждение Pillow не нужно
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(content), formats=[image_format]) as image:
+                width, height = image.size
+    except Image.DecompressionBombError as e:
+        raise PayloadTooLarge(f"{name}: {e}") from e
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise UploadError(f"{name}: corrupt {image_format} header") from e
+    return ImageHeader(image_format, width, height)
+
+
+def _inspect_dicom(content: bytes, name: str) -> ImageHeader:
+    """Read the image dimensions and frame count from a DICOM header."""
+    try:
+        from pydicom import dcmread
+        from pydicom.errors import InvalidDicomError
+    except ImportError as e:
+        raise UploadError(f"{name}: DICOM support is not installed") from e
+
+    try:
+        dataset = dcmread(
+            io.BytesIO(content),
+            stop_before_pixels=True,
+            specific_tags=["Rows", "Columns", "NumberOfFrames"],
+        )
+        width, height = int(dataset.Columns), int(dataset.Rows)
+        frames = int(dataset.get("NumberOfFrames") or 1)
+    except (InvalidDicomError, AttributeError, ValueError, OSError) as e:
+        raise UploadError(f"{name}: corrupt DICOM header or no image") from e
+    return ImageHeader("DICOM", width, height, frames)
+
+
+def inspect_image(content: bytes, max_pixels: int, name: str = "upload") -> ImageHeader:
+    """
+    Check an image without decoding its pixels.
+
+    Args:
+        content: Raw image bytes.
+        max_pixels: Largest accepted width * height (per frame).
+        name: File name used in error messages.
+
+    Returns:
+        The format, dimensions and frame count from the header.
+
+    Raises:
+        UploadError: If the bytes are not a supported image or the header
+            cannot be parsed.
+        PayloadTooLarge: If the header declares more than ``max_pixels``.
+    """
+    image_format = sniff_format(content[:132])
+    if image_format is None:
+        raise UploadError(f"{name}: unsupported or unrecognized image format")
+
+    if image_format == "DICOM":
+        header = _inspect_dicom(content, name)
+    else:
+        header = _inspect_pillow(content, image_format, name)
+
+    if header.width * header.height > max_pixels:
+        raise PayloadTooLarge(
+            f"{name}: {header.width}x{header.height} image exceeds "
+            f"{max_pixels} pixels"
+        )
+    return header
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware that caps the size of request bodies.
+
+    Requests whose Content-Length exceeds the limit are answered with 413
+    before the body is read; chunked bodies are cut off once they grow past
+    it.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds {self.max_bytes} bytes"
+        length = Headers(scope=scope).get("content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,31 @@
+"""
+Celery application for asynchronous prediction jobs.
+
+Start a worker with::
+
+    celery -A app.worker worker --loglevel=INFO
+"""
+
+from celery import Celery
+
+from app.core.config import settings
+
+celery_app = Celery(
+    "lungcheck",
+    broker=settings.celery.broker_url,
+    backend=settings.celery.result_backend,
+    include=["app.worker.tasks"],
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    result_expires=settings.celery.result_expires,
+    task_always_eager=settings.celery.task_always_eager,
+    task_store_eager_result=True,
+    task_track_started=True,
+    # Инференс тяжелый: берем по одной задаче и подтверждаем после выполнения
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+)
@@ -0,0 +1,85 @@
+"""
+Celery tasks that run the pneumonia model outside the web process.
+"""
+
+import asyncio
+import base64
+import logging
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.models import Prediction
+from app.core.prediction_stats import record_stats
+from app.core.prediction_writer import PredictionRow
+from app.worker.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+async def save_prediction(prediction: Prediction) -> None:
+    """
+    Persist a prediction row from a worker process.
+
+    Each task runs in its own event loop, so a short-lived engine without a
+    connection pool is used instead of the API's shared one.
+    """
+    engine = create_async_engine(str(settings.db.url), poolclass=NullPool)
+    row: PredictionRow = {
+        "filename": prediction.filename,
+        "prediction": prediction.prediction,
+        "confidence": prediction.confidence,
+        "created_at": prediction.created_at,
+        "model_version": prediction.model_version,
+    }
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(Prediction.__table__.insert(), row)
+            await record_stats(conn, [row])
+    finally:
+        await engine.dispose()
+
+
+@celery_app.task(name="lungcheck.predict_image")
+def predict_image(content_b64: str, filename: str) -> dict[str, str | float | None]:
+    """
+    Score one image and store the result.
+
+    Args:
+        content_b64: Base64-encoded raw image bytes.
+        filename: Original name of the uploaded file.
+
+    Returns:
+        The fields of PneumoniaPredictionResponse, JSON-serializable.
+    """
+    # torch нужен только воркеру: API импортирует задачу, чтобы ее отправить
+    from app.core.ml.batcher import forward_batch
+    from app.core.ml.model_loader import CLASS_NAMES, model_loader
+    from app.utils.image_processor import image_processor
+
+    # Модель грузится один раз на процесс воркера
+    model = model_loader.model or model_loader.load_model()
+
+    content = base64.b64decode(content_b64)
+    input_tensor = image_processor.process_image(content)
+    result = forward_batch(model, input_tensor)[0]
+
+    prediction = Prediction(
+        filename=filename,
+        prediction=CLASS_NAMES[result.class_index],
+        confidence=result.confidence,
+        created_at=datetime.now(),
+        model_version=model_loader.version,
+    )
+    asyncio.run(save_prediction(prediction))
+
+    logger.info("Job scored %s as %s", filename, prediction.prediction)
+    return {
+        "filename": prediction.filename,
+        "prediction": prediction.prediction,
+        "confidence": round(prediction.confidence * 100, 2),
+        "timestamp": prediction.created_at.isoformat(),
+        "model_version": prediction.model_version,
+    }
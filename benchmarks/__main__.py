@@ -0,0 +1,68 @@
+"""
+Run the benchmark suite and write the results to one JSON file.
+
+Usage::
+
+    python -m benchmarks [--suites preprocessing,inference,load] [--quick]
+        [--output benchmarks/results/<commit>.json]
+
+Compare two result files with ``python -m benchmarks.compare OLD NEW``.
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any
+
+from benchmarks import imports, inference, load, preprocessing
+from benchmarks.common import PROJECT_ROOT, environment, write_results
+
+SUITES = ("imports", "preprocessing", "inference", "load")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument(
+        "--quick", action="store_true", help="fewer sizes, repeats and requests"
+    )
+    parser.add_argument("--db-url", help="database for the load test (default: SQLite)")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    env = environment()
+    results: dict[str, Any] = {"environment": env, "quick": args.quick}
+    suites = args.suites.split(",")
+
+    if "imports" in suites:
+        results["imports"] = imports.run(repeat=1 if args.quick else 3)
+    if "preprocessing" in suites:
+        results["preprocessing"] = preprocessing.run(
+            sizes=((512, 512), (2000, 2500)) if args.quick else preprocessing.SIZES,
+            count=4 if args.quick else 8,
+            repeat=2 if args.quick else 3,
+        )
+    if "inference" in suites:
+        results["inference"] = inference.run(
+            batch_sizes=(1, 8, 32) if args.quick else inference.BATCH_SIZES,
+            repeat=3 if args.quick else 10,
+        )
+    if "load" in suites:
+        results["load"] = asyncio.run(
+            load.run_load(
+                requests=64 if args.quick else 500,
+                concurrency=8 if args.quick else 32,
+                db_url=args.db_url,
+            )
+        )
+
+    name = f"{(env['commit'] or 'local')[:12]}.json"
+    output = args.output or PROJECT_ROOT / "benchmarks" / "results" / name
+    write_results(output, results)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
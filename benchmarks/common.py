@@ -0,0 +1,103 @@
+"""
+Shared helpers of the benchmark suite: timing, summaries and JSON output.
+"""
+
+import os
+import platform
+import subprocess
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_samples: list[float], q: float) -> float:
+    """Linear-interpolated percentile of already sorted samples (q in 0..100)."""
+    if not sorted_samples:
+        return float("nan")
+    position = (len(sorted_samples) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    weight = position - lower
+    return sorted_samples[lower] * (1 - weight) + sorted_samples[upper] * weight
+
+
+def summarize(seconds: list[float]) -> dict[str, float]:
+    """
+    Latency summary in milliseconds.
+
+    Args:
+        seconds: Individual measurements in seconds.
+
+    Returns:
+        count, mean, min, p50, p95, p99 and max (ms).
+    """
+    samples = sorted(s * 1000 for s in seconds)
+    return {
+        "count": len(samples),
+        "mean_ms": sum(samples) / len(samples) if samples else float("nan"),
+        "min_ms": samples[0] if samples else float("nan"),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": samples[-1] if samples else float("nan"),
+    }
+
+
+def time_calls(fn: Callable[[], object], repeat: int, warmup: int = 1) -> list[float]:
+    """Wall time of ``repeat`` calls of ``fn`` (after ``warmup`` untimed calls)."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def git_commit() -> str | None:
+    """Commit the benchmark ran on, or None outside a git checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def environment() -> dict[str, Any]:
+    """Versions and hardware facts that make results comparable."""
+    import numpy as np
+    import PIL
+    import torch
+
+    return {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+    }
+
+
+def write_results(path: Path, results: dict[str, Any]) -> None:
+    """Write results as indented JSON (NaN-free, sorted keys)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(
+        orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    )
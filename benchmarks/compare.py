@@ -0,0 +1,83 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Matches preprocessing cases by format and size, inference cases by runtime
+and batch size, and compares median latencies (and load-test throughput).
+Exits with status 1 when anything got slower than ``--threshold``.
+
+Usage::
+
+    python -m benchmarks.compare OLD.json NEW.json [--threshold 0.10]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+
+def latency_rows(results: dict[str, Any]) -> dict[str, float]:
+    """Flatten the results into ``metric name -> milliseconds`` (lower is better)."""
+    rows: dict[str, float] = {}
+    for case in results.get("imports", []):
+        rows[f"import {case['module']}"] = case["import_ms"]
+    for case in results.get("preprocessing", []):
+        if "format" in case:
+            key = f"preprocess {case['format']} {case['width']}x{case['height']}"
+            rows[key] = case["per_image"]["process_images"]["p50_ms"]
+    for case in results.get("inference", []):
+        if "error" not in case:
+            key = f"inference {case['runtime']} batch={case['batch_size']}"
+            rows[key] = case["latency"]["p50_ms"]
+    if "load" in results:
+        rows["load p50"] = results["load"]["latency"]["p50_ms"]
+        rows["load p95"] = results["load"]["latency"]["p95_ms"]
+        rows["load p99"] = results["load"]["latency"]["p99_ms"]
+        # Пропускная способность: больше - лучше, сравниваем обратную величину
+        rows["load ms/request"] = 1000 / results["load"]["requests_per_second"]
+    return rows
+
+
+def compare(
+    old: dict[str, Any], new: dict[str, Any]
+) -> list[tuple[str, float, float, float]]:
+    """
+    Relative change of every metric present in both runs.
+
+    Returns:
+        (metric, old ms, new ms, relative change) rows, slowest change first.
+    """
+    before, after = latency_rows(old), latency_rows(new)
+    changes = [
+        (name, before[name], after[name], after[name] / before[name] - 1)
+        for name in before.keys() & after.keys()
+        if before[name] > 0
+    ]
+    return sorted(changes, key=lambda row: row[3], reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    old = orjson.loads(args.old.read_bytes())
+    new = orjson.loads(args.new.read_bytes())
+    changes = compare(old, new)
+
+    regressions = 0
+    for name, before, after, change in changes:
+        flag = "REGRESSION" if change > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{name:<45} {before:10.2f} -> {after:10.2f} ms {change:+7.1%} {flag}")
+
+    if regressions:
+        sys.exit(f"{regressions} metric(s) slower than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
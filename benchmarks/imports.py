@@ -0,0 +1,107 @@
+"""
+Import-time budget of the entry points.
+
+Imports each module in a fresh interpreter with ``-X importtime``, reports
+the cumulative time and checks that DB-only entry points (Alembic, the
+Celery app, the models) do not load the ML stack. Exits with status 1 when
+a budget is exceeded or a forbidden module is loaded.
+
+Usage::
+
+    python -m benchmarks.imports [--repeat N] [--scale 1.0]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Any
+
+import orjson
+
+from benchmarks.common import PROJECT_ROOT
+
+ML_MODULES = ("torch", "torchvision", "PIL", "numpy", "onnxruntime", "pydicom")
+
+# Модуль -> (бюджет в мс, модули, которых при импорте быть не должно)
+BUDGETS: dict[str, tuple[float, tuple[str, ...]]] = {
+    "app.core.config": (1000, ML_MODULES),
+    "app.core": (1500, ML_MODULES),
+    "app.core.models": (1500, ML_MODULES),
+    "app.worker": (2000, ML_MODULES),
+    "app.main": (2500, ("torch", "torchvision", "numpy", "onnxruntime", "pydicom")),
+}
+
+
+def import_profile(module: str) -> tuple[float, set[str]]:
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        Cumulative import time in milliseconds and the names of all modules
+        that were imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ | {"PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imported.add(name.strip())
+        # Верхний уровень дерева импортов - без отступа перед именем
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative)
+    return total_us / 1000, imported
+
+
+def run(repeat: int = 3, scale: float = 1.0) -> list[dict[str, Any]]:
+    """
+    Profile every entry point of :data:`BUDGETS`.
+
+    Args:
+        repeat: Fresh imports per module; the fastest one is reported.
+        scale: Multiplier applied to all budgets (slow CI machines).
+
+    Returns:
+        One result per module with its time, budget and forbidden modules
+        that were loaded anyway.
+    """
+    results = []
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        profiles = [import_profile(module) for _ in range(repeat)]
+        best_ms = min(ms for ms, _ in profiles)
+        loaded = sorted(set(forbidden) & profiles[0][1])
+        results.append(
+            {
+                "module": module,
+                "import_ms": best_ms,
+                "budget_ms": budget_ms * scale,
+                "forbidden_loaded": loaded,
+                "ok": best_ms <= budget_ms * scale and not loaded,
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.scale)
+    print(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode())
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Forward-pass latency of every runtime variant across batch sizes.
+
+Builds the model the way ``ModelLoader`` does (trained weights when present,
+an untrained ResNet18 otherwise), derives each runtime variant from it and
+times ``forward_batch`` (forward + softmax) on random inputs.
+
+Usage::
+
+    python -m benchmarks.inference [--runtimes eager,dynamic_int8,...]
+        [--batch-sizes 1,2,4,...,64] [--repeat N]
+"""
+
+import argparse
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import orjson
+import torch
+
+from app.core.ml.batcher import forward_batch
+from app.core.ml.model_loader import ModelLoader
+from app.core.ml.variants import build_variant
+from benchmarks.common import summarize, time_calls
+
+RUNTIMES = ("eager", "dynamic_int8", "static_int8", "torchscript", "onnx")
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def onnx_backend(model: torch.nn.Module) -> Callable[[torch.Tensor], torch.Tensor]:
+    """Export ``model`` to a temporary ONNX file and open it in ONNX Runtime."""
+    from app.core.ml.backends import OnnxBackend
+    from app.core.ml.export_onnx import export_onnx
+
+    directory = Path(tempfile.mkdtemp(prefix="lungcheck-bench-"))
+    weights = directory / "model.pth"
+    torch.save(model.state_dict(), weights)
+    path = export_onnx(weights, directory / "model.onnx")
+    return OnnxBackend(path, intra_op_threads=torch.get_num_threads())
+
+
+def run(
+    runtimes: tuple[str, ...] = RUNTIMES,
+    batch_sizes: tuple[int, ...] = BATCH_SIZES,
+    repeat: int = 10,
+) -> list[dict[str, Any]]:
+    """
+    Time each runtime at each batch size.
+
+    Runtimes whose dependencies are missing (ONNX Runtime) or that fail to
+    build on this machine are reported with an ``error`` instead.
+
+    Returns:
+        One result per (runtime, batch size), latency per batch and per
+        image, and images per second at the median latency.
+    """
+    loader = ModelLoader()
+    loader.device = torch.device("cpu")
+    model = loader.load_float_model()
+    calibration = torch.randn(
+        8, 3, 224, 224, generator=torch.Generator().manual_seed(0)
+    )
+
+    results: list[dict[str, Any]] = []
+    for runtime in runtimes:
+        try:
+            if runtime == "onnx":
+                variant = onnx_backend(model)
+            else:
+                variant = build_variant(model, runtime, False, calibration)
+        except Exception as e:
+            results.append({"runtime": runtime, "error": repr(e)})
+            continue
+
+        for batch_size in batch_sizes:
+            batch = torch.randn(batch_size, 3, 224, 224)
+            timings = time_calls(
+                lambda v=variant, b=batch: forward_batch(v, b), repeat, 2
+            )
+            latency = summarize(timings)
+            results.append(
+                {
+                    "runtime": runtime,
+                    "model_version": loader.version,
+                    "batch_size": batch_size,
+                    "latency": latency,
+                    "ms_per_image": latency["p50_ms"] / batch_size,
+                    "images_per_second": batch_size * 1000 / latency["p50_ms"],
+                }
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runtimes", default=",".join(RUNTIMES))
+    parser.add_argument(
+        "--batch-sizes", default=",".join(str(size) for size in BATCH_SIZES)
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    results = run(
+        tuple(args.runtimes.split(",")),
+        tuple(int(size) for size in args.batch_sizes.split(",")),
+        args.repeat,
+    )
+    print(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+End-to-end load generator against the ASGI app.
+
+Runs the real application in-process (lifespan, model, preprocessing,
+batcher, write-behind writer) through ``httpx.ASGITransport`` and fires
+``--requests`` uploads at ``POST /predict`` with ``--concurrency`` clients.
+The database is a SQLite file by default, or any async SQLAlchemy URL (e.g.
+a local Postgres) via ``--db-url``; tables are created if missing.
+
+Usage::
+
+    python -m benchmarks.load [--requests N] [--concurrency C] [--db-url URL]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from collections import Counter
+from typing import Any
+
+import orjson
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.common import summarize
+from benchmarks.preprocessing import synthetic_images
+
+PREDICT_PATH = "/api/v1/lungcheck/predict"
+
+
+async def run_load(
+    requests: int = 200,
+    concurrency: int = 16,
+    distinct_images: int = 32,
+    image_size: tuple[int, int] = (1024, 1024),
+    db_url: str | None = None,
+    cache: bool = False,
+) -> dict[str, Any]:
+    """
+    Serve ``requests`` predictions with ``concurrency`` concurrent clients.
+
+    Args:
+        requests: Total number of requests.
+        concurrency: Clients sending requests back to back.
+        distinct_images: Distinct JPEGs cycled through by the clients.
+        image_size: Width and height of the synthetic JPEGs.
+        db_url: Async SQLAlchemy URL (default: a temporary SQLite file).
+        cache: Keep the prediction cache on; off by default so every
+            request runs the whole pipeline.
+
+    Returns:
+        Latency percentiles, requests per second and status code counts.
+    """
+    from app.core import db_helper, settings
+    from app.core.db_helper import DatabaseHelper
+    from app.core.models.base import Base
+    from app.create_fastapi_app import create_app, lifespan
+
+    if db_url is None:
+        db_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    database = DatabaseHelper(db_url, echo=False, echo_pool=False)
+    async with database.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    # Подменяем движок синглтона: на него завязаны зависимости и writer
+    db_helper.engine = database.engine
+    db_helper.session_factory = database.session_factory
+    settings.cache.enabled = cache
+
+    width, height = image_size
+    images = synthetic_images(distinct_images, height, width)
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+    counter = iter(range(requests))
+
+    app = create_app()
+    async with lifespan(app):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://bench", timeout=None
+        ) as client:
+
+            async def worker() -> None:
+                for i in counter:
+                    files = {"file": (f"bench_{i}.jpg", images[i % len(images)])}
+                    start = time.perf_counter()
+                    response = await client.post(PREDICT_PATH, files=files)
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "image_size": list(image_size),
+        "database": db_url.split("://", 1)[0],
+        "cache": cache,
+        "latency": summarize(latencies),
+        "requests_per_second": requests / elapsed,
+        "elapsed_seconds": elapsed,
+        "status_codes": {str(code): count for code, count in statuses.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--distinct-images", type=int, default=32)
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--db-url", help="async SQLAlchemy URL (default: SQLite)")
+    parser.add_argument("--cache", action="store_true")
+    args = parser.parse_args()
+
+    result = asyncio.run(
+        run_load(
+            args.requests,
+            args.concurrency,
+            args.distinct_images,
+            (args.image_size, args.image_size),
+            args.db_url,
+            args.cache,
+        )
+    )
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    main()
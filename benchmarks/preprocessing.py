@@ -0,0 +1,214 @@
+"""
+Benchmark of the image preprocessing path against the torchvision reference.
+
+Decodes the same uploads with the reference transform (full decode to RGB,
+Resize, ToTensor, Normalize) and with ``ImageProcessor.process_image`` /
+``process_images``, for every combination of image size and format. Reports
+the time per image and the largest difference between the tensors, and
+exits with status 1 if the difference exceeds ``--tolerance``.
+
+Usage::
+
+    python -m benchmarks.preprocessing [--images DIR] [--sizes 1024x1024,...]
+"""
+
+import argparse
+import io
+import sys
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import orjson
+import torch
+from PIL import Image
+
+from app.utils.image_processor import ImageProcessor, is_dicom
+from benchmarks.common import summarize, time_calls
+
+FORMATS = ("JPEG", "PNG", "DICOM")
+SIZES = ((512, 512), (1024, 1024), (2000, 2500))
+
+
+def xray_pixels(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """8-bit grayscale pattern of roughly chest X-ray texture."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = (
+        128
+        + 60 * np.sin(x / (80 + seed)) * np.cos(y / 130)
+        + rng.normal(0, 10, x.shape)
+    )
+    return pixels.clip(0, 255).astype(np.uint8)
+
+
+def encode_dicom(pixels: np.ndarray) -> bytes:
+    """Uncompressed 12-bit MONOCHROME2 DICOM with a full-range window."""
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import (
+        ExplicitVRLittleEndian,
+        SecondaryCaptureImageStorage,
+        generate_uid,
+    )
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, 12, 11
+    ds.PixelRepresentation = 0
+    ds.WindowCenter, ds.WindowWidth = 2048, 4096
+    ds.PixelData = (pixels.astype(np.uint16) * 16).tobytes()
+
+    buffer = io.BytesIO()
+    ds.save_as(buffer, enforce_file_format=True)
+    return buffer.getvalue()
+
+
+def synthetic_images(
+    count: int, height: int, width: int, image_format: str = "JPEG"
+) -> list[bytes]:
+    """Encoded grayscale images of roughly chest X-ray size and texture."""
+    images = []
+    for i in range(count):
+        pixels = xray_pixels(height, width, seed=i)
+        if image_format == "DICOM":
+            images.append(encode_dicom(pixels))
+            continue
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, "L").save(buffer, image_format, quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def reference_tensor(processor: ImageProcessor, content: bytes) -> torch.Tensor:
+    """The torchvision transform the model was trained with."""
+    if is_dicom(content):
+        # Эталон для DICOM: окно на полном разрешении, затем тот же transform
+        from pydicom import dcmread
+        from pydicom.pixels import apply_voi_lut
+
+        ds = dcmread(io.BytesIO(content))
+        values = apply_voi_lut(ds.pixel_array, ds).astype(np.float32)
+        low, high = 2048 - 0.5 - 4095 / 2, 2048 - 0.5 + 4095 / 2
+        scaled = np.clip((values - low) * 255 / (high - low), 0, 255)
+        image = Image.fromarray(scaled.round().astype(np.uint8), "L").convert("RGB")
+    else:
+        image = Image.open(io.BytesIO(content)).convert("RGB")
+    return processor.transform(image)
+
+
+def benchmark_case(
+    processor: ImageProcessor, contents: list[bytes], repeat: int
+) -> dict[str, Any]:
+    """Time reference, single and batched preprocessing of the same images."""
+
+    def reference() -> torch.Tensor:
+        return torch.stack([reference_tensor(processor, c) for c in contents])
+
+    def single() -> torch.Tensor:
+        return torch.cat([processor.process_image(c) for c in contents])
+
+    def batched() -> torch.Tensor:
+        return processor.process_images(contents)
+
+    diff = (batched() - reference()).abs()
+    per_image = 1 / len(contents)
+    timings = {
+        name: [t * per_image for t in time_calls(fn, repeat)]
+        for name, fn in (
+            ("reference", reference),
+            ("process_image", single),
+            ("process_images", batched),
+        )
+    }
+    return {
+        "images": len(contents),
+        "bytes_per_image": sum(len(c) for c in contents) // len(contents),
+        "per_image": {name: summarize(t) for name, t in timings.items()},
+        "speedup": (
+            summarize(timings["reference"])["p50_ms"]
+            / summarize(timings["process_images"])["p50_ms"]
+        ),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+    }
+
+
+def run(
+    sizes: tuple[tuple[int, int], ...] = SIZES,
+    formats: tuple[str, ...] = FORMATS,
+    count: int = 8,
+    repeat: int = 3,
+) -> list[dict[str, Any]]:
+    """
+    Benchmark preprocessing for every size/format combination.
+
+    DICOM cases are skipped when pydicom is not installed.
+
+    Returns:
+        One result per case, tagged with its format and size.
+    """
+    processor = ImageProcessor()
+    results = []
+    for image_format in formats:
+        if image_format == "DICOM":
+            try:
+                import pydicom  # noqa: F401
+            except ImportError:
+                continue
+        for width, height in sizes:
+            contents = synthetic_images(count, height, width, image_format)
+            case = benchmark_case(processor, contents, repeat)
+            results.append(
+                {"format": image_format, "width": width, "height": height, **case}
+            )
+    return results
+
+
+def parse_sizes(value: str) -> tuple[tuple[int, int], ...]:
+    """Parse ``WxH,WxH`` into (width, height) pairs."""
+    return tuple(
+        (int(w), int(h)) for w, h in (item.split("x") for item in value.split(","))
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=Path, help="directory with real uploads")
+    parser.add_argument("--sizes", type=parse_sizes, default=SIZES)
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument("--count", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.images:
+        paths = sorted(p for p in args.images.rglob("*") if p.is_file())
+        contents = [p.read_bytes() for p in paths[: args.count]]
+        if not contents:
+            sys.exit("No images to benchmark")
+        results = [
+            {"source": str(args.images)}
+            | benchmark_case(ImageProcessor(), contents, args.repeat)
+        ]
+    else:
+        results = run(
+            args.sizes, tuple(args.formats.split(",")), args.count, args.repeat
+        )
+
+    print(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode())
+    if any(case["max_abs_diff"] > args.tolerance for case in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,55 @@
+import io
+import os
+
+# Очередь задач в тестах: in-memory брокер, задачи выполняются сразу
+os.environ.setdefault("APP_CONFIG__CELERY__BROKER_URL", "memory://")
+os.environ.setdefault("APP_CONFIG__CELERY__RESULT_BACKEND", "cache+memory://")
+os.environ.setdefault("APP_CONFIG__CELERY__TASK_ALWAYS_EAGER", "true")
+# Тестовая база - одно общее соединение SQLite, прогревать в ней нечего
+os.environ.setdefault("APP_CONFIG__WARMUP__DB_CONNECTIONS", "0")
+
 import pytest
 import pytest_asyncio
 import torch
 from unittest.mock import MagicMock, patch
 from httpx import AsyncClient, ASGITransport
+from PIL import Image
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.core import db_helper
+from app.core.ml.model_loader import model_loader
+from app.core.models import Prediction
 from app.core.models.base import Base
+from app.create_fastapi_app import lifespan
+from app.utils.image_processor import image_processor
 
 TEST_DB_URL = "sqlite+aiosqlite:///:memory:"
 
+# Одна in-memory база на всю сессию: StaticPool отдает всем одно соединение
+engine = create_async_engine(
+    TEST_DB_URL,
+    poolclass=StaticPool,
+    connect_args={"check_same_thread": False},
+)
+
 
-@pytest_asyncio.fixture(scope="session", autouse=True)
+@pytest_asyncio.fixture(autouse=True)
 async def setup_db():
-    """Создаем таблицы один раз для всей сессии."""
-    engine = create_async_engine(TEST_DB_URL)
+    """Создаем таблицы (идемпотентно) перед каждым тестом."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield
-    await engine.dispose()
+
+
+session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
 
 @pytest_asyncio.fixture
 async def session():
     """Чистая сессия для каждого теста."""
-    engine = create_async_engine(TEST_DB_URL)
-    factory = async_sessionmaker(engine, expire_on_commit=False)
-    async with factory() as s:
+    async with session_factory() as s:
         yield s
 
 
@@ -36,18 +58,93 @@ async def client(session):
     """Клиент с моками ML и БД."""
     app.dependency_overrides[db_helper.session_getter] = lambda: session
 
-    with patch("app.core.ml.model_loader.model_loader.load_model") as mock_load:
+    with (
+        patch.object(db_helper, "session_factory", session_factory),
+        patch.object(model_loader, "load_model") as mock_load,
+    ):
         mock_resnet = MagicMock()
-        mock_resnet.return_value = torch.tensor([[-1.0, 5.0]])
+        mock_resnet.side_effect = lambda x: torch.tensor([[-1.0, 5.0]] * x.shape[0])
         mock_load.return_value = mock_resnet
 
-        with patch("app.utils.image_processor.process_image") as mock_proc:
+        with patch.object(image_processor, "process_image") as mock_proc:
             mock_proc.return_value = torch.randn(1, 3, 224, 224)
 
-            async with AsyncClient(
-                    transport=ASGITransport(app=app),
-                    base_url="http://test"
-            ) as ac:
-                yield ac
+            # ASGITransport не запускает lifespan, поэтому поднимаем его вручную
+            async with lifespan(app):
+                async with AsyncClient(
+                        transport=ASGITransport(app=app),
+                        base_url="http://test"
+                ) as ac:
+                    yield ac
+
+    app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture
+async def predictions(session):
+    """Несколько записей в истории для тестов пагинации."""
+    session.add_all(
+        Prediction(filename=f"seed_{i}.jpg", prediction="NORMAL", confidence=0.9)
+        for i in range(5)
+    )
+    await session.commit()
+
+
+@pytest.fixture
+def make_image():
+    """Фабрика настоящих (маленьких) изображений: проходят проверку заголовка."""
+
+    def _make(value: int = 128, size: tuple[int, int] = (64, 64), fmt: str = "PNG"):
+        buffer = io.BytesIO()
+        Image.new("L", size, value).save(buffer, fmt)
+        return buffer.getvalue()
+
+    return _make
+
+
+@pytest.fixture
+def make_dicom():
+    """Фабрика DICOM-файлов (несжатые 16-битные кадры) в памяти."""
+    pytest.importorskip("pydicom")
+    import numpy as np
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import (
+        ExplicitVRLittleEndian,
+        SecondaryCaptureImageStorage,
+        generate_uid,
+    )
+
+    def _make(
+        pixels: "np.ndarray",
+        photometric: str = "MONOCHROME2",
+        window: tuple[float, float] | None = None,
+        rescale: tuple[float, float] = (1.0, 0.0),
+    ) -> bytes:
+        frames = pixels if pixels.ndim == 3 else pixels[None]
+
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+        ds = Dataset()
+        ds.file_meta = meta
+        ds.SOPClassUID = meta.MediaStorageSOPClassUID
+        ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+        ds.Rows, ds.Columns = frames.shape[1:]
+        if pixels.ndim == 3:
+            ds.NumberOfFrames = frames.shape[0]
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = photometric
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, 12, 11
+        ds.PixelRepresentation = 0
+        ds.RescaleSlope, ds.RescaleIntercept = rescale
+        if window is not None:
+            ds.WindowCenter, ds.WindowWidth = window
+        ds.PixelData = frames.astype(np.uint16).tobytes()
+
+        buffer = io.BytesIO()
+        ds.save_as(buffer, enforce_file_format=True)
+        return buffer.getvalue()
 
-    app.dependency_overrides.clear()
\ No newline at end of file
+    return _make
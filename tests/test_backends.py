@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+import pytest
+import torch
+import torch.nn as nn
+from torchvision import models
+
+from app.core.config import settings
+from app.core.ml.model_loader import ModelLoader
+
+pytest.importorskip("onnxruntime")
+
+
+def test_onnx_backend_matches_pytorch(tmp_path):
+    from app.core.ml.export_onnx import export_onnx
+
+    torch.manual_seed(0)
+    reference = models.resnet18(weights=None)
+    reference.fc = nn.Linear(reference.fc.in_features, 2)
+    weights = tmp_path / "model.pth"
+    torch.save(reference.state_dict(), weights)
+
+    onnx_path = export_onnx(weights, weights.with_suffix(".onnx"))
+
+    with (
+        patch.object(settings.ml_config, "backend", "onnx"),
+        patch.object(settings.ml_config, "onnx_path", str(onnx_path)),
+    ):
+        loader = ModelLoader()
+        backend = loader.load_model()
+
+    assert loader.runtime == "onnx"
+    batch = torch.randn(4, 3, 224, 224)
+    with torch.inference_mode():
+        expected = reference.eval()(batch)
+    assert torch.allclose(backend(batch), expected, atol=1e-4)
+
+
+def test_missing_onnx_export_falls_back_to_pytorch(tmp_path):
+    with (
+        patch.object(settings.ml_config, "backend", "onnx"),
+        patch.object(settings.ml_config, "onnx_path", str(tmp_path / "absent.onnx")),
+    ):
+        loader = ModelLoader()
+        model = loader.load_model()
+
+    assert isinstance(model, nn.Module)
+    assert loader.runtime == "eager"
+
+
+def test_grayscale_onnx_export_is_served_only_in_grayscale_mode(tmp_path):
+    from app.core.ml.export_onnx import export_onnx
+
+    weights = tmp_path / "model.pth"
+    torch.save(models.resnet18(num_classes=2).state_dict(), weights)
+    onnx_path = export_onnx(weights, weights.with_suffix(".onnx"), grayscale=True)
+
+    def load(grayscale: bool) -> tuple[ModelLoader, object]:
+        with (
+            patch.object(settings.ml_config, "backend", "onnx"),
+            patch.object(settings.ml_config, "onnx_path", str(onnx_path)),
+            patch.object(settings.ml_config, "grayscale", grayscale),
+        ):
+            loader = ModelLoader()
+            return loader, loader.load_model()
+
+    loader, backend = load(grayscale=True)
+    assert loader.runtime == "onnx+grayscale"
+    assert backend(torch.rand(2, 1, 224, 224) * 255).shape == (2, 2)
+
+    # RGB-режим не может обслуживать одноканальный граф
+    loader, _ = load(grayscale=False)
+    assert loader.runtime == "eager"
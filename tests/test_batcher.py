@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+import torch
+
+from app.core.ml.batcher import InferenceBatcher
+from app.core.ml.executor import InferenceExecutor
+
+
+class RecordingModel:
+    """Фейковая модель: логиты зависят от входа, размеры батчей запоминаются."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, x):
+        self.batch_sizes.append(x.shape[0])
+        first = x[:, 0, 0, 0]
+        return torch.stack([first, -first], dim=1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_forward_pass():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=8, max_wait_ms=50)
+    batcher.start()
+
+    inputs = [torch.full((1, 3, 4, 4), float(v)) for v in (-2, 3, -1, 4)]
+    results = await asyncio.gather(*(batcher.predict(t) for t in inputs))
+    await batcher.stop()
+
+    assert model.batch_sizes == [4]
+    assert [r.class_index for r in results] == [1, 0, 1, 0]
+    assert all(0.5 <= r.confidence <= 1.0 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_batch_is_flushed_at_max_size():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=2, max_wait_ms=1000)
+    batcher.start()
+
+    inputs = [torch.zeros(1, 3, 4, 4) for _ in range(5)]
+    await asyncio.wait_for(
+        asyncio.gather(*(batcher.predict(t) for t in inputs)), timeout=5
+    )
+    await batcher.stop()
+
+    assert model.batch_sizes[:2] == [2, 2]
+    assert sum(model.batch_sizes) == 5
+
+
+@pytest.mark.asyncio
+async def test_multi_row_submission_never_overflows_batch():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=4, max_wait_ms=50)
+    batcher.start()
+
+    # Вторая отправка не помещается к первой и открывает следующий батч
+    inputs = [torch.zeros(3, 3, 4, 4), torch.zeros(3, 3, 4, 4)]
+    results = await asyncio.gather(*(batcher.submit(t) for t in inputs))
+    await batcher.stop()
+
+    assert [len(r) for r in results] == [3, 3]
+    assert model.batch_sizes == [3, 3]
+    assert max(model.batch_sizes) <= batcher.max_batch_size
+
+
+@pytest.mark.asyncio
+async def test_draining_stop_serves_batch_being_collected():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=8, max_wait_ms=1000)
+    batcher.start()
+
+    inputs = [torch.full((1, 3, 4, 4), float(v)) for v in (-2, 3)]
+    pending = asyncio.gather(*(batcher.predict(t) for t in inputs))
+    # Обе отправки уже вынуты из очереди: _collect ждет добора батча
+    while batcher.queue_depth:
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(batcher.stop(drain=True), timeout=0.5)
+    results = await pending
+
+    assert model.batch_sizes == [2]
+    assert [r.class_index for r in results] == [1, 0]
+    with pytest.raises(RuntimeError):
+        await batcher.predict(inputs[0])
+
+
+@pytest.mark.asyncio
+async def test_forward_pass_runs_in_thread_pool():
+    import threading
+
+    main_thread = threading.get_ident()
+    seen_threads = set()
+
+    def model(x):
+        seen_threads.add(threading.get_ident())
+        return torch.zeros(x.shape[0], 2)
+
+    executor = InferenceExecutor(kind="thread", max_workers=2, torch_threads=1)
+    executor.start()
+    batcher = InferenceBatcher(
+        model, max_batch_size=4, max_wait_ms=1, executor=executor
+    )
+    batcher.start()
+
+    results = await asyncio.gather(
+        *(batcher.predict(torch.zeros(1, 3, 4, 4)) for _ in range(6))
+    )
+    await batcher.stop()
+    executor.shutdown()
+
+    assert len(results) == 6
+    assert seen_threads and main_thread not in seen_threads
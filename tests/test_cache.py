@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.ml.cache import CachedPrediction, PredictionCache
+
+
+def test_key_depends_on_content_and_model_version():
+    key = PredictionCache.make_key(b"image", "v1", "eager")
+    assert key == PredictionCache.make_key(b"image", "v1", "eager")
+    assert key != PredictionCache.make_key(b"image", "v2", "eager")
+    assert key != PredictionCache.make_key(b"other", "v1", "eager")
+
+
+def test_key_depends_on_runtime():
+    # Те же веса в другом варианте дают немного другие вероятности
+    keys = {
+        PredictionCache.make_key(b"image", "v1", runtime)
+        for runtime in ("eager", "dynamic_int8", "onnx", "eager+grayscale")
+    }
+    assert len(keys) == 4
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(max_entries=2, ttl_seconds=60)
+    value = CachedPrediction(prediction="NORMAL", confidence=0.9)
+
+    await cache.set("a", value)
+    await cache.set("b", value)
+    assert await cache.get("a") == value  # "a" становится самым свежим
+    await cache.set("c", value)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == value
+    assert cache.stats.size == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    cache = PredictionCache(max_entries=10, ttl_seconds=5)
+    value = CachedPrediction(prediction="PNEUMONIA", confidence=0.7)
+
+    with patch("app.core.ml.cache.time.monotonic", return_value=100.0):
+        await cache.set("a", value)
+    with patch("app.core.ml.cache.time.monotonic", return_value=106.0):
+        assert await cache.get("a") is None
+
+    assert cache.stats.misses == 1
@@ -3,8 +3,8 @@ from io import BytesIO
 
 
 @pytest.mark.asyncio
-async def test_predict_success(client):
-    file_content = b"fake_image_bytes"
+async def test_predict_success(client, make_image):
+    file_content = make_image(fmt="JPEG")
     files = {"file": ("lung.jpg", BytesIO(file_content), "image/jpeg")}
 
     response = await client.post("/api/v1/lungcheck/predict", files=files)
@@ -27,6 +27,138 @@ async def test_history_is_working(client):
     (5, 5),
     (0, 0),
 ])
-async def test_history_pagination(client, limit, expected_count):
+async def test_history_pagination(client, predictions, limit, expected_count):
     response = await client.get(f"/api/v1/lungcheck/history?limit={limit}")
-    assert len(response.json()) == expected_count
\ No newline at end of file
+    assert len(response.json()) == expected_count
+
+@pytest.mark.asyncio
+async def test_repeated_upload_is_served_from_cache(client, make_image):
+    for _ in range(2):
+        files = {"file": ("same.jpg", BytesIO(make_image(7)), "image/jpeg")}
+        response = await client.post("/api/v1/lungcheck/predict", files=files)
+        assert response.status_code == 200
+        assert response.json()["prediction"] == "PNEUMONIA"
+
+    stats = (await client.get("/api/v1/lungcheck/cache/stats")).json()
+    assert stats["enabled"] is True
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_predict_multiple_files(client, make_image):
+    files = [
+        ("files", (f"study_{i}.jpg", BytesIO(make_image(i)), "image/jpeg"))
+        for i in range(3)
+    ]
+
+    response = await client.post("/api/v1/lungcheck/predict/batch", files=files)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["filename"] for item in data] == [f"study_{i}.jpg" for i in range(3)]
+    assert all(item["prediction"] == "PNEUMONIA" for item in data)
+
+
+@pytest.mark.asyncio
+async def test_batch_predict_zip_archive(client, make_image):
+    import zipfile
+
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("pa.png", make_image(1))
+        zf.writestr("lateral.png", make_image(2))
+        zf.writestr("__MACOSX/._pa.png", b"junk")
+        zf.writestr("notes.txt", b"not an image")
+    archive.seek(0)
+
+    files = [("files", ("study.zip", archive, "application/zip"))]
+    response = await client.post("/api/v1/lungcheck/predict/batch", files=files)
+
+    assert response.status_code == 200
+    assert [item["filename"] for item in response.json()] == ["pa.png", "lateral.png"]
+
+
+@pytest.mark.asyncio
+async def test_batch_predict_rejects_non_images(client):
+    files = [("files", ("notes.txt", BytesIO(b"hello"), "text/plain"))]
+    response = await client.post("/api/v1/lungcheck/predict/batch", files=files)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_history_keyset_pagination_walks_all_rows(client, session, predictions):
+    from sqlalchemy import func, select
+
+    from app.core.models import Prediction
+
+    expected = (
+        await session.execute(
+            select(func.count()).where(
+                Prediction.prediction == "NORMAL", Prediction.confidence <= 0.95
+            )
+        )
+    ).scalar_one()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "label": "NORMAL", "max_confidence": 0.95}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/v1/lungcheck/history", params=params)
+        assert response.status_code == 200
+        seen.extend(item["filename"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert len(seen) == expected >= 5
+
+
+@pytest.mark.asyncio
+async def test_history_filters_and_limits(client, predictions):
+    response = await client.get(
+        "/api/v1/lungcheck/history", params={"label": "PNEUMONIA", "min_confidence": 1}
+    )
+    assert response.json() == []
+
+    response = await client.get("/api/v1/lungcheck/history", params={"limit": 10_000})
+    assert response.status_code == 422
+
+    response = await client.get("/api/v1/lungcheck/history", params={"cursor": "%%%"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_predict_scores_every_dicom_frame(client, make_dicom):
+    import numpy as np
+
+    from app.utils.image_processor import ImageProcessor, image_processor
+
+    # Настоящая предобработка: число строк тензора = числу кадров
+    image_processor.process_image.side_effect = ImageProcessor().process_image
+    frames = np.random.default_rng(0).integers(0, 4096, (3, 64, 64))
+    files = [("files", ("ct.dcm", BytesIO(make_dicom(frames)), "application/dicom"))]
+
+    response = await client.post("/api/v1/lungcheck/predict/batch", files=files)
+
+    assert response.status_code == 200
+    assert [item["filename"] for item in response.json()] == [
+        "ct.dcm#1",
+        "ct.dcm#2",
+        "ct.dcm#3",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_predict_sends_multiframe_dicom_to_batch(client, make_dicom):
+    import numpy as np
+
+    content = make_dicom(np.zeros((2, 32, 32), dtype=np.uint16))
+    files = {"file": ("ct.dcm", BytesIO(content), "application/dicom")}
+
+    response = await client.post("/api/v1/lungcheck/predict", files=files)
+
+    assert response.status_code == 400
+    assert "/predict/batch" in response.json()["detail"]
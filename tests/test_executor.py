@@ -0,0 +1,24 @@
+import pytest
+import torch
+import torch.nn as nn
+
+from app.core.ml.executor import InferenceExecutor
+
+
+@pytest.mark.asyncio
+async def test_process_workers_share_model_weights():
+    torch.manual_seed(0)
+    model = nn.Sequential(nn.Flatten(), nn.Linear(3 * 4 * 4, 2)).eval()
+    batch = torch.randn(3, 3, 4, 4)
+    with torch.inference_mode():
+        expected = torch.softmax(model(batch), dim=1)
+
+    executor = InferenceExecutor(kind="process", max_workers=1, torch_threads=1)
+    executor.start(model=model)
+    try:
+        results = await executor.infer(model, batch)
+    finally:
+        executor.shutdown()
+
+    assert all(p.is_shared() for p in model.parameters())
+    assert torch.allclose(torch.stack([r.probabilities for r in results]), expected)
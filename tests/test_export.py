@@ -0,0 +1,64 @@
+import csv
+import io
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import orjson
+import pytest
+from sqlalchemy import func, select
+
+from app.core import settings
+from app.core.models import Prediction
+
+EXPORT_URL = "/api/v1/lungcheck/history/export"
+
+
+async def count(session, *conditions) -> int:
+    stmt = select(func.count()).select_from(Prediction).where(*conditions)
+    return (await session.execute(stmt)).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_export_streams_ndjson_in_chunks(client, session, predictions):
+    expected = await count(session)
+
+    # Маленькие чанки: строки приходят несколькими порциями из курсора
+    with patch.object(settings.history, "export_chunk_size", 2):
+        response = await client.get(EXPORT_URL)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [orjson.loads(line) for line in response.content.splitlines()]
+    assert len(rows) == expected >= 5
+    assert [r["id"] for r in rows] == sorted(r["id"] for r in rows)
+    assert set(rows[0]) == {
+        "id",
+        "filename",
+        "prediction",
+        "confidence",
+        "created_at",
+        "model_version",
+    }
+    datetime.fromisoformat(rows[0]["created_at"])
+
+
+@pytest.mark.asyncio
+async def test_export_csv_applies_filters(client, session, predictions):
+    session.add(Prediction(filename="export.jpg", prediction="PNEUMONIA", confidence=1))
+    await session.commit()
+    expected = await count(session, Prediction.prediction == "PNEUMONIA")
+
+    response = await client.get(
+        EXPORT_URL, params={"format": "csv", "label": "PNEUMONIA"}
+    )
+
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == expected >= 1
+    assert {r["prediction"] for r in rows} == {"PNEUMONIA"}
+
+    future = (datetime.now() + timedelta(days=1)).isoformat()
+    response = await client.get(EXPORT_URL, params={"format": "csv", "since": future})
+    assert response.text.splitlines() == [
+        "id,filename,prediction,confidence,created_at,model_version"
+    ]
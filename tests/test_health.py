@@ -0,0 +1,118 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+import torch
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.ml.executor import InferenceExecutor
+from app.core.ml.model_loader import model_loader
+from app.core.warmup import default_batch_sizes, warm_up, warm_up_database
+from app.create_fastapi_app import lifespan
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_live(client):
+    response = await client.get("/health/live")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+
+@pytest.mark.asyncio
+async def test_ready_after_warmup(client):
+    await app.state.warmup
+
+    response = await client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+@pytest.mark.asyncio
+async def test_not_ready_while_warming_up():
+    release = asyncio.Event()
+
+    async def slow_warm_up(*args, **kwargs) -> bool:
+        await release.wait()
+        return True
+
+    with (
+        patch("app.core.warmup.warm_up", slow_warm_up),
+        patch.object(model_loader, "load_model", return_value=MagicMock()),
+    ):
+        async with lifespan(app):
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                warming = await client.get("/health/ready")
+                assert (await client.get("/health/live")).status_code == 200
+
+                release.set()
+                await app.state.warmup
+                ready = await client.get("/health/ready")
+
+    assert warming.status_code == 503
+    assert warming.json() == {"status": "warming_up"}
+    assert ready.status_code == 200
+    assert app.state.ready is False  # после shutdown трафик больше не принимаем
+
+
+def test_default_batch_sizes():
+    assert default_batch_sizes(1) == [1]
+    assert default_batch_sizes(16) == [1, 2, 4, 8, 16]
+    assert default_batch_sizes(12) == [1, 2, 4, 8, 12]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_database_opens_distinct_connections(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/warmup.db")
+    try:
+        await warm_up_database(async_sessionmaker(engine), connections=3)
+        assert engine.sync_engine.pool.checkedin() == 3
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_runs_every_batch_size():
+    shapes = []
+
+    def model(batch: torch.Tensor) -> torch.Tensor:
+        shapes.append(batch.shape[0])
+        return torch.zeros(batch.shape[0], 2)
+
+    executor = InferenceExecutor(kind="thread", max_workers=2, torch_threads=1)
+    executor.start()
+    try:
+        ok = await warm_up(
+            executor,
+            model,
+            session_factory=MagicMock(),
+            batch_sizes=[1, 4],
+            rounds=2,
+            db_connections=0,
+            timeout_seconds=1,
+        )
+    finally:
+        executor.shutdown()
+
+    assert ok
+    assert sorted(shapes) == [1, 1, 1, 1, 4, 4, 4, 4]
+
+
+@pytest.mark.asyncio
+async def test_failing_model_stays_not_ready():
+    def broken(batch: torch.Tensor) -> torch.Tensor:
+        raise RuntimeError("bad weights")
+
+    executor = InferenceExecutor(kind="thread", max_workers=1, torch_threads=1)
+    executor.start()
+    try:
+        ok = await warm_up(executor, broken, MagicMock(), [1], 1, 0, 1)
+    finally:
+        executor.shutdown()
+
+    assert not ok
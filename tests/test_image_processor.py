@@ -0,0 +1,179 @@
+import io
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from app.utils.image_processor import MEAN, STD, TTA_PRESETS, ImageProcessor
+
+
+def encode(array: np.ndarray, mode: str, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(array, mode).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def xray(height: int = 1200, width: int = 1000) -> np.ndarray:
+    """Smooth grayscale pattern with noise, roughly like a chest X-ray."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = 128 + 60 * np.sin(x / 90) * np.cos(y / 130) + rng.normal(0, 10, x.shape)
+    return pixels.clip(0, 255).astype(np.uint8)
+
+
+def reference(processor: ImageProcessor, content: bytes) -> torch.Tensor:
+    image = Image.open(io.BytesIO(content)).convert("RGB")
+    return processor.transform(image).unsqueeze(0)
+
+
+@pytest.fixture
+def processor():
+    return ImageProcessor()
+
+
+@pytest.mark.parametrize(
+    ("array", "mode"),
+    [
+        (xray(), "L"),
+        (
+            np.stack([xray(), np.roll(xray(), 300, axis=1), 255 - xray()], axis=-1),
+            "RGB",
+        ),
+    ],
+)
+def test_lossless_input_matches_reference_transform(processor, array, mode):
+    content = encode(array, mode, "PNG")
+
+    actual = processor.process_image(content)
+
+    assert actual.shape == (1, 3, 224, 224)
+    assert actual.dtype == torch.float32
+    assert torch.allclose(actual, reference(processor, content), atol=1e-5)
+
+
+def test_jpeg_without_draft_matches_reference_transform():
+    processor = ImageProcessor(draft_factor=0)
+    content = encode(xray(), "L", "JPEG")
+
+    assert torch.allclose(
+        processor.process_image(content), reference(processor, content), atol=1e-5
+    )
+
+
+def test_jpeg_draft_stays_close_to_reference_transform(processor):
+    content = encode(xray(2500, 2000), "L", "JPEG")
+
+    diff = (processor.process_image(content) - reference(processor, content)).abs()
+
+    # Не больше пары уровней яркости после нормализации (1/255/0.225 ~ 0.017)
+    assert float(diff.max()) < 0.05
+    assert float(diff.mean()) < 0.01
+
+
+def test_process_images_stacks_single_results(processor):
+    contents = [
+        encode(xray(), "L", "PNG"),
+        encode(xray(800, 600), "L", "JPEG"),
+        encode(np.zeros((300, 400, 4), dtype=np.uint8), "RGBA", "PNG"),
+    ]
+
+    batch = processor.process_images(contents)
+
+    assert batch.shape == (3, 3, 224, 224)
+    expected = torch.cat([processor.process_image(c) for c in contents])
+    assert torch.equal(batch, expected)
+    assert processor.process_images([]).shape == (0, 3, 224, 224)
+
+
+def test_process_views_builds_all_views_from_one_canvas(processor):
+    content = encode(xray(), "L", "PNG")
+
+    views = processor.process_views(content, TTA_PRESETS["full"])
+
+    assert views.shape == (len(TTA_PRESETS["full"]), 3, 224, 224)
+    full, hflip = views[0], views[1]
+    # Отражение - точная перестановка пикселей
+    assert torch.equal(hflip, full.flip(-1))
+    # Полный вид - тот же снимок, что и без TTA (с точностью до интерполяции)
+    diff = (full - processor.process_image(content)[0]).abs()
+    assert float(diff.mean()) < 0.05
+
+
+def test_grayscale_mode_keeps_raw_single_channel(processor):
+    gray = ImageProcessor(grayscale=True)
+    content = encode(xray(), "L", "PNG")
+
+    raw = gray.process_image(content)
+    views = gray.process_views(content)
+
+    assert raw.shape == (1, 1, 224, 224)
+    assert views.shape == (2, 1, 224, 224)
+    # Нормализация - то, что свернуто в conv1 модели
+    mean = torch.tensor(MEAN).view(1, 3, 1, 1)
+    std = torch.tensor(STD).view(1, 3, 1, 1)
+    torch.testing.assert_close(
+        (raw / 255 - mean) / std, processor.process_image(content), atol=1e-5, rtol=0
+    )
+
+
+def windowed_reference(pixels: np.ndarray, low: float, high: float) -> torch.Tensor:
+    """Full-resolution windowing + the same resize and normalization."""
+    values = np.clip((pixels.astype(np.float32) - low) * 255 / (high - low), 0, 255)
+    image = Image.fromarray(values, "F").resize((224, 224), Image.Resampling.BILINEAR)
+    gray = torch.from_numpy(np.asarray(image) / 255).float()
+    mean = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+    std = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+    return ((gray.expand(3, -1, -1) - mean) / std).unsqueeze(0)
+
+
+def test_dicom_window_is_applied(processor, make_dicom):
+    pixels = (xray(900, 700).astype(np.uint16) * 16)[None]
+    content = make_dicom(pixels[0], window=(2000.5, 2001), rescale=(1.0, 0.0))
+
+    actual = processor.process_image(content)
+
+    # Окно [1000, 3000]; без прореживания (900 < 2 * 224 * 2) - почти точно
+    expected = windowed_reference(pixels[0], 1000, 3000)
+    assert actual.shape == (1, 3, 224, 224)
+    assert torch.allclose(actual, expected, atol=1e-4)
+
+
+def test_dicom_large_frame_is_downsampled_before_windowing(processor, make_dicom):
+    pixels = xray(2000, 1800).astype(np.uint16) * 16
+    # Rescale 2x - 100 и окно [900, 4900] в единицах после rescale
+    content = make_dicom(pixels, window=(2900.5, 4001), rescale=(2.0, -100.0))
+
+    expected = windowed_reference(pixels * 2.0 - 100, 900, 4900)
+    diff = (processor.process_image(content) - expected).abs()
+
+    # Блочное усреднение 4x4 перед resize: в среднем ~1 уровень яркости,
+    # отдельные шумные пиксели расходятся сильнее из-за другого ядра фильтра
+    assert float(diff.mean()) < 0.03
+    assert float(diff.max()) < 0.2
+
+
+def test_dicom_monochrome1_is_inverted(processor, make_dicom):
+    pixels = xray(300, 300).astype(np.uint16) * 16
+    normal = processor.process_image(make_dicom(pixels, window=(2048, 4096)))
+    inverted = processor.process_image(
+        make_dicom(pixels, "MONOCHROME1", window=(2048, 4096))
+    )
+
+    # Инверсия в пикселях 0..255: x -> 255 - x
+    std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+    mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+    assert torch.allclose(normal * std + mean, 1 - (inverted * std + mean), atol=1e-4)
+
+
+def test_multiframe_dicom_yields_one_row_per_frame(processor, make_dicom):
+    frames = np.stack([xray(300, 300), 255 - xray(300, 300), xray(300, 300) // 2])
+    content = make_dicom(frames.astype(np.uint16) * 16, window=(2048, 4096))
+
+    batch = processor.process_image(content)
+
+    assert batch.shape == (3, 3, 224, 224)
+    assert not torch.equal(batch[0], batch[1])
+    mixed = processor.process_images([encode(xray(), "L", "PNG"), content])
+    assert mixed.shape == (4, 3, 224, 224)
+    assert torch.equal(mixed[1:], batch)
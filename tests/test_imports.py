@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+import pytest
+
+from app.core.db_helper import DatabaseHelper
+
+
+def loaded_modules(statement: str) -> set[str]:
+    """Модули, загруженные в чистом интерпретаторе после ``statement``."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"{statement}; import sys; print(*sys.modules)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        # То, что импортирует alembic/env.py
+        "from app.core import settings; from app.core.models import Base",
+        "from app.worker import celery_app",
+        "from app.utils import camel_case_to_snake_case",
+    ],
+)
+def test_db_paths_do_not_import_ml_stack(statement):
+    loaded = loaded_modules(statement)
+
+    assert not {"torch", "torchvision", "PIL", "numpy"} & loaded
+
+
+def test_api_loads_ml_stack_only_in_lifespan():
+    # Модель (и torch) грузит lifespan; импорт приложения их не трогает
+    loaded = loaded_modules("import app.main")
+
+    assert not {"torch", "torchvision", "numpy"} & loaded
+
+
+def test_engine_is_created_on_first_use():
+    helper = DatabaseHelper("sqlite+aiosqlite:///:memory:", False, False)
+    assert "engine" not in helper.__dict__
+
+    assert helper.session_factory.kw["bind"] is helper.engine
@@ -0,0 +1,36 @@
+from io import BytesIO
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_async_prediction_job_roundtrip(client, make_image):
+    files = {"file": ("queued.jpg", BytesIO(make_image()), "image/jpeg")}
+
+    with patch("app.worker.tasks.save_prediction", new=AsyncMock()) as mock_save:
+        response = await client.post("/api/v1/lungcheck/predict/async", files=files)
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    mock_save.assert_awaited_once()
+
+    response = await client.get(f"/api/v1/lungcheck/jobs/{job_id}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "SUCCESS"
+    assert data["result"]["prediction"] == "PNEUMONIA"
+    assert data["result"]["filename"] == "queued.jpg"
+
+
+@pytest.mark.asyncio
+async def test_async_prediction_rejects_non_images(client):
+    files = {"file": ("notes.txt", BytesIO(b"hello"), "text/plain")}
+    response = await client.post("/api/v1/lungcheck/predict/async", files=files)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_unknown_job_is_pending(client):
+    response = await client.get("/api/v1/lungcheck/jobs/does-not-exist")
+    assert response.json()["status"] == "PENDING"
@@ -0,0 +1,80 @@
+from io import BytesIO
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.db_helper import DatabaseHelper
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_predict_is_instrumented(client, make_image):
+    route = "/api/v1/lungcheck/predict"
+    requests_before = sample(
+        "lungcheck_http_requests_total", method="POST", route=route, status="200"
+    )
+    batches_before = sample("lungcheck_inference_batch_size_count")
+    preprocess_before = sample(
+        "lungcheck_stage_duration_seconds_count", stage="preprocess"
+    )
+
+    files = {"file": ("metrics.png", BytesIO(make_image(201)), "image/png")}
+    assert (await client.post(route, files=files)).status_code == 200
+
+    assert (
+        sample(
+            "lungcheck_http_requests_total", method="POST", route=route, status="200"
+        )
+        == requests_before + 1
+    )
+    assert sample("lungcheck_inference_batch_size_count") == batches_before + 1
+    assert (
+        sample("lungcheck_stage_duration_seconds_count", stage="preprocess")
+        == preprocess_before + 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_runtime_gauges(client):
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for name in (
+        "lungcheck_inference_queue_depth",
+        "lungcheck_db_pool_checked_out",
+        "lungcheck_model_info",
+        "lungcheck_stage_duration_seconds",
+        "process_resident_memory_bytes",
+    ):
+        assert name in body
+
+
+@pytest.mark.asyncio
+async def test_unmatched_paths_share_one_label(client):
+    await client.get("/no/such/path/123")
+    assert (
+        sample(
+            "lungcheck_http_requests_total",
+            method="GET",
+            route="unmatched",
+            status="404",
+        )
+        >= 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_pool_checkout_wait_is_recorded():
+    helper = DatabaseHelper("sqlite+aiosqlite:///:memory:", echo=False, echo_pool=False)
+    before = sample("lungcheck_db_pool_checkout_seconds_count")
+
+    async with helper.engine.connect():
+        pass
+    await helper.dispose()
+
+    assert sample("lungcheck_db_pool_checkout_seconds_count") == before + 1
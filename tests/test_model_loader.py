@@ -0,0 +1,124 @@
+import copy
+import io
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from app.core.config import settings
+from app.core.ml.model_loader import ModelLoader
+from app.core.ml.variants import fold_grayscale
+from app.utils.image_processor import MEAN, STD, ImageProcessor
+
+
+@pytest.mark.parametrize(
+    "runtime, channels_last, expected",
+    [
+        ("eager", False, "eager"),
+        ("eager", True, "eager+channels_last"),
+        ("dynamic_int8", False, "dynamic_int8"),
+        # INT8-ядра не используют channels_last - и в имени runtime его нет
+        ("dynamic_int8", True, "dynamic_int8"),
+        ("torchscript", True, "torchscript+channels_last"),
+    ],
+)
+def test_runtime_variant_passes_parity(runtime, channels_last, expected):
+    with (
+        patch.object(settings.ml_config, "runtime", runtime),
+        patch.object(settings.ml_config, "channels_last", channels_last),
+        patch.object(settings.ml_config, "calibration_samples", 2),
+        patch.object(settings.ml_config, "parity_tolerance", 0.05),
+    ):
+        loader = ModelLoader()
+        model = loader.load_model()
+
+    assert loader.runtime == expected
+    with torch.inference_mode():
+        assert model(torch.randn(2, 3, 224, 224)).shape == (2, 2)
+
+
+def test_static_int8_is_calibrated_on_xrays(tmp_path, make_image):
+    for i in range(3):
+        (tmp_path / f"xray_{i}.png").write_bytes(make_image(60 + i * 50))
+    (tmp_path / "notes.txt").write_text("not an image")
+
+    with (
+        patch.object(settings.ml_config, "runtime", "static_int8"),
+        patch.object(settings.ml_config, "calibration_dir", str(tmp_path)),
+        patch.object(settings.ml_config, "calibration_samples", 4),
+        patch.object(settings.ml_config, "parity_tolerance", 0.05),
+    ):
+        loader = ModelLoader()
+        assert loader.calibration_inputs().shape == (3, 3, 224, 224)
+        loader.load_model()
+
+    assert loader.runtime == "static_int8"
+
+
+def test_static_int8_without_calibration_dir_serves_float():
+    with (
+        patch.object(settings.ml_config, "runtime", "static_int8"),
+        patch.object(settings.ml_config, "calibration_dir", None),
+    ):
+        loader = ModelLoader()
+        loader.load_model()
+
+    assert loader.runtime == "eager"
+
+
+def test_variant_failing_parity_falls_back_to_float():
+    with (
+        patch.object(settings.ml_config, "runtime", "dynamic_int8"),
+        patch.object(settings.ml_config, "calibration_samples", 2),
+        patch.object(settings.ml_config, "parity_tolerance", -1.0),
+    ):
+        loader = ModelLoader()
+        loader.load_model()
+
+    assert loader.runtime == "eager"
+
+
+def test_grayscale_fold_matches_rgb_path():
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:300, 0:260]
+    pixels = 128 + 80 * np.sin(x / 25) * np.cos(y / 40) + rng.normal(0, 8, x.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8), "L").save(buffer, "PNG")
+    content = buffer.getvalue()
+
+    loader = ModelLoader()
+    loader.device = torch.device("cpu")
+    torch.manual_seed(0)
+    model = loader.load_float_model()
+    rgb_input = ImageProcessor().process_image(content)
+    gray_input = ImageProcessor(grayscale=True).process_image(content)
+
+    with torch.inference_mode():
+        expected_conv1 = model.conv1(rgb_input)
+        expected = model(rgb_input)
+        folded = fold_grayscale(copy.deepcopy(model), MEAN, STD, 224)
+        actual_conv1 = folded.conv1(gray_input)
+        actual = folded(gray_input)
+
+    assert gray_input.shape == (1, 1, 224, 224)
+    # Свертка совпадает и на краях, где работает карта смещений
+    torch.testing.assert_close(actual_conv1, expected_conv1, atol=1e-4, rtol=1e-4)
+    torch.testing.assert_close(
+        torch.softmax(actual, 1), torch.softmax(expected, 1), atol=1e-4, rtol=0
+    )
+
+
+def test_grayscale_mode_serves_single_channel_model():
+    with (
+        patch.object(settings.ml_config, "grayscale", True),
+        patch.object(settings.ml_config, "runtime", "torchscript"),
+        patch.object(settings.ml_config, "calibration_samples", 2),
+    ):
+        loader = ModelLoader()
+        model = loader.load_model()
+
+    assert loader.runtime == "torchscript+grayscale"
+    with torch.inference_mode():
+        assert model(torch.rand(2, 1, 224, 224) * 255).shape == (2, 2)
@@ -0,0 +1,98 @@
+import csv
+import sqlite3
+
+import pytest
+import torch
+from sqlalchemy import create_engine
+
+from app.core.ml.offline_scoring import BatchScorer, Checkpoint, CsvSink, DatabaseSink
+from app.core.models.base import Base
+
+
+def constant_model(x: torch.Tensor) -> torch.Tensor:
+    return torch.tensor([[-1.0, 5.0]] * x.shape[0])
+
+
+@pytest.fixture
+def images(tmp_path, make_image):
+    """Каталог с 7 снимками (часть во вложенной папке) и одним битым файлом."""
+    root = tmp_path / "archive"
+    (root / "nested").mkdir(parents=True)
+    for i in range(7):
+        folder = root / "nested" if i % 2 else root
+        (folder / f"xray_{i}.png").write_bytes(make_image(i * 30))
+    (root / "broken.jpg").write_bytes(b"not an image")
+    (root / "notes.txt").write_text("ignored")
+    return root
+
+
+def read_csv(path):
+    with path.open(newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_scores_directory_to_csv(tmp_path, images):
+    output = tmp_path / "scores.csv"
+    scorer = BatchScorer(constant_model, "v1", batch_size=3, decode_workers=2)
+
+    summary = scorer.run(images, CsvSink(output), tmp_path / "ckpt", progress=False)
+
+    rows = read_csv(output)
+    assert summary.images == 7
+    assert summary.failed == ["broken.jpg"]
+    assert sorted(r["filename"] for r in rows) == sorted(
+        [f"xray_{i}.png" for i in range(0, 7, 2)]
+        + [f"nested/xray_{i}.png" for i in range(1, 7, 2)]
+    )
+    assert {r["prediction"] for r in rows} == {"PNEUMONIA"}
+    assert {r["model_version"] for r in rows} == {"v1"}
+
+
+def test_interrupted_run_resumes_without_duplicates(tmp_path, images):
+    output = tmp_path / "scores.csv"
+    checkpoint = tmp_path / "ckpt"
+    calls = 0
+
+    def failing_model(x: torch.Tensor) -> torch.Tensor:
+        nonlocal calls
+        calls += 1
+        if calls == 3:
+            raise RuntimeError("node preempted")
+        return constant_model(x)
+
+    crashing = BatchScorer(
+        failing_model, "v1", batch_size=2, decode_workers=1, flush_files=2
+    )
+    with pytest.raises(RuntimeError):
+        crashing.run(images, CsvSink(output), checkpoint, progress=False)
+    assert Checkpoint.load(checkpoint, images, "v1").done == 4
+
+    scorer = BatchScorer(constant_model, "v1", batch_size=2, decode_workers=1)
+    summary = scorer.run(images, CsvSink(output), checkpoint, progress=False)
+
+    filenames = [r["filename"] for r in read_csv(output)]
+    assert summary.files == 4
+    assert len(filenames) == len(set(filenames)) == 7
+
+    # Другая версия модели не продолжает чужой прогон
+    with pytest.raises(ValueError):
+        BatchScorer(constant_model, "v2").run(
+            images, CsvSink(output), checkpoint, progress=False
+        )
+
+
+def test_database_sink_bulk_inserts_rows(tmp_path, images):
+    path = tmp_path / "scores.db"
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+
+    scorer = BatchScorer(constant_model, "v1", batch_size=4, decode_workers=1)
+    scorer.run(
+        images,
+        DatabaseSink(f"sqlite+aiosqlite:///{path}"),
+        tmp_path / "ckpt",
+        progress=False,
+    )
+
+    with sqlite3.connect(path) as db:
+        rows = db.execute("SELECT model_version, count(*) FROM predictions").fetchall()
+    assert rows == [("v1", 7)]
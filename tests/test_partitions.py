@@ -0,0 +1,157 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.partitions import (
+    Partition,
+    create_partition,
+    detach_partition,
+    parse_bounds,
+    plan_maintenance,
+)
+
+
+class RecordingConnection:
+    """Collects the SQL sent by the maintenance helpers."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, parameters=None):
+        self.statements.append(" ".join(str(statement).split()))
+
+
+def monthly(year: int, month: int, **kwargs) -> Partition:
+    lower = datetime(year, month, 1)
+    upper = datetime(year + month // 12, month % 12 + 1, 1)
+    return Partition(f"predictions_y{year}m{month:02d}", lower, upper, **kwargs)
+
+
+def test_plan_creates_missing_months_ahead():
+    legacy = Partition(
+        "predictions_legacy",
+        *parse_bounds("FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')"),
+    )
+    assert (legacy.lower, legacy.upper) == (None, datetime(2026, 11, 1))
+
+    plan = plan_maintenance(
+        [legacy, monthly(2026, 11)],
+        now=datetime(2026, 10, 18, 12),
+        months=None,
+        premake_months=3,
+    )
+
+    # Октябрь лежит в старой таблице, ноябрь уже есть; переход через год
+    assert plan.create == [datetime(2026, 12, 1), datetime(2027, 1, 1)]
+    assert plan.archive == []
+
+
+def test_plan_archives_only_expired_partitions():
+    legacy = Partition("predictions_legacy", None, datetime(2026, 11, 1))
+    pending = monthly(2026, 11, detach_pending=True)
+    partitions = [
+        legacy,
+        pending,
+        monthly(2026, 12),
+        monthly(2027, 1),
+        monthly(2027, 2),
+        monthly(2027, 3),
+        # Остатки прерванных запусков: отсоединенная и еще не подключенная
+        Partition("predictions_y2026m10", attached=False),
+        Partition("predictions_y2027m04", attached=False),
+    ]
+
+    plan = plan_maintenance(
+        partitions, now=datetime(2027, 3, 5), months=2, premake_months=1
+    )
+
+    # Хранятся два полных месяца (январь, февраль) и текущий
+    assert [p.name for p in plan.archive] == [
+        "predictions_legacy",
+        "predictions_y2026m11",
+        "predictions_y2026m12",
+        "predictions_y2026m10",
+    ]
+    # Неподключенная будущая секция подключается, а не архивируется
+    assert plan.create == [datetime(2027, 4, 1)]
+
+
+def test_plan_leaves_default_partition_alone():
+    default = Partition("predictions_default", *parse_bounds("DEFAULT"))
+    assert not default.covers(datetime(2026, 12, 1))
+
+    plan = plan_maintenance(
+        [default, monthly(2026, 11)],
+        now=datetime(2026, 11, 20),
+        months=0,
+        premake_months=1,
+    )
+
+    # Секция по умолчанию не закрывает месяц и не уходит в архив
+    assert plan.create == [datetime(2026, 12, 1)]
+    assert [p.name for p in plan.archive] == []
+
+
+@pytest.mark.asyncio
+async def test_create_partition_attaches_month_range():
+    connection = RecordingConnection()
+
+    await create_partition(connection, datetime(2026, 12, 1))
+
+    assert connection.statements == [
+        "CREATE TABLE IF NOT EXISTS predictions_y2026m12 "
+        "(LIKE predictions INCLUDING DEFAULTS)",
+        "ALTER TABLE predictions ATTACH PARTITION predictions_y2026m12 "
+        "FOR VALUES FROM ('2026-12-01T00:00:00') TO ('2027-01-01T00:00:00')",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_partition_moves_rows_out_of_default():
+    connection = RecordingConnection()
+
+    await create_partition(connection, datetime(2026, 12, 1), default=True)
+
+    attach = connection.statements[-1]
+    assert attach.startswith("DO $$ BEGIN LOCK TABLE predictions_default ")
+    assert (
+        "DELETE FROM predictions_default WHERE created_at >= '2026-12-01T00:00:00' "
+        "AND created_at < '2027-01-01T00:00:00' RETURNING *"
+    ) in attach
+    assert "INSERT INTO predictions_y2026m12 SELECT * FROM moved;" in attach
+    # Перенос и подключение - одна транзакция
+    assert (
+        attach.index("INSERT")
+        < attach.index("ATTACH PARTITION")
+        < attach.index("END $$")
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("partition", "concurrently", "expected"),
+    [
+        (monthly(2026, 11), True, " CONCURRENTLY"),
+        (monthly(2026, 11), False, ""),
+        (monthly(2026, 11, detach_pending=True), True, " FINALIZE"),
+    ],
+)
+async def test_detach_partition_sql(partition, concurrently, expected):
+    connection = RecordingConnection()
+
+    await detach_partition(connection, partition, concurrently)
+
+    assert connection.statements == [
+        f"ALTER TABLE predictions DETACH PARTITION predictions_y2026m11{expected}"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_detach_skips_already_detached_table():
+    connection = RecordingConnection()
+
+    await detach_partition(
+        connection, Partition("predictions_y2026m11", attached=False), True
+    )
+
+    assert connection.statements == []
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.models import Prediction, PredictionStat
+from app.core.prediction_stats import backfill
+from app.core.prediction_writer import PredictionRow, PredictionWriter
+from tests.conftest import session_factory
+
+STATS_URL = "/api/v1/lungcheck/stats"
+
+
+def make_row(created_at: datetime, label: str, confidence: float) -> PredictionRow:
+    return PredictionRow(
+        filename="stats.jpg",
+        prediction=label,
+        confidence=confidence,
+        created_at=created_at,
+        model_version="test",
+    )
+
+
+async def write(rows: list[PredictionRow]) -> None:
+    writer = PredictionWriter(session_factory, batch_size=2, flush_interval_ms=0)
+    writer.start()
+    await writer.put_many(rows)
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writer_updates_hourly_rollup(session):
+    # Отдельный час в прошлом: не пересекается с записями других тестов
+    await write(
+        [
+            make_row(datetime(2001, 1, 1, 10, 5), "NORMAL", 0.6),
+            make_row(datetime(2001, 1, 1, 10, 55), "NORMAL", 0.9),
+            make_row(datetime(2001, 1, 1, 11, 0), "NORMAL", 0.7),
+        ]
+    )
+    await write([make_row(datetime(2001, 1, 1, 10, 30), "NORMAL", 0.3)])
+
+    stmt = select(PredictionStat).where(
+        PredictionStat.bucket == datetime(2001, 1, 1, 10)
+    )
+    stat = (await session.execute(stmt)).scalar_one()
+    assert stat.prediction == "NORMAL"
+    assert stat.count == 3
+    assert stat.confidence_sum == pytest.approx(1.8)
+    assert (stat.confidence_min, stat.confidence_max) == (0.3, 0.9)
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint_reads_backfilled_rollup(client, session, predictions):
+    await write(
+        [
+            make_row(datetime(2001, 2, 1, 9, 15), "PNEUMONIA", 0.8),
+            make_row(datetime(2001, 2, 1, 17, 45), "PNEUMONIA", 0.6),
+            make_row(datetime(2001, 2, 1, 17, 50), "NORMAL", 0.9),
+        ]
+    )
+    # Записи фикстур вставлены мимо rollup - их добавляет backfill
+    scanned = await backfill(session_factory, chunk_size=2)
+    stmt = select(Prediction.prediction, func.count()).group_by(Prediction.prediction)
+    expected = dict((await session.execute(stmt)).all())
+    assert scanned == sum(expected.values())
+
+    response = await client.get(STATS_URL)
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == scanned
+    assert {s["label"]: s["count"] for s in body["labels"]} == expected
+
+    params = {"since": "2001-02-01T00:00:00", "until": "2001-02-02T00:00:00"}
+    daily = (await client.get(STATS_URL, params=params)).json()
+    assert [(b["bucket"], b["label"], b["count"]) for b in daily["buckets"]] == [
+        ("2001-02-01T00:00:00", "NORMAL", 1),
+        ("2001-02-01T00:00:00", "PNEUMONIA", 2),
+    ]
+    pneumonia = daily["buckets"][1]
+    assert pneumonia["mean_confidence"] == pytest.approx(0.7)
+    assert (pneumonia["min_confidence"], pneumonia["max_confidence"]) == (0.6, 0.8)
+
+    hourly = (
+        await client.get(
+            STATS_URL, params={**params, "granularity": "hour", "label": "PNEUMONIA"}
+        )
+    ).json()
+    assert hourly["total"] == 2
+    assert [b["bucket"] for b in hourly["buckets"]] == [
+        "2001-02-01T09:00:00",
+        "2001-02-01T17:00:00",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_backfill_rebuilds_history_and_recent_buckets(session):
+    # Строки мимо rollup: до водяного знака (11:00) и после него
+    session.add_all(
+        Prediction(filename="b.jpg", prediction="NORMAL", confidence=0.5, created_at=t)
+        for t in (
+            datetime(2002, 3, 1, 10, 10),
+            datetime(2002, 3, 1, 11, 20),
+            datetime(2002, 3, 1, 12, 10),
+        )
+    )
+    # Устаревший бакет без записей удаляется
+    session.add(
+        PredictionStat(
+            bucket=datetime(2002, 3, 1, 9),
+            prediction="NORMAL",
+            count=7,
+            confidence_sum=3.5,
+            confidence_min=0.5,
+            confidence_max=0.5,
+        )
+    )
+    await session.commit()
+
+    await backfill(session_factory, chunk_size=2, now=datetime(2002, 3, 1, 12, 30))
+
+    stmt = (
+        select(PredictionStat.bucket, PredictionStat.count)
+        .where(PredictionStat.bucket >= datetime(2002, 3, 1))
+        .where(PredictionStat.bucket < datetime(2002, 3, 2))
+        .order_by(PredictionStat.bucket)
+    )
+    assert (await session.execute(stmt)).all() == [
+        (datetime(2002, 3, 1, 10), 1),
+        (datetime(2002, 3, 1, 11), 1),
+        (datetime(2002, 3, 1, 12), 1),
+    ]
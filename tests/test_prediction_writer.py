@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import func, select
+
+from app.core.models import Prediction
+from app.core.prediction_writer import PredictionRow, PredictionWriter
+from tests.conftest import session_factory
+
+
+def make_row(i: int) -> PredictionRow:
+    return PredictionRow(
+        filename=f"buffered_{i}.jpg",
+        prediction="NORMAL",
+        confidence=0.75,
+        created_at=datetime.now(),
+        model_version="test",
+    )
+
+
+async def count_buffered(session) -> int:
+    stmt = select(func.count()).where(Prediction.filename.like("buffered_%"))
+    return (await session.execute(stmt)).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_rows_are_written_in_batches(session):
+    before = await count_buffered(session)
+    writer = PredictionWriter(session_factory, batch_size=4, flush_interval_ms=10)
+    writer.start()
+
+    await writer.put_many(make_row(i) for i in range(10))
+    await writer.flush()
+    await writer.stop()
+
+    assert writer.written == 10
+    assert await count_buffered(session) == before + 10
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_rows(session):
+    before = await count_buffered(session)
+    writer = PredictionWriter(session_factory, batch_size=100, flush_interval_ms=10_000)
+    writer.start()
+
+    await writer.put(make_row(0))
+    await writer.stop()
+
+    assert await count_buffered(session) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_counted_as_dropped():
+    def unavailable():
+        raise ConnectionError("database is down")
+
+    metric = "lungcheck_prediction_writer_dropped_rows_total"
+    before = REGISTRY.get_sample_value(metric)
+    writer = PredictionWriter(unavailable, flush_interval_ms=10, max_retries=1)
+    writer.start()
+
+    await writer.put_many(make_row(i) for i in range(3))
+    await writer.stop()
+
+    assert (writer.written, writer.dropped) == (0, 3)
+    assert REGISTRY.get_sample_value(metric) == before + 3
+
+
+@pytest.mark.asyncio
+async def test_predict_is_persisted_by_writer(client, session, make_image):
+    from io import BytesIO
+
+    from app.main import app
+
+    files = {"file": ("written.jpg", BytesIO(make_image()), "image/jpeg")}
+    response = await client.post("/api/v1/lungcheck/predict", files=files)
+    assert response.status_code == 200
+
+    await app.state.prediction_writer.flush()
+    stmt = select(func.count()).where(Prediction.filename == "written.jpg")
+    assert (await session.execute(stmt)).scalar_one() == 1
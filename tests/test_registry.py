@@ -0,0 +1,330 @@
+import asyncio
+import os
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+import torch
+from prometheus_client import REGISTRY
+from pydantic import SecretStr, ValidationError
+
+from app.core import settings
+from app.core.config import MLConfig
+from app.core.ml.executor import InferenceExecutor
+from app.core.ml.model_loader import ModelLoader
+from app.core.ml.registry import ModelRegistry
+from app.core.models import Prediction
+from app.main import app
+
+TOKEN = "secret"
+
+
+def constant_model(class_index: int):
+    """Модель, которая всегда выбирает один класс."""
+    logits = [-5.0, 5.0] if class_index else [5.0, -5.0]
+    return lambda x: torch.tensor([logits] * x.shape[0])
+
+
+class FakeLoader:
+    """ModelLoader без torchvision: версия - имя файла весов."""
+
+    check_onnx_export = staticmethod(ModelLoader.check_onnx_export)
+
+    def __init__(self) -> None:
+        self.version = "unknown"
+        self.runtime = "eager"
+
+    def load_model(self, weights_path):
+        self.version = weights_path.stem
+        return constant_model(0)
+
+
+@pytest.fixture
+async def registry():
+    executor = InferenceExecutor(kind="thread", max_workers=2, torch_threads=1)
+    executor.start()
+    registry = ModelRegistry(executor, max_batch_size=4, max_wait_ms=1)
+    yield registry
+    await registry.close()
+    executor.shutdown()
+
+
+@pytest.fixture
+def admin():
+    with patch.object(settings.registry, "admin_token", SecretStr(TOKEN)):
+        yield {"X-Admin-Token": TOKEN}
+
+
+@pytest.fixture
+def weights(tmp_path):
+    path = tmp_path / "candidate.pth"
+    path.write_bytes(b"weights")
+    with (
+        patch.object(settings.registry, "models_dir", str(tmp_path)),
+        patch("app.core.ml.registry.ModelLoader", FakeLoader),
+    ):
+        yield path
+
+
+@pytest.mark.asyncio
+async def test_activate_swaps_and_queued_batches_finish_on_old_version(registry):
+    registry.add("default", constant_model(1), "v1", "eager")
+
+    with registry.lease() as old:
+        # Новая версия под тем же именем: активируется сразу, а запрос,
+        # начатый на старой, дорабатывает на ней
+        registry.add("default", constant_model(0), "v2", "eager")
+        await asyncio.sleep(0.05)
+        [result] = await old.batcher.submit(torch.zeros(1, 3, 4, 4))
+
+    assert result.class_index == 1
+    assert registry.get().version == "v2"
+    assert (
+        await registry.get().batcher.predict(torch.zeros(1, 3, 4, 4))
+    ).class_index == 0
+
+
+@pytest.mark.asyncio
+async def test_several_versions_stay_resident(registry):
+    registry.add("a", constant_model(1), "v1", "eager")
+    registry.add("b", constant_model(0), "v2", "eager")
+    registry.max_resident = 2
+
+    registry.activate("b")
+    registry.add("c", constant_model(0), "v3", "eager")
+
+    # Вытеснена самая старая неактивная версия
+    assert [m.name for m in registry.models] == ["b", "c"]
+    assert registry.active == "b"
+    with pytest.raises(ValueError):
+        registry.unload("b")
+
+
+@pytest.mark.asyncio
+async def test_watcher_reloads_changed_weights(registry, weights):
+    registry.add("default", constant_model(1), "old", "eager")
+    watcher = asyncio.create_task(registry.watch("default", weights, 0.01))
+    try:
+        await asyncio.sleep(0.02)
+        os.utime(weights, (1, 1))
+        for _ in range(200):
+            if registry.get().version == "candidate":
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        watcher.cancel()
+
+    assert registry.get().version == "candidate"
+
+
+@pytest.mark.asyncio
+async def test_watcher_keeps_old_version_until_onnx_is_reexported(
+    registry, weights, caplog
+):
+    export = weights.with_suffix(".onnx")
+    export.write_bytes(b"graph")
+    os.utime(export, (1, 1))
+    registry.add("default", constant_model(1), "old", "eager")
+
+    async def wait_for(predicate) -> None:
+        for _ in range(200):
+            if predicate():
+                return
+            await asyncio.sleep(0.01)
+
+    with patch.object(settings.ml_config, "backend", "onnx"):
+        watcher = asyncio.create_task(registry.watch("default", weights, 0.01))
+        try:
+            await asyncio.sleep(0.02)
+            # Новые веса при старом экспорте не подхватываются
+            os.utime(weights, (2, 2))
+            await wait_for(lambda: "Not reloading" in caplog.text)
+            assert registry.get().version == "old"
+
+            os.utime(export, (3, 3))
+            await wait_for(lambda: registry.get().version == "candidate")
+        finally:
+            watcher.cancel()
+
+    assert registry.get().version == "candidate"
+
+
+@pytest.mark.asyncio
+async def test_load_refuses_weights_newer_than_onnx_export(client, admin, weights):
+    export = weights.with_suffix(".onnx")
+    export.write_bytes(b"graph")
+    os.utime(export, (1, 1))
+
+    with patch.object(settings.ml_config, "backend", "onnx"):
+        response = await client.post(
+            "/api/v1/lungcheck/models/candidate/load",
+            json={"path": weights.name},
+            headers=admin,
+        )
+
+    assert response.status_code == 409
+    assert "export_onnx" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_predictions_record_model_version(client, make_image):
+    files = {"file": ("v.png", BytesIO(make_image(31)), "image/png")}
+    response = await client.post("/api/v1/lungcheck/predict", files=files)
+    await app.state.prediction_writer.flush()
+    history = await client.get("/api/v1/lungcheck/history?limit=1")
+
+    version = app.state.models.get().version
+    assert response.json()["model_version"] == version
+    assert history.json()[0]["model_version"] == version
+
+
+@pytest.mark.asyncio
+async def test_unknown_model_is_404(client, make_image):
+    files = {"file": ("v.png", BytesIO(make_image(32)), "image/png")}
+    response = await client.post("/api/v1/lungcheck/predict?model=missing", files=files)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_are_disabled_without_token(client):
+    response = await client.post("/api/v1/lungcheck/models/default/activate")
+
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_admin_rejects_wrong_token(client, admin):
+    response = await client.post(
+        "/api/v1/lungcheck/models/default/activate",
+        headers={"X-Admin-Token": "wrong"},
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_load_serve_and_activate_new_version(client, admin, weights, make_image):
+    response = await client.post(
+        "/api/v1/lungcheck/models/candidate/load",
+        json={"path": weights.name},
+        headers=admin,
+    )
+    assert response.status_code == 202
+    await app.state.models.start_load("candidate", weights)
+
+    # Кандидат доступен по имени, по умолчанию отвечает прежняя версия
+    files = {"file": ("ab.png", BytesIO(make_image(33)), "image/png")}
+    explicit = await client.post(
+        "/api/v1/lungcheck/predict?model=candidate", files=files
+    )
+    assert explicit.json()["prediction"] == "NORMAL"
+    assert explicit.json()["model_version"] == "candidate"
+
+    response = await client.post(
+        "/api/v1/lungcheck/models/candidate/activate", headers=admin
+    )
+    listing = (await client.get("/api/v1/lungcheck/models")).json()
+
+    assert response.status_code == 200
+    assert listing["active"] == "candidate"
+    assert {m["name"] for m in listing["models"]} == {"default", "candidate"}
+
+
+@pytest.mark.asyncio
+async def test_load_rejects_paths_outside_models_dir(client, admin, weights):
+    response = await client.post(
+        "/api/v1/lungcheck/models/evil/load",
+        json={"path": "../../etc/passwd"},
+        headers=admin,
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_shadow_scores_in_background(client, admin, weights, make_image):
+    await app.state.models.load("candidate", weights)
+    response = await client.put(
+        "/api/v1/lungcheck/models/shadow?name=candidate", headers=admin
+    )
+    assert response.json()["shadow"] == "candidate"
+
+    def disagreements() -> float:
+        return (
+            REGISTRY.get_sample_value(
+                "lungcheck_shadow_predictions_total",
+                {"version": "candidate", "outcome": "disagree"},
+            )
+            or 0.0
+        )
+
+    before = disagreements()
+    files = {"file": ("s.png", BytesIO(make_image(34)), "image/png")}
+    await client.post("/api/v1/lungcheck/predict", files=files)
+    for _ in range(100):
+        if disagreements() > before:
+            break
+        await asyncio.sleep(0.01)
+
+    # Активная модель отвечает PNEUMONIA, теневая - NORMAL
+    assert disagreements() == before + 1
+
+
+@pytest.mark.asyncio
+async def test_tta_averages_views_in_one_pass(client, make_image):
+    files = {"file": ("t.png", BytesIO(make_image(35)), "image/png")}
+    response = await client.post("/api/v1/lungcheck/predict?tta=full", files=files)
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["views"] == 8
+    assert set(body["probabilities"]) == {"NORMAL", "PNEUMONIA"}
+    assert body["confidence"] == body["probabilities"][body["prediction"]]
+
+
+@pytest.mark.asyncio
+async def test_ensemble_reports_spread_between_versions(client, make_image):
+    registry = app.state.models
+    registry.add("normal", constant_model(0), "v-normal", "eager")
+    registry.add("pneumonia", constant_model(1), "v-pneumonia", "eager")
+
+    files = {"file": ("e.png", BytesIO(make_image(36)), "image/png")}
+    response = await client.post(
+        "/api/v1/lungcheck/predict?model=normal&ensemble=pneumonia,normal&tta=flip",
+        files=files,
+    )
+
+    body = response.json()
+    assert body["views"] == 4
+    assert body["model_version"] == "v-normal+v-pneumonia"
+    # Версии уверенно расходятся: среднее около 50%, разброс около 50%
+    assert body["probabilities"]["NORMAL"] == pytest.approx(50, abs=1)
+    assert body["spread"]["NORMAL"] == pytest.approx(50, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_ensemble_rejects_unknown_and_too_many_models(client, make_image):
+    files = {"file": ("x.png", BytesIO(make_image(37)), "image/png")}
+    unknown = await client.post(
+        "/api/v1/lungcheck/predict?ensemble=missing", files=files
+    )
+    with patch.object(settings.ml_config, "max_ensemble_size", 1):
+        registry = app.state.models
+        registry.add("other", constant_model(0), "v-other", "eager")
+        too_many = await client.post(
+            "/api/v1/lungcheck/predict?ensemble=other", files=files
+        )
+
+    assert unknown.status_code == 404
+    assert too_many.status_code == 400
+
+
+def test_largest_ensemble_version_fits_the_history_column():
+    size = MLConfig(max_ensemble_size=5).max_ensemble_size
+    # Версия - 12 символов (ModelLoader.weights_version)
+    joined = "+".join("0123456789ab" for _ in range(size))
+
+    assert len(joined) <= Prediction.__table__.c.model_version.type.length
+    with pytest.raises(ValidationError):
+        MLConfig(max_ensemble_size=size + 1)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from torchvision import datasets
+
+import train
+from app.core.ml.model_loader import ModelLoader
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Крошечный ImageFolder: по 4 снимка разного размера на класс."""
+    rng = np.random.default_rng(0)
+    for label in ("NORMAL", "PNEUMONIA"):
+        folder = tmp_path / "data" / "train" / label
+        folder.mkdir(parents=True)
+        for i in range(4):
+            pixels = rng.integers(0, 255, (90 + i * 10, 80), dtype=np.uint8)
+            Image.fromarray(pixels, "L").save(folder / f"{i}.jpg")
+    return tmp_path / "data"
+
+
+def test_cached_dataset_matches_transforms(tmp_path, data_dir):
+    config = train.TrainConfig(
+        data_dir=data_dir, cache_dir=tmp_path / "cache", workers=0
+    )
+    _, val_dataset, classes = train.load_datasets(config)
+    reference = datasets.ImageFolder(
+        str(data_dir / "train"),
+        train.transforms.Compose(
+            [
+                train.transforms.Resize((224, 224)),
+                train.transforms.ToTensor(),
+                train.transforms.Normalize(train.MEAN, train.STD),
+            ]
+        ),
+    )
+
+    assert classes == ["NORMAL", "PNEUMONIA"]
+    for position, index in enumerate(val_dataset.indices):
+        tensor, label = val_dataset[position]
+        expected, expected_label = reference[index]
+        assert label == expected_label
+        torch.testing.assert_close(tensor, expected, atol=1e-5, rtol=0)
+
+
+def test_training_resumes_and_writes_loadable_weights(tmp_path, data_dir):
+    config = train.TrainConfig(
+        data_dir=data_dir,
+        output=tmp_path / "model.pth",
+        checkpoint_dir=tmp_path / "checkpoints",
+        cache_dir=tmp_path / "cache",
+        epochs=1,
+        batch_size=4,
+        workers=0,
+        pretrained=False,
+        bf16=True,
+    )
+    train.train_model(config)
+
+    config.epochs, config.resume = 2, True
+    train.train_model(config)
+
+    last = torch.load(config.checkpoint_dir / "last.pt", weights_only=True)
+    assert last["epoch"] == 2
+    assert sorted(p.name for p in config.checkpoint_dir.glob("epoch-*.pt")) == [
+        "epoch-001.pt",
+        "epoch-002.pt",
+    ]
+    loader = ModelLoader()
+    loader.device = torch.device("cpu")
+    model = loader.load_float_model(config.output)
+    assert model(torch.zeros(1, 3, 224, 224)).shape == (1, 2)
@@ -0,0 +1,157 @@
+import zipfile
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+from app.core import settings
+from app.utils.archive import extract_images
+from app.utils.upload import (
+    PayloadTooLarge,
+    RequestSizeLimitMiddleware,
+    UploadError,
+    inspect_image,
+    is_image_upload,
+    sniff_format,
+)
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG", "BMP", "TIFF", "WEBP"])
+def test_supported_formats_are_recognized(make_image, fmt):
+    content = make_image(fmt=fmt)
+    assert sniff_format(content[:16]) == fmt
+    assert inspect_image(content, max_pixels=64 * 64).format == fmt
+
+
+def test_unknown_magic_bytes_are_rejected():
+    with pytest.raises(UploadError, match="unsupported"):
+        inspect_image(b"GIF89a" + b"\x00" * 32, max_pixels=100)
+
+
+def test_truncated_header_is_rejected(make_image):
+    with pytest.raises(UploadError, match="corrupt"):
+        inspect_image(make_image()[:20], max_pixels=64 * 64)
+
+
+def test_pixel_limit_uses_header_dimensions(make_image):
+    with pytest.raises(PayloadTooLarge, match="64x64"):
+        inspect_image(make_image(), max_pixels=64 * 64 - 1)
+
+
+def test_oversized_archive_member_is_rejected(make_image):
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("big.png", make_image(size=(256, 256)) + b"\x00" * 4096)
+
+    with pytest.raises(ValueError, match="exceeds 1024 bytes"):
+        extract_images(archive.getvalue(), max_members=4, max_member_bytes=1024)
+
+
+def test_archive_total_size_is_bounded(make_image):
+    image = make_image()
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(3):
+            zf.writestr(f"{i}.png", image)
+
+    assert len(extract_images(archive.getvalue(), 4, None, 3 * len(image))) == 3
+    with pytest.raises(PayloadTooLarge, match="in total"):
+        extract_images(archive.getvalue(), 4, None, 3 * len(image) - 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_total_size_over_limit(client, make_image):
+    image = make_image()
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("pa.png", image)
+    files = [
+        ("files", ("a.png", BytesIO(image), "image/png")),
+        ("files", ("study.zip", BytesIO(archive.getvalue()), "application/zip")),
+    ]
+
+    with patch.object(settings.upload, "max_batch_bytes", 2 * len(image) - 1):
+        response = await client.post("/api/v1/lungcheck/predict/batch", files=files)
+
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_predict_rejects_file_over_size_limit(client, make_image):
+    files = {"file": ("big.png", BytesIO(make_image()), "image/png")}
+
+    with patch.object(settings.upload, "max_file_bytes", 32):
+        response = await client.post("/api/v1/lungcheck/predict", files=files)
+
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_predict_rejects_decompression_bomb(client, make_image):
+    files = {"file": ("bomb.png", BytesIO(make_image(size=(400, 300))), "image/png")}
+
+    with patch.object(settings.upload, "max_image_pixels", 100_000):
+        response = await client.post("/api/v1/lungcheck/predict", files=files)
+
+    assert response.status_code == 413
+    assert "400x300" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_predict_rejects_bytes_that_are_not_an_image(client):
+    files = {"file": ("lung.jpg", BytesIO(b"fake_image_bytes"), "image/jpeg")}
+    response = await client.post("/api/v1/lungcheck/predict", files=files)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_request_body_limit():
+    app = FastAPI()
+    app.add_middleware(RequestSizeLimitMiddleware, max_bytes=100)
+
+    @app.post("/echo")
+    async def echo(request: Request) -> int:
+        return len(await request.body())
+
+    async def chunked():
+        for _ in range(4):
+            yield b"x" * 40
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        assert (await ac.post("/echo", content=b"x" * 100)).json() == 100
+        assert (await ac.post("/echo", content=b"x" * 101)).status_code == 413
+        assert (await ac.post("/echo", content=chunked())).status_code == 413
+
+
+def test_dicom_header_is_inspected_without_pixels(make_dicom):
+    import numpy as np
+
+    content = make_dicom(np.zeros((3, 40, 30), dtype=np.uint16))
+
+    header = inspect_image(content, max_pixels=40 * 30)
+
+    assert (header.format, header.width, header.height, header.frames) == (
+        "DICOM",
+        30,
+        40,
+        3,
+    )
+    with pytest.raises(PayloadTooLarge):
+        inspect_image(content, max_pixels=40 * 30 - 1)
+
+
+@pytest.mark.parametrize(
+    ("content_type", "filename", "expected"),
+    [
+        ("image/png", "a.png", True),
+        ("application/dicom", "study", True),
+        ("application/octet-stream", "IM0001.DCM", True),
+        ("text/plain", "notes.txt", False),
+    ],
+)
+def test_is_image_upload(content_type, filename, expected):
+    assert is_image_upload(content_type, filename) is expected
@@ -1,81 +1,367 @@
+"""
+Train the ResNet18 pneumonia classifier on an ImageFolder dataset.
+
+Expects data/train/<class>/ (and optionally data/val/<class>/) and writes the
+state_dict of the epoch with the best validation accuracy to ``--output``,
+the same .pth ``ModelLoader`` loads.
+
+- Images are loaded by several DataLoader workers (pinned memory,
+  persistent workers).
+- ``--cache-dir`` decodes and resizes every image once into a memory-mapped
+  NumPy array; later epochs and runs skip JPEG decoding.
+- ``--bf16`` enables bfloat16 autocast (also on CPU).
+- A checkpoint is written after every epoch; ``--resume`` continues from the
+  last one.
+
+Usage::
+
+    python train.py [--epochs 5] [--workers N] [--cache-dir data/cache] [--bf16]
+        [--resume]
+"""
+
+import argparse
+import hashlib
 import os
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool
+from pathlib import Path
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset, random_split
 from torchvision import datasets, models, transforms
 
 DATA_DIR = "./data"
 MODEL_SAVE_PATH = "./models/pneumonia_resnet18.pth"
+CHECKPOINT_DIR = "./models/checkpoints"
 BATCH_SIZE = 32
 EPOCHS = 5
+IMG_SIZE = 224
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 
-def train_model() -> None:
-    # Подготовка данных (Трансформации)
+@dataclass
+class TrainConfig:
+    data_dir: Path = Path(DATA_DIR)
+    output: Path = Path(MODEL_SAVE_PATH)
+    checkpoint_dir: Path = Path(CHECKPOINT_DIR)
+    cache_dir: Path | None = None
+    epochs: int = EPOCHS
+    batch_size: int = BATCH_SIZE
+    lr: float = 1e-4
+    workers: int = min(8, os.cpu_count() or 1)
+    val_fraction: float = 0.1
+    bf16: bool = False
+    pretrained: bool = True
+    resume: bool = False
+    seed: int = 0
+
+
+class CachedImageDataset(Dataset):
+    """
+    Pre-resized images from a memory-mapped [N, 224, 224, 3] uint8 array.
+
+    The resize is done when the cache is built; only the random flip and the
+    normalization are left, with the same result as the transforms pipeline.
+    """
+
+    def __init__(self, path: Path, labels: np.ndarray, augment: bool) -> None:
+        self.path = path
+        self.labels = labels
+        self.augment = augment
+        self._images: np.ndarray | None = None
+        self._mean = torch.tensor(MEAN).view(3, 1, 1)
+        self._std = torch.tensor(STD).view(3, 1, 1)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, index: int) -> tuple[torch.Tensor, int]:
+        if self._images is None:
+            # Открываем в каждом воркере: массив не копируется при spawn,
+            # страницы делятся через page cache
+            self._images = np.load(self.path, mmap_mode="r")
+        image = torch.from_numpy(np.array(self._images[index])).permute(2, 0, 1)
+        if self.augment and torch.rand(()) < 0.5:
+            image = image.flip(-1)
+        tensor = (image.float() / 255 - self._mean) / self._std
+        return tensor, int(self.labels[index])
+
+
+def _resize_into(args: tuple[Path, int, list[str]]) -> None:
+    """Decode and resize a chunk of images straight into the cache file."""
+    path, start, files = args
+    images = np.load(path, mmap_mode="r+")
+    resize = transforms.Resize((IMG_SIZE, IMG_SIZE))
+    for offset, file in enumerate(files):
+        with Image.open(file) as image:
+            images[start + offset] = np.asarray(resize(image.convert("RGB")))
+    images.flush()
+
+
+def build_cache(
+    folder: datasets.ImageFolder, cache_dir: Path, workers: int
+) -> CachedImageDataset:
+    """
+    Return the image cache of ``folder``, building it on first use.
+
+    The file name includes a hash of the file list (path, size, mtime), so a
+    changed dataset gets a new cache instead of a stale one.
+    """
+    digest = hashlib.sha256()
+    for file, label in folder.samples:
+        stat = os.stat(file)
+        digest.update(f"{file}\0{label}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    path = (
+        cache_dir / f"{Path(folder.root).name}-{IMG_SIZE}-{digest.hexdigest()[:12]}.npy"
+    )
+    labels = np.asarray(folder.targets, dtype=np.int64)
+
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npy")
+        shape = (len(folder.samples), IMG_SIZE, IMG_SIZE, 3)
+        np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=shape).flush()
+
+        start = time.perf_counter()
+        files = [file for file, _ in folder.samples]
+        chunk = 64
+        jobs = [(tmp, i, files[i : i + chunk]) for i in range(0, len(files), chunk)]
+        if workers > 0:
+            with Pool(workers) as pool:
+                pool.map(_resize_into, jobs)
+        else:
+            for job in jobs:
+                _resize_into(job)
+        # Переименование после записи: прерванная сборка не оставит битый кэш
+        os.replace(tmp, path)
+        print(
+            f"Cached {len(files)} images to {path} "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+    return CachedImageDataset(path, labels, augment=False)
+
+
+def load_datasets(config: TrainConfig) -> tuple[Dataset, Dataset, list[str]]:
+    """
+    Build the training and validation datasets.
+
+    Validation uses data/val when it exists, otherwise ``val_fraction`` of
+    the training images (split by ``seed``, so a resumed run keeps it).
+
+    Returns:
+        Training dataset, validation dataset and class names.
+    """
     train_transform = transforms.Compose(
         [
-            transforms.Resize((224, 224)),
+            transforms.Resize((IMG_SIZE, IMG_SIZE)),
             transforms.RandomHorizontalFlip(),
             transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+            transforms.Normalize(MEAN, STD),
+        ]
+    )
+    val_transform = transforms.Compose(
+        [
+            transforms.Resize((IMG_SIZE, IMG_SIZE)),
+            transforms.ToTensor(),
+            transforms.Normalize(MEAN, STD),
         ]
     )
 
-    # Загрузчик
-    train_dataset = datasets.ImageFolder(
-        os.path.join(DATA_DIR, "train"), train_transform
+    def folder(split: str, augment: bool) -> Dataset:
+        transform = train_transform if augment else val_transform
+        images = datasets.ImageFolder(str(config.data_dir / split), transform)
+        if config.cache_dir is None:
+            return images
+        cached = build_cache(images, config.cache_dir, config.workers)
+        cached.augment = augment
+        return cached
+
+    classes = datasets.ImageFolder(str(config.data_dir / "train")).classes
+    train_dataset = folder("train", augment=True)
+    if (config.data_dir / "val").is_dir():
+        return train_dataset, folder("val", augment=False), classes
+
+    # Отдельной валидации нет - откладываем часть train (без аугментации)
+    val_size = max(1, int(len(train_dataset) * config.val_fraction))
+    generator = torch.Generator().manual_seed(config.seed)
+    train_part, val_part = random_split(
+        train_dataset, [len(train_dataset) - val_size, val_size], generator
     )
-    train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True)
+    val_dataset = folder("train", augment=False)
+    return train_part, torch.utils.data.Subset(val_dataset, val_part.indices), classes
+
+
+def make_loader(dataset: Dataset, config: TrainConfig, shuffle: bool) -> DataLoader:
+    workers = config.workers
+    return DataLoader(
+        dataset,
+        batch_size=config.batch_size,
+        shuffle=shuffle,
+        num_workers=workers,
+        pin_memory=DEVICE.type == "cuda",
+        persistent_workers=workers > 0,
+        prefetch_factor=4 if workers > 0 else None,
+    )
+
+
+def evaluate(
+    model: nn.Module, loader: DataLoader, criterion: nn.Module, bf16: bool
+) -> tuple[float, float, float]:
+    """Return the mean loss, accuracy and images per second of a validation pass."""
+    model.eval()
+    total_loss, correct, seen = 0.0, 0, 0
+    start = time.perf_counter()
+    with (
+        torch.inference_mode(),
+        torch.autocast(DEVICE.type, dtype=torch.bfloat16, enabled=bf16),
+    ):
+        for inputs, labels in loader:
+            inputs = inputs.to(DEVICE, non_blocking=True)
+            labels = labels.to(DEVICE, non_blocking=True)
+            outputs = model(inputs)
+            total_loss += criterion(outputs.float(), labels).item() * len(labels)
+            correct += int((outputs.argmax(1) == labels).sum())
+            seen += len(labels)
+    elapsed = time.perf_counter() - start
+    return total_loss / max(seen, 1), correct / max(seen, 1), seen / elapsed
+
 
-    print(f"Dataset loaded: {len(train_dataset)} images.")
-    print(
-        f"Classes found: {train_dataset.classes}"
-    )  # Должно быть ['NORMAL', 'PNEUMONIA']
+def save_checkpoint(path: Path, state: dict) -> None:
+    """Write atomically: an interrupted save keeps the previous checkpoint."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+
+def train_model(config: TrainConfig) -> Path:
+    torch.manual_seed(config.seed)
+
+    # Подготовка данных
+    train_dataset, val_dataset, classes = load_datasets(config)
+    train_loader = make_loader(train_dataset, config, shuffle=True)
+    val_loader = make_loader(val_dataset, config, shuffle=False)
+
+    print(f"Dataset loaded: {len(train_dataset)} train, {len(val_dataset)} val images.")
+    print(f"Classes found: {classes}")  # Должно быть ['NORMAL', 'PNEUMONIA']
 
     # Инициализация модели (ResNet18)
-    model = models.resnet18(weights=models.ResNet18_Weights.DEFAULT)
-    model.fc = nn.Linear(model.fc.in_features, 2)
+    weights = models.ResNet18_Weights.DEFAULT if config.pretrained else None
+    model = models.resnet18(weights=weights)
+    model.fc = nn.Linear(model.fc.in_features, len(classes))
     model = model.to(DEVICE)
 
     # Функция потерь и Оптимизатор
     criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=0.0001)
+    optimizer = optim.Adam(model.parameters(), lr=config.lr)
+
+    start_epoch, best_accuracy = 0, -1.0
+    last_checkpoint = config.checkpoint_dir / "last.pt"
+    if config.resume and last_checkpoint.exists():
+        state = torch.load(last_checkpoint, map_location=DEVICE, weights_only=True)
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+        torch.set_rng_state(state["rng_state"])
+        start_epoch, best_accuracy = state["epoch"], state["best_accuracy"]
+        print(f"Resumed from {last_checkpoint} after epoch {start_epoch}")
 
-    # Цикл обучения
-    os.makedirs("./models", exist_ok=True)
-    print(f"Starting training on {DEVICE}...")
+    print(f"Starting training on {DEVICE} ({config.workers} loader workers)...")
 
-    for epoch in range(EPOCHS):
+    for epoch in range(start_epoch, config.epochs):
         model.train()
         running_loss = 0.0
+        seen = 0
+        data_wait = 0.0
+        epoch_start = time.perf_counter()
+        batch_start = epoch_start
 
         for i, (inputs, labels) in enumerate(train_loader):
-            inputs, labels = inputs.to(DEVICE), labels.to(DEVICE)
+            data_wait += time.perf_counter() - batch_start
+            inputs = inputs.to(DEVICE, non_blocking=True)
+            labels = labels.to(DEVICE, non_blocking=True)
 
-            optimizer.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
+            optimizer.zero_grad(set_to_none=True)
+            # bf16 не требует GradScaler: диапазон экспоненты как у float32
+            with torch.autocast(DEVICE.type, dtype=torch.bfloat16, enabled=config.bf16):
+                outputs = model(inputs)
+            loss = criterion(outputs.float(), labels)
             loss.backward()
             optimizer.step()
 
             running_loss += loss.item()
+            seen += len(labels)
 
             if (i + 1) % 10 == 0:
                 print(
-                    f"Epoch [{epoch + 1}/{EPOCHS}], Step [{i + 1}/{len(train_loader)}], Loss: {loss.item():.4f}"
+                    f"Epoch [{epoch + 1}/{config.epochs}], "
+                    f"Step [{i + 1}/{len(train_loader)}], Loss: {loss.item():.4f}"
                 )
+            batch_start = time.perf_counter()
 
+        elapsed = time.perf_counter() - epoch_start
+        val_loss, val_accuracy, val_speed = evaluate(
+            model, val_loader, criterion, config.bf16
+        )
         print(
-            f"Epoch {epoch + 1} finished. Avg Loss: {running_loss / len(train_loader):.4f}"
+            f"Epoch {epoch + 1} finished. "
+            f"Avg Loss: {running_loss / max(len(train_loader), 1):.4f}, "
+            f"Val Loss: {val_loss:.4f}, Val Acc: {val_accuracy:.2%}, "
+            f"train {seen / elapsed:.1f} img/s "
+            f"(waiting for data {data_wait / elapsed:.0%}), val {val_speed:.1f} img/s"
         )
 
-    # Сохранение
-    torch.save(model.state_dict(), MODEL_SAVE_PATH)
-    print(f"Success! Model saved to {MODEL_SAVE_PATH}")
+        if val_accuracy > best_accuracy:
+            best_accuracy = val_accuracy
+            save_checkpoint(config.checkpoint_dir / "best.pth", model.state_dict())
+        state = {
+            "epoch": epoch + 1,
+            "model": model.state_dict(),
+            "optimizer": optimizer.state_dict(),
+            "rng_state": torch.get_rng_state(),
+            "best_accuracy": best_accuracy,
+            "val_accuracy": val_accuracy,
+        }
+        save_checkpoint(config.checkpoint_dir / f"epoch-{epoch + 1:03d}.pt", state)
+        save_checkpoint(last_checkpoint, state)
+
+    # Сохранение: веса лучшей эпохи, формат как раньше (state_dict для ModelLoader)
+    best = torch.load(
+        config.checkpoint_dir / "best.pth", map_location="cpu", weights_only=True
+    )
+    config.output.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(best, config.output)
+    print(f"Success! Model saved to {config.output} (Val Acc {best_accuracy:.2%})")
+    return config.output
+
+
+def parse_args(argv: list[str] | None = None) -> TrainConfig:
+    defaults = TrainConfig()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--data-dir", type=Path, default=defaults.data_dir)
+    parser.add_argument("--output", type=Path, default=defaults.output)
+    parser.add_argument("--checkpoint-dir", type=Path, default=defaults.checkpoint_dir)
+    parser.add_argument(
+        "--cache-dir", type=Path, help="memory-mapped cache of resized images"
+    )
+    parser.add_argument("--epochs", type=int, default=defaults.epochs)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument("--lr", type=float, default=defaults.lr)
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    parser.add_argument("--val-fraction", type=float, default=defaults.val_fraction)
+    parser.add_argument("--bf16", action="store_true", help="bfloat16 autocast")
+    parser.add_argument("--no-pretrained", dest="pretrained", action="store_false")
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    return TrainConfig(**vars(parser.parse_args(argv)))
 
 
 if __name__ == "__main__":
-    train_model()
+    train_model(parse_args())